@@ -69,6 +69,7 @@ module sprite_creator (
             end
         end else if(state == ACTIVE) begin
             active <= 1;
+            // vertex tables generated by sim/model/assets.py from data/scene.json
             if(ducking) begin
                 if(counter == 0) begin
                     vertex_x <= lane_left; // front 
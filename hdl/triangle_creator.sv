@@ -88,6 +88,7 @@ module triangle_creator (
                 state <= GEN_TRIANGLE;
             end
         end else if (state == GEN_TRIANGLE) begin
+            // vertex tables generated by sim/model/assets.py from data/scene.json
             if(obstacle_type == 1) begin
                 // Solid low barrier
 
@@ -0,0 +1,83 @@
+"""Drives model.bram.DualPortRAM instances from a cocotb testbench.
+
+Stands in for the xilinx_true_dual_port_read_first_2_clock_ram instances a
+module expects to sit next to it. Every port of every instance is hooked up
+with attach() and one coroutine clocks all of them: inputs are sampled on the
+falling edge, where they are stable, and on the rising edge every RAM steps
+once and the douts are driven. 16 tile painters with 32 BRAMs between them
+are still one coroutine and one numpy step per RAM per cycle.
+
+    tiles = DualPortRAM(32, 800, init_file=TILE_BRAM_MEM)
+    brams = BRAMDriver(dut.clk, rst=dut.rst)
+    brams.attach(tiles, "a", addr=dut.tile_bram_write_addr, din=dut.tile_bram_write_data,
+                 we=dut.tile_bram_write_valid)
+    brams.attach(tiles, "b", addr=dut.tile_bram_read_addr, dout=dut.tile_bram_read_data)
+    brams.start()
+"""
+import cocotb
+import numpy as np
+from cocotb.triggers import FallingEdge, RisingEdge
+
+from bus_monitor import resolve
+
+_INPUTS = ("addr", "din", "we")
+
+
+class BRAMDriver:
+
+    def __init__(self, clk, rst=None):
+        self.clk = clk
+        self.rst = rst
+        # ram -> port -> list of (instance, {name: handle})
+        self.ports = {}
+        self.cycles = 0
+        self._task = None
+
+    def attach(self, ram, port, instance=0, addr=None, din=None, we=None, dout=None):
+        """Connect signals to port "a" or "b" of one instance of `ram`.
+
+        Any of them can be left out: a port without addr reads address 0, one
+        without we never writes and one without dout is not driven.
+        """
+        if port not in ("a", "b"):
+            raise ValueError(f"port must be 'a' or 'b', not {port!r}")
+        signals = {"addr": addr, "din": din, "we": we, "dout": dout}
+        ports = self.ports.setdefault(ram, {"a": [], "b": []})
+        ports[port].append((instance, {k: v for k, v in signals.items() if v is not None}))
+        return self
+
+    def start(self):
+        self._task = cocotb.start_soon(self._run())
+        return self
+
+    def stop(self):
+        if self._task is not None:
+            self._task.kill()
+            self._task = None
+
+    def _sample(self, ram, hooked):
+        inputs = {}
+        for port, connections in hooked.items():
+            for name in _INPUTS:
+                values = np.zeros(ram.instances, dtype=np.int64 if name != "din" else ram.mem.dtype)
+                for instance, signals in connections:
+                    if name in signals:
+                        values[instance] = resolve(signals[name].value)
+                inputs[name + port] = values
+        return inputs
+
+    async def _run(self):
+        falling = FallingEdge(self.clk)
+        rising = RisingEdge(self.clk)
+        while True:
+            await falling
+            rst = resolve(self.rst.value) if self.rst is not None else 0
+            inputs = [(ram, self._sample(ram, hooked)) for ram, hooked in self.ports.items()]
+            await rising
+            self.cycles += 1
+            for ram, kwargs in inputs:
+                douts = dict(zip("ab", ram.clock(rsta=rst, rstb=rst, **kwargs)))
+                for port, connections in self.ports[ram].items():
+                    for instance, signals in connections:
+                        if "dout" in signals:
+                            signals["dout"].value = int(douts[port][instance])
@@ -0,0 +1,126 @@
+"""Clocked bus monitor for cocotb testbenches.
+
+Instead of awaiting a falling and a rising edge per cycle and parsing every
+signal through str(), a BusMonitor samples a fixed set of signals once per
+rising edge in ReadOnly, straight into a preallocated numpy buffer, and hands
+full chunks to a sink:
+
+    monitor = BusMonitor(dut.clk, dut, ["h_count", "v_count", "data", "last"],
+                         when="valid", sink=store_pixels).start()
+    await ClockCycles(dut.clk, 10000)
+    monitor.stop()
+
+If `when` is given only cycles where that signal is 1 are stored, and on the
+other cycles it is the only signal read. X/Z reads as `x_value` (and is
+counted in x_count). Signals wider than 64 bits are stored as little endian
+bytes, so a 160 bit triangle column can go straight into
+codec.decode_triangles.
+"""
+import cocotb
+import numpy as np
+from cocotb.triggers import ReadOnly, RisingEdge
+
+
+def _field(name, width):
+    if width <= 8:
+        return (name, "u1")
+    if width <= 16:
+        return (name, "<u2")
+    if width <= 32:
+        return (name, "<u4")
+    if width <= 64:
+        return (name, "<u8")
+    return (name, "u1", ((width + 7) // 8,))
+
+
+def resolve(value, x_value=0):
+    """int of a handle's value, x_value if any bit is X/Z."""
+    return int(value) if value.is_resolvable else x_value
+
+
+class BusMonitor:
+    """Samples `signals` (names of signals on `dut`) every rising edge of clk.
+
+    Every stored sample is a record of the buffer's dtype: the clock cycle
+    it was taken on (counting from start()) and one field per signal. Full
+    chunks go to sink(records), or to self.chunks if there is no sink. The
+    records passed to the sink are a view of the buffer, copy them to keep
+    them.
+    """
+
+    def __init__(self, clk, dut, signals, when=None, sink=None, chunk=1 << 16, x_value=0):
+        self.clk = clk
+        self.names = list(signals)
+        self.handles = [getattr(dut, name) for name in self.names]
+        self.when = getattr(dut, when) if when is not None else None
+        self.dtype = np.dtype([("cycle", "<u8")] + [_field(n, len(h)) for n, h in zip(self.names, self.handles)])
+        self.buffer = np.zeros(chunk, dtype=self.dtype)
+        self.sink = sink
+        self.chunks = []
+        self.x_value = x_value
+        self.x_count = 0
+        self.cycles = 0
+        self.samples = 0
+        self._pending = 0
+        self._task = None
+
+    def start(self):
+        self._task = cocotb.start_soon(self._run())
+        return self
+
+    def stop(self):
+        if self._task is not None:
+            self._task.kill()
+            self._task = None
+        self.flush()
+
+    def _value(self, handle):
+        value = handle.value
+        if value.is_resolvable:
+            return int(value)
+        self.x_count += 1
+        return self.x_value
+
+    async def _run(self):
+        edge = RisingEdge(self.clk)
+        read_only = ReadOnly()
+        when = self.when
+        buffer = self.buffer
+        # byte count for wide signals, 0 for the ones that fit in an int
+        sizes = [self.dtype.fields[n][0].itemsize if self.dtype.fields[n][0].shape else 0 for n in self.names]
+        columns = list(zip(self.handles, sizes))
+        while True:
+            await edge
+            await read_only
+            self.cycles += 1
+            if when is not None:
+                value = when.value
+                if not value.is_resolvable or int(value) != 1:
+                    continue
+            row = [self.cycles]
+            for handle, size in columns:
+                v = self._value(handle)
+                row.append(tuple(v.to_bytes(size, "little")) if size else v)
+            buffer[self._pending] = tuple(row)
+            self._pending += 1
+            if self._pending == len(buffer):
+                self.flush()
+
+    def flush(self):
+        """Push whatever is buffered to the sink (or self.chunks)."""
+        if not self._pending:
+            return
+        records = self.buffer[:self._pending]
+        self.samples += self._pending
+        self._pending = 0
+        if self.sink is not None:
+            self.sink(records)
+        else:
+            self.chunks.append(records.copy())
+
+    def data(self):
+        """Everything collected so far when there is no sink."""
+        self.flush()
+        if not self.chunks:
+            return np.zeros(0, dtype=self.dtype)
+        return np.concatenate(self.chunks)
@@ -1,19 +1,17 @@
-def hex_to_rgb(hex_code):
-    b = hex_code % (256)
-    hex_code //= 256
-    g = hex_code % 256
-    hex_code //= 256
-    r = hex_code
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+from image import rgb565_to_rgb888, rgb888_to_rgb565
 
-    return (r // 8) * (2**11) + (g // 4) * (2**5) + b // 8
+
+def hex_to_rgb(hex_code):
+    """0xRRGGBB -> RGB565, works on whole arrays too."""
+    return rgb888_to_rgb565(hex_code)
 
 def rgb_to_hex(num):
-    
-    b = (num % 32) * 8
-    num //= 32
-    g = (num % 64) * 4
-    num //= 64
-    r = num * 8
+    r, g, b = (int(c) for c in rgb565_to_rgb888(num))
     return hex(r * (2**16) + g * (2**8) + b)
 
-print(hex(hex_to_rgb(0xFFDE21)))
\ No newline at end of file
+if __name__ == '__main__':
+    print(hex(hex_to_rgb(0xFFDE21)))
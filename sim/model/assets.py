@@ -0,0 +1,604 @@
+"""Scene asset compiler: the obstacle and player geometry in data/scene.json
+compiled into triangle_creator.sv and sprite_creator.sv.
+
+The description is the geometry without the always_ff around it:
+
+    "triangle_creator": {
+        "params": {"LEFTLANELEFT": -128, ..., "GROUND": 128, "MID": 96, "TOP": 64},
+        "obstacles": {
+            "1": {"name": "Barrier, Solid Low (must jump)",
+                  "skip_closer_than": "32 + MINZ",      # makes no geometry closer than that
+                  "z": "obstacle_depth - 32",           # for vertices that leave z out
+                  "shapes": [{"color": "F000", "note": "red barrier",
+                              "quad": [["lane_left", "GROUND"], ["lane_right", "GROUND"],
+                                       ["lane_right", "MID"], ["lane_left", "MID"]]}]},
+            ...}},
+    "sprite_creator": {"params": {...}, "ducking": {...}, "standing": {...}, "shared": {...}}
+
+A shape is a "tri" of 3 vertices or a "quad" of 4 (a, b, c, d), which is
+the triangles (a, b, d) and (b, c, d). Its note is the comment on its first
+vertex, a list for several lines of them. A vertex is [x, y] or [x, y, z],
+each a Verilog expression over the params and what the module has at hand
+(lane_left, lane_right, obstacle_depth, player_height) or a number. A shape
+without a color keeps the one before, like the color register does.
+Ducking and standing are the two halves of the player, shared (the lane
+lines) comes after either.
+
+compile writes the vertex_counter / counter case chains and the localparam
+values back into the SV, and leaves everything else in the files alone. The
+chains are patched where they are: comments, blank lines and the order of
+the assignments in a vertex block stay as they are, only the values change,
+and vertices get added after the last one or dropped from the end, so notes
+only matter for vertices the SV doesn't have yet. A chain is written anew
+only if the types, the too close guards or the sprite's shared part differ.
+Before it does, the compiled tables are run through scene.py next to the
+current ones, so `compile` shows what changes in the triangles, not just
+in the text. The budget puts the worst case triangles in a frame (every
+obstacle slot of obstacle_generator holding the most expensive type) and
+what recorded game frames need against the renderer's MAX_TRIANGLES, with
+frame_time's cycle count for the same frames.
+
+    python sim/model/assets.py extract            # hdl/ -> data/scene.json
+    python sim/model/assets.py budget             # of data/scene.json
+    python sim/model/assets.py compile            # diff of what would change in hdl/
+    python sim/model/assets.py compile --write
+"""
+import argparse
+import difflib
+import json
+import re
+import sys
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+import scene
+from codec import OBSTACLE_DTYPE
+
+PROJ_PATH = Path(__file__).resolve().parent.parent.parent
+HDL_PATH = PROJ_PATH / "hdl"
+DESCRIPTION_PATH = PROJ_PATH / "data" / "scene.json"
+TRIANGLE_CREATOR = "triangle_creator.sv"
+SPRITE_CREATOR = "sprite_creator.sv"
+SPRITE_PARTS = ("ducking", "standing", "shared")
+GENERATED = "// vertex tables generated by sim/model/assets.py from data/scene.json"
+# the order vertex blocks compile adds assign them in, color after
+REGISTERS = {TRIANGLE_CREATOR: ("vertex_z", "vertex_x", "vertex_y"), SPRITE_CREATOR: ("vertex_x", "vertex_y", "vertex_z")}
+XYZ = ("vertex_x", "vertex_y", "vertex_z")
+# what the last vertex of a chain ends with
+LAST = ("state <= IDLE;",)
+ASSIGNMENT = re.compile(r"(\s*)(\w+)(\s*<=\s*)(.*?)(\s*;.*)$")
+
+
+######## hdl -> description ########
+
+def _localparam_values(text):
+    text = re.sub(r"//[^\n]*", "", text)
+    params = {}
+    for name, value in re.findall(r"localparam\s+(?:signed\s+)?(?:\[[^\]]*\]\s*)?(\w+)\s*=\s*([^;]+);", text):
+        params[name] = int(value) if re.fullmatch(r"-?\d+", value.strip()) else value.strip()
+    return params
+
+
+def _notes(region, counter):
+    """{vertex: [comments]} in a piece of raw SV, -1 for the ones before the
+    first vertex block."""
+    notes = {}
+    current = -1
+    for line in region.splitlines():
+        found = re.search(rf"\b{counter}\s*==\s*(\d+)", line)
+        if found:
+            current = int(found.group(1))
+        comment = re.search(r"//\s*(.*?)\s*$", line)
+        if comment and comment.group(1) and not comment.group(1).startswith(("dont render", "vertex tables")):
+            notes.setdefault(current, []).append(comment.group(1))
+    return notes
+
+
+def _rows(blocks):
+    """Per vertex {register: expression}, registers carried over, from the
+    first block on (not from 0, the shared sprite vertices start at 30)."""
+    rows = []
+    current = {}
+    for k in range(min(blocks), max(blocks) + 1):
+        current = {**current, **blocks.get(k, {})}
+        rows.append(current)
+    return rows
+
+
+def _color(expression):
+    return re.sub(r"^0x", "", expression) if expression is not None else None
+
+
+def _shapes(rows, notes, first):
+    """Shapes for a table's rows, consecutive triangles that make a quad
+    merged into one, and the z most of them have."""
+    z = Counter(row["vertex_z"] for row in rows).most_common(1)[0][0]
+
+    def vertex(row):
+        v = [_literal(row["vertex_x"]), _literal(row["vertex_y"])]
+        return v if row["vertex_z"] == z else v + [_literal(row["vertex_z"])]
+
+    triangles = []
+    previous = None
+    for j in range(0, len(rows), 3):
+        color = rows[j].get("color")
+        note = [n for k in range(first + j, first + j + 3) for n in notes.get(k, [])]
+        triangles.append({"color": _color(color) if color != previous else None, "note": note,
+                          "tri": [vertex(row) for row in rows[j:j + 3]]})
+        previous = color
+    shapes = []
+    while triangles:
+        t = triangles.pop(0)
+        if triangles and triangles[0]["color"] is None:
+            (a, b, d), (b2, c, d2) = t["tri"], triangles[0]["tri"]
+            if b2 == b and d2 == d:
+                u = triangles.pop(0)
+                t = {"color": t["color"], "note": t["note"] + u["note"], "quad": [a, b, c, d]}
+        # one comment is a string, several a list of them, one per line in the SV
+        t["note"] = t["note"][0] if len(t["note"]) == 1 else t["note"]
+        shapes.append({k: v for k, v in t.items() if v})
+    return {"z": _literal(z), "shapes": shapes}
+
+
+def _literal(expression):
+    return int(expression) if re.fullmatch(r"-?\d+", expression.strip()) else expression.strip()
+
+
+def extract(triangle_creator=None, sprite_creator=None):
+    """The description of what's in the SV now (hdl/ unless given)."""
+    tc = triangle_creator if triangle_creator is not None else (HDL_PATH / TRIANGLE_CREATOR).read_text()
+    sc = sprite_creator if sprite_creator is not None else (HDL_PATH / SPRITE_CREATOR).read_text()
+    stripped = re.sub(r"//[^\n]*", "", tc)
+    names = {int(t, 2): name.strip() for t, name in re.findall(r"^\s*([01]{3})\s*-\s*(.+)$", tc, re.M)}
+    body = stripped[stripped.index("GEN_TRIANGLE) begin"):]
+    raw = tc[tc.index("GEN_TRIANGLE) begin"):]
+    parts = re.split(r"obstacle_type\s*==\s*(\d+)\s*\)", body)
+    raw_parts = re.split(r"obstacle_type\s*==\s*(\d+)\s*\)", raw)
+    obstacles = {}
+    for (t, part), raw_part in zip(zip(parts[1::2], parts[2::2]), raw_parts[2::2]):
+        blocks = scene._blocks(part, "vertex_counter")
+        entry = {"name": names.get(int(t), f"type {t}")}
+        guard = re.match(r"\s*begin\s*if\s*\(\s*obstacle_depth\s*<\s*([^)]+)\)", part)
+        if guard:
+            entry["skip_closer_than"] = guard.group(1).strip()
+        entry.update(_shapes(_rows(blocks), _notes(raw_part, "vertex_counter"), 0))
+        obstacles[t] = entry
+
+    stripped = re.sub(r"//[^\n]*", "", sc)
+    body = stripped[stripped.index("state == ACTIVE"):]
+    raw = sc[sc.index("state == ACTIVE"):]
+    sprite = {}
+    for part, (start, end) in zip(SPRITE_PARTS, _sprite_parts(body)):
+        blocks = scene._blocks(body[start:end], "counter")
+        raw_start, raw_end = _sprite_parts(raw)[SPRITE_PARTS.index(part)]
+        sprite[part] = _shapes(_rows(blocks), _notes(raw[raw_start:raw_end], "counter"), min(blocks))
+    return {
+        "triangle_creator": {"params": _localparam_values(tc), "obstacles": obstacles},
+        "sprite_creator": {"params": _localparam_values(sc), **sprite},
+    }
+
+
+def _sprite_parts(body):
+    """(start, end) of the ducking, standing and shared chains in the ACTIVE state."""
+    ducking = body.index("if(ducking)")
+    standing = body.index("end else begin", ducking)
+    firsts = [m.start() for m in re.finditer(r"(else\s+)?if\s*\(\s*counter\s*==", body[standing:]) if m.group(1) is None]
+    shared = standing + firsts[1] if len(firsts) > 1 else None
+    if shared is not None:
+        # comments between the branches' end and the first block are the shared ones'
+        shared = body.rindex("end", standing, shared) + len("end")
+    end = body.index("counter <= counter + 1", shared or standing)
+    return [(ducking, standing), (standing, shared or end), (shared or end, end)]
+
+
+######## description -> hdl ########
+
+def _note_lines(note):
+    return [note] if isinstance(note, str) else list(note or [])
+
+
+def triangles(table):
+    """[(color or None, [comments], [(x, y, z)] * 3)] of a table's shapes."""
+    out = []
+    for shape in table["shapes"]:
+        if "quad" in shape:
+            a, b, c, d = shape["quad"]
+            corners = [[a, b, d], [b, c, d]]
+        else:
+            corners = [shape["tri"]]
+        for i, tri in enumerate(corners):
+            if len(tri) != 3:
+                raise ValueError(f"a tri has 3 vertices, not {len(tri)}: {tri}")
+            vertices = [tuple(str(c) for c in (v if len(v) == 3 else [v[0], v[1], table["z"]])) for v in tri]
+            out.append((shape.get("color") if i == 0 else None, _note_lines(shape.get("note")) if i == 0 else [], vertices))
+    return out
+
+
+def _vertices(table):
+    """[({register: expression}, color or None, [comments])] per vertex of a table."""
+    out = []
+    for color, notes, vertices in triangles(table):
+        for i, vertex in enumerate(vertices):
+            out.append((dict(zip(XYZ, vertex)), color if i == 0 else None, notes if i == 0 else []))
+    return out
+
+
+def _block(header, indent, registers, values, color, notes, last):
+    lines = [header]
+    if color is None:
+        lines += [f"{indent}    // {note}" for note in notes]
+    lines += [f"{indent}    {register} <= {values[register]};" for register in registers]
+    if color is not None:
+        lines.append(f"{indent}    color <= 16'h{color};" + (f" // {notes[0]}" if notes else ""))
+        lines += [f"{indent}    // {note}" for note in notes[1:]]
+    return lines + [f"{indent}    {statement}" for statement in last]
+
+
+def _chain(table, counter, indent, registers, first_vertex=0, opener="if", last=()):
+    """The `if(counter == k) begin ... end else if ...` chain of one table,
+    ending in `end`. `last` are extra statements for the last vertex."""
+    lines = []
+    vertices = _vertices(table)
+    for n, (values, color, notes) in enumerate(vertices):
+        keyword = opener if n == 0 and opener else "end else if"
+        lines += _block(f"{indent}{keyword}({counter} == {first_vertex + n}) begin", indent, registers, values,
+                        color, notes, last if n == len(vertices) - 1 else ())
+    lines.append(f"{indent}end")
+    return lines
+
+
+def _chains(lines, counter):
+    """[(first, last)] line indices of the `if(counter == k) ... end` chains in lines."""
+    chains = []
+    i = 0
+    while i < len(lines):
+        if re.search(rf"\b{counter}\s*==\s*\d+\s*\)", lines[i]):
+            indent = len(lines[i]) - len(lines[i].lstrip())
+            j = i + 1
+            while j < len(lines) and not (lines[j].strip() == "end" and len(lines[j]) - len(lines[j].lstrip()) == indent):
+                j += 1
+            if j == len(lines):
+                raise ValueError(f"no end to the {counter} chain starting at {lines[i].strip()!r}")
+            chains.append((i, j))
+            i = j
+        i += 1
+    return chains
+
+
+def _patch_chain(lines, table, counter, registers, first_vertex=0, last=()):
+    """A chain from the SV with the table's vertices in it. Only the values
+    change: comments, blank lines and the order of the assignments stay as
+    they are. Vertices the chain doesn't have yet go after its last one
+    like _chain writes them, and the ones it no longer needs are dropped."""
+    number = re.compile(rf"(\b{counter}\s*==\s*)(\d+)")
+    blocks = []
+    for line in lines[:-1]:
+        if number.search(line):
+            blocks.append([line])
+        else:
+            blocks[-1].append(line)
+    indent = lines[0][:len(lines[0]) - len(lines[0].lstrip())]
+    # a later header without its comment, for vertices the chain doesn't have
+    template = re.sub(r"\s*//.*$", "", blocks[-1][0])
+    vertices = _vertices(table)
+    out = []
+    current = {}
+    for n, (values, color, notes) in enumerate(vertices):
+        k = str(first_vertex + n)
+        ending = last if n == len(vertices) - 1 else ()
+        if n >= len(blocks):
+            out += _block(number.sub(lambda m: m.group(1) + k, template, count=1), indent, registers, values,
+                          color, notes, ending)
+            current.update(values, **({"color": color} if color is not None else {}))
+            continue
+        # the color the description has at this vertex, set here or carried over
+        shade = color if color is not None else current.get("color")
+        header, *body = blocks[n]
+        kept, assigned = [number.sub(lambda m: m.group(1) + k, header, count=1)], set()
+        for line in body:
+            statement = line.split("//")[0].strip()
+            if statement in LAST:
+                if statement in ending:
+                    kept.append(line)
+                    assigned.add(statement)
+                continue
+            found = ASSIGNMENT.match(line)
+            if found and (found.group(2) in registers or found.group(2) == "color"):
+                name = found.group(2)
+                if name == "color" and shade is None:
+                    continue
+                value = values[name] if name != "color" else f"16'h{shade}"
+                line = line[:found.start(4)] + value + line[found.end(4):]
+                assigned.add(name)
+            kept.append(line)
+        missing = [f"{indent}    {r} <= {values[r]};" for r in registers if r not in assigned and current.get(r) != values[r]]
+        if color is not None and "color" not in assigned and current.get("color") != color:
+            missing.append(f"{indent}    color <= 16'h{color};")
+        # right after the block's last assignment
+        at = max((i + 1 for i, line in enumerate(kept) if ASSIGNMENT.match(line)), default=len(kept))
+        kept[at:at] = missing
+        kept += [f"{indent}    {statement}" for statement in ending if statement not in assigned]
+        out += kept
+        current.update(values, **({"color": shade} if shade is not None else {}))
+    return out + [lines[-1]]
+
+
+def _counter_width(text, counter):
+    found = re.search(rf"logic\s*\[(\d+):0\]\s*{counter}\s*;", text)
+    return int(found.group(1)) + 1 if found else None
+
+
+def _check_width(text, counter, vertices, what):
+    width = _counter_width(text, counter)
+    if width is not None and vertices > 1 << width:
+        raise ValueError(f"{what}: {vertices} vertices don't fit the {width} bit {counter}")
+
+
+def _region(text, start, end):
+    """(start, end) offsets of the lines from the one with `start` (and a
+    generated marker right above it) up to the one with `end`."""
+    a = text.rfind("\n", 0, text.index(start)) + 1
+    above = text.rfind("\n", 0, a - 1) + 1
+    if GENERATED in text[above:a]:
+        a = above
+    b = text.rfind("\n", 0, text.index(end, a)) + 1
+    return a, b
+
+
+def _set_params(text, params):
+    for name, value in params.items():
+        pattern = rf"(localparam\s+(?:signed\s+)?(?:\[[^\]]*\]\s*)?{name}\s*=\s*)([^;]+)(;)"
+        if not re.search(pattern, text):
+            raise ValueError(f"no localparam {name} to set, add it to the SV first")
+        text = re.sub(pattern, lambda m: f"{m.group(1)}{value}{m.group(3)}", text, count=1)
+    return text
+
+
+def _obstacle_chain(entries, indent):
+    lines = []
+    for n, (t, entry) in enumerate(entries):
+        lines.append(f"{indent}{'if' if n == 0 else 'end else if'}(obstacle_type == {t}) begin")
+        lines.append(f"{indent}    // {entry['name']}")
+        opener = "if"
+        if entry.get("skip_closer_than") is not None:
+            lines += [f"{indent}    if(obstacle_depth < {entry['skip_closer_than']}) begin",
+                      f"{indent}        // dont render, too close to camera z",
+                      f"{indent}        state <= IDLE;"]
+            opener = None
+        lines += _chain(entry, "vertex_counter", indent + "    ", REGISTERS[TRIANGLE_CREATOR], opener=opener, last=LAST)
+    return lines + [f"{indent}end"]
+
+
+def _patch_obstacles(lines, entries):
+    """The obstacle_type chain from the SV with the entries' tables in it, or
+    None if the types or their too close guards aren't the ones it has."""
+    starts = [i for i, line in enumerate(lines) if re.search(r"obstacle_type\s*==\s*\d+\s*\)", line)]
+    if [re.search(r"obstacle_type\s*==\s*(\d+)", lines[i]).group(1) for i in starts] != [t for t, _ in entries]:
+        return None
+    out = lines[:starts[0]]
+    for (t, entry), start, end in zip(entries, starts, starts[1:] + [len(lines)]):
+        part = lines[start:end]
+        chains = _chains(part, "vertex_counter")
+        if len(chains) != 1:
+            return None
+        first, last = chains[0]
+        head = part[:first]
+        guard = [i for i, line in enumerate(head) if re.search(r"obstacle_depth\s*<", line)]
+        skip = entry.get("skip_closer_than")
+        if bool(guard) != (skip is not None):
+            return None
+        if guard:
+            head[guard[0]] = re.sub(r"(obstacle_depth\s*<\s*)(.*?)(\s*\)\s*begin)", lambda m: f"{m.group(1)}{skip}{m.group(3)}",
+                                    head[guard[0]], count=1)
+        out += head + _patch_chain(part[first:last + 1], entry, "vertex_counter", REGISTERS[TRIANGLE_CREATOR],
+                                   last=LAST) + part[last + 1:]
+    return out
+
+
+def compile_triangle_creator(description, text):
+    tc = description["triangle_creator"]
+    text = _set_params(text, tc["params"])
+    entries = sorted(tc["obstacles"].items(), key=lambda kv: int(kv[0]))
+    for t, entry in entries:
+        count = 3 * len(triangles(entry))
+        if not count:
+            raise ValueError(f"obstacle type {t} has no triangles, triangle_creator would still put one out")
+        _check_width(text, "vertex_counter", count, f"obstacle type {t}")
+    a, b = _region(text, "if(obstacle_type ==", "new_triangle <= (vertex_mod_3 == 0);")
+    indent = " " * 12
+    lines = _patch_obstacles([line for line in text[a:b].splitlines() if GENERATED not in line], entries)
+    if lines is None:
+        lines = _obstacle_chain(entries, indent) + [""]
+    return text[:a] + "\n".join([f"{indent}{GENERATED}"] + lines) + "\n" + text[b:]
+
+
+def _patch_sprite(lines, tables):
+    """The ducking / standing / shared chains from the SV with the tables'
+    vertices in them, or None if the SV doesn't have the same chains."""
+    chains = _chains(lines, "counter")
+    if len(chains) != len(tables):
+        return None
+    out, previous = [], 0
+    for (first, last), (table, first_vertex, ending) in zip(chains, tables):
+        out += lines[previous:first] + _patch_chain(lines[first:last + 1], table, "counter", REGISTERS[SPRITE_CREATOR],
+                                                    first_vertex, ending)
+        previous = last + 1
+    return out + lines[previous:]
+
+
+def compile_sprite_creator(description, text):
+    sc = description["sprite_creator"]
+    text = _set_params(text, sc["params"])
+    ducking, standing = (len(triangles(sc[part])) for part in ("ducking", "standing"))
+    if ducking != standing:
+        raise ValueError(f"ducking ({ducking}) and standing ({standing}) need the same number of triangles, "
+                         "the shared ones start at the same vertex after either")
+    shared = sc.get("shared", {"shapes": []})
+    _check_width(text, "counter", 3 * (ducking + len(triangles(shared))), "sprite")
+    indent = " " * 12
+    done = () if shared["shapes"] else LAST
+    tables = [(sc["ducking"], 0, done), (sc["standing"], 0, done)] + ([(shared, 3 * ducking, LAST)] if shared["shapes"] else [])
+    a, b = _region(text, "if(ducking)", "counter <= counter + 1;")
+    lines = _patch_sprite([line for line in text[a:b].splitlines() if GENERATED not in line], tables)
+    if lines is None:
+        registers = REGISTERS[SPRITE_CREATOR]
+        lines = [f"{indent}if(ducking) begin"]
+        lines += _chain(sc["ducking"], "counter", indent + "    ", registers, last=done)
+        lines.append(f"{indent}end else begin")
+        lines += _chain(sc["standing"], "counter", indent + "    ", registers, last=done)
+        lines.append(f"{indent}end")
+        if shared["shapes"]:
+            lines.append("")
+            lines += _chain(shared, "counter", indent, registers, first_vertex=3 * ducking, last=LAST)
+        lines.append("")
+    return text[:a] + "\n".join([f"{indent}{GENERATED}"] + lines) + "\n" + text[b:]
+
+
+def compile_scene(description, triangle_creator=None, sprite_creator=None):
+    """(triangle_creator.sv, sprite_creator.sv) text with the description's tables."""
+    tc = triangle_creator if triangle_creator is not None else (HDL_PATH / TRIANGLE_CREATOR).read_text()
+    sc = sprite_creator if sprite_creator is not None else (HDL_PATH / SPRITE_CREATOR).read_text()
+    return compile_triangle_creator(description, tc), compile_sprite_creator(description, sc)
+
+
+######## checks ########
+
+def _probe_obstacles():
+    depths = (0, 20, 39, 40, 41, 100, 136, 137, 300, 1000, 2047)
+    return np.array([(t, lane, d) for t in range(1, 8) for lane in range(3) for d in depths], dtype=OBSTACLE_DTYPE)
+
+
+def geometry(triangle_creator, sprite_creator):
+    """Everything scene.py makes out of a pair of SV texts, for comparing."""
+    scene.load_tables(triangle_creator, sprite_creator)
+    try:
+        per_type = scene.triangles_per_type()
+        obstacles = _probe_obstacles()
+        obstacles = obstacles[np.isin(obstacles["type"], list(per_type))]
+        out = {"per_type": per_type, "skip": scene.skip_depths(),
+               "obstacles": [a.tolist() for a in scene.obstacle_vertices(obstacles)]}
+        for ducking in (False, True):
+            for lane in range(3):
+                for height in (-128, -200, 0, 64):
+                    out[(ducking, lane, height)] = [a.tolist() for a in scene.sprite_vertices(height, lane, ducking)]
+        return out
+    finally:
+        scene.load_tables()
+
+
+def changes(description):
+    """What compiling the description would change about the triangles,
+    as a list of lines (empty if nothing)."""
+    before = geometry((HDL_PATH / TRIANGLE_CREATOR).read_text(), (HDL_PATH / SPRITE_CREATOR).read_text())
+    after = geometry(*compile_scene(description))
+    lines = []
+    for t in sorted(set(before["per_type"]) | set(after["per_type"])):
+        a, b = before["per_type"].get(t), after["per_type"].get(t)
+        if a != b:
+            lines.append(f"obstacle type {t}: {a} -> {b} triangles")
+    if before["skip"] != after["skip"]:
+        lines.append(f"too close depths: {before['skip']} -> {after['skip']}")
+    if before["per_type"] == after["per_type"] and before["obstacles"] != after["obstacles"]:
+        lines.append("obstacle vertices or colors change")
+    sprite = [k for k in before if isinstance(k, tuple) and before[k] != after[k]]
+    if sprite:
+        lines.append(f"sprite vertices or colors change ({len(sprite)} of {len([k for k in before if isinstance(k, tuple)])} poses)")
+    return lines
+
+
+######## budget ########
+
+def budget(description, frames=16, seed=0):
+    """Lines of the triangle budget of a description, see the module docstring."""
+    from frame_time import frame_time
+    from game import LANES, ROWS
+    from projector_cache import model_triangles
+    from renderer import MAX_TRIANGLES
+
+    tc, sc = compile_scene(description)
+    scene.load_tables(tc, sc)
+    try:
+        per_type = scene.triangles_per_type()
+        sprite = max(scene.sprite_triangles(False), scene.sprite_triangles(True))
+        slots = ROWS * LANES
+        worst_type = max(per_type, key=per_type.get)
+        worst = slots * per_type[worst_type] + sprite
+        lines = [f"  {'obstacle type':44s} triangles"]
+        for t, n in per_type.items():
+            name = description["triangle_creator"]["obstacles"][str(t)]["name"]
+            lines.append(f"  {t} {name:42s} {n:9d}")
+        lines.append(f"  {'sprite (standing / ducking)':44s} {scene.sprite_triangles(False):4d} / {scene.sprite_triangles(True)}")
+        lines.append(f"worst case frame: {slots} obstacle slots of type {worst_type} + sprite = {worst} triangles")
+        # num_triangles is 8 bits: only the last worst % 256 are drawn, and exactly 256 draws nothing
+        if worst >= MAX_TRIANGLES:
+            lines.append(f"  not below MAX_TRIANGLES = {MAX_TRIANGLES}, num_triangles wraps and the first "
+                         f"{worst - worst % MAX_TRIANGLES} are lost; {(MAX_TRIANGLES - 1 - sprite) // per_type[worst_type]} "
+                         f"type {worst_type} obstacles fit")
+        else:
+            lines.append(f"  below MAX_TRIANGLES = {MAX_TRIANGLES}, {MAX_TRIANGLES - 1 - worst} to spare")
+        if frames:
+            counts, cycles = [], []
+            for frame in scene.scenes(frames=frames, seed=seed):
+                triangles = model_triangles(**frame)
+                counts.append(len(triangles))
+                cycles.append(frame_time(triangles).cycles)
+            counts, cycles = np.array(counts), np.array(cycles)
+            lines.append(f"{frames} game frames: {counts.mean():.1f} triangles on average, {counts.max()} at most, "
+                         f"{(counts >= MAX_TRIANGLES).sum()} over budget; "
+                         f"{cycles.mean():.0f} cycles a frame on average, {cycles.max()} at most")
+        return lines
+    finally:
+        scene.load_tables()
+
+
+def load(path=DESCRIPTION_PATH):
+    return json.loads(Path(path).read_text())
+
+
+def dump(description, path=DESCRIPTION_PATH):
+    text = json.dumps(description, indent=1)
+    # a vertex, and a shape's vertices, on one line
+    text = re.sub(r"\[\s*([^\[\]{}]*?)\s*\]", lambda m: "[" + re.sub(r"\s*\n\s*", " ", m.group(1)) + "]", text)
+    text = re.sub(r"\[\s*(\[[^{}]*?\])\s*\]", lambda m: "[" + re.sub(r"\s*\n\s*", " ", m.group(1)) + "]", text)
+    Path(path).write_text(text + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["extract", "compile", "budget"])
+    parser.add_argument("--scene", default=DESCRIPTION_PATH, help="scene description")
+    parser.add_argument("--write", action="store_true", help="compile: rewrite hdl/ instead of printing a diff")
+    parser.add_argument("--force", action="store_true", help="extract: overwrite an existing description")
+    parser.add_argument("--frames", type=int, default=16, help="budget: recorded game frames to count")
+    args = parser.parse_args()
+
+    if args.command == "extract":
+        if Path(args.scene).exists() and not args.force:
+            sys.exit(f"{args.scene} exists, --force to overwrite it")
+        dump(extract(), args.scene)
+        print(f"wrote {args.scene}")
+        return
+
+    description = load(args.scene)
+    if args.command == "budget":
+        print("\n".join(budget(description, args.frames)))
+        return
+
+    texts = compile_scene(description)
+    differences = changes(description)
+    print("\n".join(differences) if differences else "same triangles as hdl/ now")
+    for name, text in zip((TRIANGLE_CREATOR, SPRITE_CREATOR), texts):
+        path = HDL_PATH / name
+        if args.write:
+            if text != path.read_text():
+                path.write_text(text)
+                print(f"wrote {path}")
+        else:
+            sys.stdout.writelines(difflib.unified_diff(path.read_text().splitlines(True), text.splitlines(True),
+                                                       f"a/hdl/{name}", f"b/hdl/{name}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Bins triangles by the tiles their bounding boxes touch.
+
+Every tile_painter reads all num_triangles triangles for every tile, and
+for most of them CALCULATING_BOUNDS just says no_intersection: 4 cycles
+spent for nothing, 72 * 16 * num_triangles times a frame. Binning does the
+bounding box test once per frame up front instead, so every painter only
+reads the triangles that overlap its tile.
+
+The binned BRAM image is what a binned renderer would load:
+
+  triangles.mem   the triangle table, unchanged, 160 bit words in BRAM order
+  bins_<k>.mem    one index BRAM per painter k (tile column k), 16 bit words:
+                  73 start addresses, row r's list being words
+                  start[r] .. start[r + 1] - 1, then the lists themselves,
+                  triangle indices in BRAM order so depth ties still go the
+                  same way
+
+A painter on row r reads start[r] and start[r + 1], then for every entry an
+index and then the triangle. That index read is INDEX_CYCLES more per
+triangle unless it gets prefetched during the previous triangle's WAITING.
+
+    bins = Bins(triangles)
+    print(bins.report())
+    bins.write("sim_build/binned")
+    python sim/model/binning.py sim_build/test_projector.cap --write sim_build/binned
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from bram import write_memh
+from codec import triangles_to_ints
+from frame_time import READ_CYCLES, WAIT_CYCLES, FrameTime, coverage, painter_work
+from renderer import N_WAY_PARALLEL, TILE_ROWS, triangle_bram
+
+# index BRAM latency, on top of READ_CYCLES
+INDEX_CYCLES = 2
+INDEX_WIDTH = 16
+
+
+class Bins:
+    """Triangles binned per painter. hit is (72, 16, T), everything else
+    per painter is (72, 16)."""
+
+    def __init__(self, triangles):
+        self.triangles = triangle_bram(triangles)
+        self.hit, self.cells = coverage(self.triangles)
+        self.counts = self.hit.sum(axis=2)
+
+    @property
+    def useless(self):
+        """Triangles each painter reads only to find they miss its tile."""
+        return len(self.triangles) - self.counts
+
+    def lists(self, tile_index, tile):
+        """Triangle indices painter `tile` reads on row `tile_index`, in order."""
+        return np.flatnonzero(self.hit[tile_index, tile])
+
+    def work(self, index_cycles=INDEX_CYCLES):
+        """(72, 16) painter work cycles with binning. index_cycles=0 is a
+        painter that prefetches indices."""
+        per_hit = READ_CYCLES + index_cycles + WAIT_CYCLES
+        return per_hit * self.counts + self.cells.sum(axis=2)
+
+    def frame_time(self, binned=True, index_cycles=INDEX_CYCLES):
+        if not binned:
+            return FrameTime(*painter_work(self.triangles))
+        return FrameTime(self.work(index_cycles), self.counts)
+
+    def report(self, index_cycles=INDEX_CYCLES):
+        now = self.frame_time(binned=False)
+        binned = self.frame_time(index_cycles=index_cycles)
+        reads = len(self.triangles) * N_WAY_PARALLEL
+        useless = self.useless.sum(axis=1)
+        lines = [" row  reads  useless  wasted cycles  painting now  binned"]
+        for row in range(TILE_ROWS):
+            lines.append(f"{row:4d} {reads:6d} {useless[row]:8d} {READ_CYCLES * useless[row]:14d}"
+                         f" {now.states['PAINTING_TILES'][row]:13d} {binned.states['PAINTING_TILES'][row]:7d}")
+        total = reads * TILE_ROWS
+        lines.append(f"{len(self.triangles)} triangles, {useless.sum()}/{total} triangle reads useless "
+                     f"({useless.sum() / max(total, 1):.1%}), most triangles in one tile {self.counts.max()}")
+        lines.append(f"frame: {now.cycles} cycles ({now.fps:.1f} fps) now, "
+                     f"{binned.cycles} ({binned.fps:.1f} fps) binned with {index_cycles} index cycles")
+        return "\n".join(lines)
+
+    def index_bram(self, tile):
+        """Words of painter `tile`'s index BRAM: 73 starts, then the lists."""
+        counts = self.counts[:, tile]
+        starts = TILE_ROWS + 1 + np.concatenate([[0], np.cumsum(counts)])
+        # row major over (row, triangle), so the lists come out row by row
+        lists = np.nonzero(self.hit[:, tile, :])[1]
+        words = np.concatenate([starts, lists])
+        if words.max(initial=0) >= 1 << INDEX_WIDTH:
+            raise ValueError(f"painter {tile}'s index BRAM needs more than {INDEX_WIDTH} bit words")
+        return words
+
+    def write(self, directory):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        write_memh(directory / "triangles.mem", triangles_to_ints(self.triangles), 160)
+        for tile in range(N_WAY_PARALLEL):
+            write_memh(directory / f"bins_{tile}.mem", self.index_bram(tile), INDEX_WIDTH)
+
+
+def main():
+    from capture import open_capture
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture", help="projector capture, one frame of triangles per index")
+    parser.add_argument("-f", "--frame", type=int, default=None, help="frame index (default: the one with the most triangles)")
+    parser.add_argument("--index-cycles", type=int, default=INDEX_CYCLES)
+    parser.add_argument("--write", default=None, help="directory for the binned BRAM image")
+    args = parser.parse_args()
+
+    capture = open_capture(args.capture)
+    frames = capture.frame_indices()
+    if not len(frames):
+        sys.exit(f"{args.capture} has no frames")
+    frame = args.frame if args.frame is not None else max(frames, key=lambda i: len(capture.frame(i)))
+    bins = Bins(capture.frame(frame))
+    print(f"frame {frame}")
+    print(bins.report(args.index_cycles))
+    if args.write:
+        bins.write(args.write)
+        print(f"binned BRAM image in {args.write}")
+
+
+if __name__ == "__main__":
+    main()
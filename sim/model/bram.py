@@ -0,0 +1,103 @@
+"""Cycle accurate model of hdl/xilinx_true_dual_port_read_first_2_clock_ram.v.
+
+One DualPortRAM is any number of identical instances clocked together (the
+16 tile BRAMs of a tile row, say), stored as one (instances, depth) numpy
+array. Every call to clock() is one posedge on both ports:
+
+  - if en, the port reads BRAM[addr] before any write of this edge lands
+    (read first), and then BRAM[addr] <= din if we
+  - HIGH_PERFORMANCE: dout is that read one edge later (2 cycle latency),
+    rst clears it and regce holds it
+  - LOW_LATENCY: dout is the read itself (1 cycle latency), rst does nothing
+
+If both ports write the same address on the same edge port b wins, the
+verilog leaves it up to the simulator. Reads past depth give 0 and writes
+past depth are dropped.
+"""
+import numpy as np
+
+HIGH_PERFORMANCE = "HIGH_PERFORMANCE"
+LOW_LATENCY = "LOW_LATENCY"
+
+
+def read_memh(path, width=32):
+    """Words of a $readmemh file, one per whitespace separated token."""
+    with open(path) as f:
+        words = [int(w, 16) for w in f.read().split() if not w.startswith("//")]
+    return np.array(words, dtype=_dtype(width))
+
+
+def write_memh(path, words, width=32):
+    """One zero padded hex word per line, what $readmemh and INIT_FILE take."""
+    digits = (width + 3) // 4
+    with open(path, "w") as f:
+        f.writelines(f"{int(w):0{digits}x}\n" for w in words)
+
+
+def _dtype(width):
+    # wider than 64 bits (the 160 bit triangle BRAM) falls back to python ints
+    return np.uint64 if width <= 64 else object
+
+
+class DualPortRAM:
+
+    def __init__(self, width=18, depth=1024, performance=HIGH_PERFORMANCE, init_file=None, instances=1):
+        if performance not in (HIGH_PERFORMANCE, LOW_LATENCY):
+            raise ValueError(f"RAM_PERFORMANCE must be {HIGH_PERFORMANCE} or {LOW_LATENCY}, not {performance}")
+        self.width = width
+        self.depth = depth
+        self.performance = performance
+        self.latency = 2 if performance == HIGH_PERFORMANCE else 1
+        self.instances = instances
+        self.mask = (1 << width) - 1
+        dtype = _dtype(width)
+        self.mem = np.zeros((instances, depth), dtype=dtype)
+        if init_file is not None:
+            init = read_memh(init_file, width)[:depth]
+            self.mem[:, :len(init)] = init
+        # ram_data_a/b and douta_reg/doutb_reg, one row per port
+        self.ram_data = np.zeros((2, instances), dtype=dtype)
+        self.dout_reg = np.zeros((2, instances), dtype=dtype)
+
+    def load(self, words, instance=None, offset=0):
+        """Backdoor write of `words` starting at `offset`, into every instance
+        or just one."""
+        words = np.asarray(words, dtype=self.mem.dtype) & self.mem.dtype.type(self.mask)
+        rows = slice(None) if instance is None else instance
+        self.mem[rows, offset:offset + len(words)] = words
+
+    @property
+    def douta(self):
+        return self.dout_reg[0] if self.latency == 2 else self.ram_data[0]
+
+    @property
+    def doutb(self):
+        return self.dout_reg[1] if self.latency == 2 else self.ram_data[1]
+
+    def _port(self, addr, din, we, en):
+        addr = np.broadcast_to(np.asarray(addr, dtype=np.int64), (self.instances,))
+        en = np.broadcast_to(np.asarray(en, dtype=bool), (self.instances,))
+        we = np.broadcast_to(np.asarray(we, dtype=bool), (self.instances,)) & en
+        din = np.broadcast_to(np.asarray(din, dtype=self.mem.dtype), (self.instances,)) & self.mem.dtype.type(self.mask)
+        in_range = (addr >= 0) & (addr < self.depth)
+        return addr, din, we & in_range, en, in_range
+
+    def clock(self, addra=0, dina=0, wea=0, ena=1, rsta=0, regcea=1,
+              addrb=0, dinb=0, web=0, enb=1, rstb=0, regceb=1):
+        """One posedge of clka and clkb. Every argument is a scalar or one
+        value per instance. Returns (douta, doutb) after the edge."""
+        rows = np.arange(self.instances)
+        ports = [self._port(addra, dina, wea, ena), self._port(addrb, dinb, web, enb)]
+        old_ram_data = self.ram_data.copy()
+        for p, (addr, _, _, en, in_range) in enumerate(ports):
+            read = np.zeros(self.instances, dtype=self.mem.dtype)
+            read[in_range] = self.mem[rows[in_range], addr[in_range]]
+            self.ram_data[p] = np.where(en, read, self.ram_data[p])
+        for addr, din, we, _, _ in ports:
+            self.mem[rows[we], addr[we]] = din[we]
+        if self.latency == 2:
+            for p, (rst, regce) in enumerate(((rsta, regcea), (rstb, regceb))):
+                rst = np.broadcast_to(np.asarray(rst, dtype=bool), (self.instances,))
+                regce = np.broadcast_to(np.asarray(regce, dtype=bool), (self.instances,))
+                self.dout_reg[p] = np.where(rst, 0, np.where(regce, old_ram_data[p], self.dout_reg[p]))
+        return self.douta.copy(), self.doutb.copy()
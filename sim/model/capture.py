@@ -0,0 +1,153 @@
+"""Binary capture files for testbench output, readable with np.memmap.
+
+Layout:
+    magic b"\\x93FSCAP", version (2 bytes), header length (uint32 LE),
+    header: a python dict literal {"dtype": ..., "shape": ..., "records": ...},
+    padded so the data starts on a 64 byte boundary,
+    then fixed size records of (index int64, data dtype[shape]).
+
+A record is one frame for image captures (shape (720, 1280) say) or one
+triangle for projector captures (shape ()). index is the frame number the
+record belongs to, so all the triangles of frame 3 have index 3.
+
+Records are appended as they come in and the record count in the header is
+only updated on close, so readers go by the file size instead. A capture
+that was cut short (sim crashed) still opens fine.
+"""
+import ast
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b"\x93FSCAP"
+VERSION = (1, 0)
+ALIGN = 64
+# room for the record count to grow without moving the data
+_COUNT_WIDTH = 20
+
+
+def _record_dtype(dtype, shape):
+    return np.dtype([("index", "<i8"), ("data", np.dtype(dtype), tuple(shape))])
+
+
+def _header(dtype, shape, records):
+    descr = np.lib.format.dtype_to_descr(np.dtype(dtype))
+    text = "{'dtype': %r, 'shape': %r, 'records': %-*d}" % (descr, tuple(shape), _COUNT_WIDTH, records)
+    prefix = len(MAGIC) + 2 + 4
+    pad = -(prefix + len(text) + 1) % ALIGN
+    return (text + " " * pad + "\n").encode("latin1")
+
+
+def _read_header(f):
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f"{f.name} is not a capture file")
+    major, _ = struct.unpack("<BB", f.read(2))
+    if major != VERSION[0]:
+        raise ValueError(f"{f.name}: capture version {major} not supported")
+    (length,) = struct.unpack("<I", f.read(4))
+    header = ast.literal_eval(f.read(length).decode("latin1"))
+    header["dtype"] = np.lib.format.descr_to_dtype(header["dtype"])
+    header["offset"] = len(MAGIC) + 2 + 4 + length
+    return header
+
+
+class CaptureWriter:
+    """Streams records into a capture file.
+
+    Records get staged in a preallocated buffer and written out in chunks
+    of `chunk` records, so writing single triangles is still cheap.
+    """
+
+    def __init__(self, path, dtype, shape=(), chunk=None):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.shape = tuple(shape)
+        self.record = _record_dtype(self.dtype, self.shape)
+        if chunk is None:
+            # about 4MB per write, at least a record
+            chunk = max(1, (4 << 20) // self.record.itemsize)
+        self._buffer = np.zeros(chunk, dtype=self.record)
+        self._pending = 0
+        self.records = 0
+        self._file = open(path, "wb")
+        self._write_header()
+
+    def _write_header(self):
+        header = _header(self.dtype, self.shape, self.records)
+        self._file.write(MAGIC + struct.pack("<BB", *VERSION) + struct.pack("<I", len(header)) + header)
+
+    def write(self, data, index=0):
+        """Append one record (one frame, one triangle, ...)."""
+        if self._pending == len(self._buffer):
+            self.flush()
+        self._buffer["index"][self._pending] = index
+        self._buffer["data"][self._pending] = data
+        self._pending += 1
+        self.records += 1
+
+    def write_many(self, data, index=0):
+        """Append len(data) records that all belong to frame `index`."""
+        self.flush()
+        out = np.zeros(len(data), dtype=self.record)
+        out["index"] = index
+        out["data"] = data
+        self._file.write(out.tobytes())
+        self.records += len(data)
+
+    def flush(self):
+        if self._pending:
+            self._file.write(self._buffer[:self._pending].tobytes())
+            self._pending = 0
+        self._file.flush()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.seek(0)
+        self._write_header()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Capture:
+    """A capture file opened with np.memmap, nothing is parsed or copied.
+
+    data[i] / index[i] are record i's payload and frame number.
+    """
+
+    def __init__(self, path, mode="r"):
+        self.path = path
+        with open(path, "rb") as f:
+            header = _read_header(f)
+        self.dtype = header["dtype"]
+        self.shape = tuple(header["shape"])
+        record = _record_dtype(self.dtype, self.shape)
+        records = (os.path.getsize(path) - header["offset"]) // record.itemsize
+        if records:
+            self.records = np.memmap(path, dtype=record, mode=mode, offset=header["offset"], shape=(records,))
+        else:
+            self.records = np.zeros(0, dtype=record)
+        self.data = self.records["data"]
+        self.index = self.records["index"]
+
+    def __len__(self):
+        return len(self.records)
+
+    def frame(self, index):
+        """Every record of frame `index` (indices are written in order)."""
+        lo, hi = np.searchsorted(self.index, [index, index + 1])
+        return self.data[lo:hi]
+
+    def frame_indices(self):
+        return np.unique(np.asarray(self.index))
+
+
+def open_capture(path, mode="r"):
+    return Capture(path, mode)
@@ -0,0 +1,173 @@
+"""Packing / unpacking of the wire formats the HDL passes around.
+
+triangle (160 bits): color|p1x|p1y|p2x|p2y|p3x|p3y|P(24)|nx(8)|ny(8)|nz(8)
+obstacle (16 bits):  type(3)|lane(2)|depth(11)
+vertex (48 bits):    x|y|z, all signed 16 bits
+
+In bulk, triangles and obstacles live in numpy structured arrays
+(TRIANGLE_DTYPE / OBSTACLE_DTYPE) and go to and from raw little endian
+buffers, ie the bytes of the packed value starting from bit 0, 20 bytes per
+triangle and 2 per obstacle. Nothing here loops over triangles in python
+except the conversions to and from python big ints.
+"""
+import numpy as np
+
+TRIANGLE_BYTES = 20
+
+# (name, lsb, width, signed) for every field of the 160 bit triangle
+TRIANGLE_FIELDS = [
+    ("color", 144, 16, False),
+    ("p1x", 128, 16, True),
+    ("p1y", 112, 16, True),
+    ("p2x", 96, 16, True),
+    ("p2y", 80, 16, True),
+    ("p3x", 64, 16, True),
+    ("p3y", 48, 16, True),
+    ("P", 24, 24, True),
+    ("nx", 16, 8, True),
+    ("ny", 8, 8, True),
+    ("nz", 0, 8, True),
+]
+
+TRIANGLE_DTYPE = np.dtype([
+    ("color", "<u2"),
+    ("p1x", "<i2"), ("p1y", "<i2"),
+    ("p2x", "<i2"), ("p2y", "<i2"),
+    ("p3x", "<i2"), ("p3y", "<i2"),
+    ("P", "<i4"),
+    ("nx", "i1"), ("ny", "i1"), ("nz", "i1"),
+])
+
+# TRIANGLE_DTYPE is all little endian and every field is byte aligned on the
+# wire, so encoding is one byte gather: _WIRE_BYTES[j] is the byte of a
+# TRIANGLE_DTYPE record that ends up as byte j on the wire. P is 4 bytes in
+# the record and 3 on the wire, its top byte is just sign extension.
+def _wire_bytes():
+    index = np.zeros(TRIANGLE_BYTES, dtype=np.intp)
+    for name, lsb, width, _ in TRIANGLE_FIELDS:
+        for b in range(width // 8):
+            index[lsb // 8 + b] = TRIANGLE_DTYPE.fields[name][1] + b
+    return index
+
+
+_WIRE_BYTES = _wire_bytes()
+_WIRE_P_TOP_BYTE = 5  # bits 47:40
+_RECORD_P_TOP_BYTE = TRIANGLE_DTYPE.fields["P"][1] + 3
+
+OBSTACLE_DTYPE = np.dtype([("type", "u1"), ("lane", "u1"), ("depth", "<u2")])
+
+
+def wrap(value, bits):
+    """Two's complement wrap of value to a signed `bits` wide register."""
+    half = 1 << (bits - 1)
+    return ((value + half) & ((1 << bits) - 1)) - half
+
+
+################################### triangles ###################################
+
+def encode_triangles(triangles):
+    """Structured TRIANGLE_DTYPE array -> little endian bytes, 20 per triangle."""
+    triangles = np.ascontiguousarray(triangles, dtype=TRIANGLE_DTYPE)
+    record = triangles.view(np.uint8).reshape(-1, TRIANGLE_DTYPE.itemsize)
+    return np.take(record, _WIRE_BYTES, axis=1).tobytes()
+
+
+def decode_triangles(buffer):
+    """Little endian bytes (or anything with the buffer protocol, like an
+    np.memmap) -> structured TRIANGLE_DTYPE array."""
+    wire = np.frombuffer(buffer, dtype=np.uint8).reshape(-1, TRIANGLE_BYTES)
+    record = np.empty((len(wire), TRIANGLE_DTYPE.itemsize), dtype=np.uint8)
+    record[:, _WIRE_BYTES] = wire
+    record[:, _RECORD_P_TOP_BYTE] = (wire[:, _WIRE_P_TOP_BYTE] >> 7) * 0xFF
+    return record.view(TRIANGLE_DTYPE).reshape(-1)
+
+
+def triangles_from_ints(ints):
+    """160 bit python ints (what cocotb hands back) -> structured array."""
+    return decode_triangles(b"".join(int(t).to_bytes(TRIANGLE_BYTES, "little") for t in ints))
+
+
+def triangles_to_ints(triangles):
+    """Structured array -> 160 bit python ints, ready for dut.triangle.value."""
+    raw = encode_triangles(triangles)
+    return [int.from_bytes(raw[i:i + TRIANGLE_BYTES], "little") for i in range(0, len(raw), TRIANGLE_BYTES)]
+
+
+def as_triangles(triangles):
+    """Whatever triangles we were given (structured array, raw bytes, python
+    ints) as a structured array."""
+    if isinstance(triangles, np.ndarray) and triangles.dtype.names:
+        return triangles.astype(TRIANGLE_DTYPE, copy=False)
+    if isinstance(triangles, (bytes, bytearray, memoryview)):
+        return decode_triangles(triangles)
+    return triangles_from_ints(triangles)
+
+
+def unpack_triangles(triangles):
+    """Triangles as a dict of int64 field arrays, signed fields sign extended.
+
+    The bit true models do their math on these so nothing overflows early.
+    """
+    triangles = as_triangles(triangles)
+    return {name: triangles[name].astype(np.int64) for name in TRIANGLE_DTYPE.names}
+
+
+def pack_triangles(fields):
+    """Dict of field arrays (like unpack_triangles gives) -> 160 bit python
+    ints. Fields are truncated to their width first, same as the wires."""
+    n = len(fields["color"])
+    triangles = np.empty(n, dtype=TRIANGLE_DTYPE)
+    for name, _, width, is_signed in TRIANGLE_FIELDS:
+        value = np.asarray(fields[name], dtype=np.int64)
+        triangles[name] = wrap(value, width) if is_signed else value & ((1 << width) - 1)
+    return triangles_to_ints(triangles)
+
+
+def convert_to_triangle(color, p1x, p1y, p2x, p2y, p3x, p3y, total_depth=0):
+    """One 160 bit triangle. total_depth is the low 48 bits, P|nx|ny|nz."""
+    t = color & 0xFFFF
+    for c in (p1x, p1y, p2x, p2y, p3x, p3y):
+        t = (t << 16) | (c & 0xFFFF)
+    return (t << 48) | (total_depth & (2**48 - 1))
+
+
+################################### obstacles ###################################
+
+def obstacles_to_words(obstacles):
+    """Structured OBSTACLE_DTYPE array -> uint16 obstacle words."""
+    obstacles = np.asarray(obstacles, dtype=OBSTACLE_DTYPE)
+    return (
+        ((obstacles["type"].astype(np.uint16) & 0x7) << 13)
+        | ((obstacles["lane"].astype(np.uint16) & 0x3) << 11)
+        | (obstacles["depth"] & 0x7FF)
+    ).astype(np.uint16)
+
+
+def obstacles_from_words(words):
+    """uint16 obstacle words -> structured OBSTACLE_DTYPE array."""
+    words = np.asarray(words, dtype=np.uint16)
+    obstacles = np.empty(words.shape, dtype=OBSTACLE_DTYPE)
+    obstacles["type"] = words >> 13
+    obstacles["lane"] = (words >> 11) & 0x3
+    obstacles["depth"] = words & 0x7FF
+    return obstacles
+
+
+def encode_obstacles(obstacles):
+    return obstacles_to_words(obstacles).astype("<u2").tobytes()
+
+
+def decode_obstacles(buffer):
+    return obstacles_from_words(np.frombuffer(buffer, dtype="<u2"))
+
+
+def convert_to_obstacle(type, lane, depth):
+    """One 16 bit obstacle."""
+    return ((type & 0x7) << 13) | ((lane & 0x3) << 11) | (depth & 0x7FF)
+
+
+#################################### vertices ###################################
+
+def convert_to_vertex(x, y, z):
+    """One 48 bit vertex, coords are signed 16 bits."""
+    return ((x & 0xFFFF) << 32) | ((y & 0xFFFF) << 16) | (z & 0xFFFF)
@@ -0,0 +1,97 @@
+"""Bit exact model of hdl/ddd_projector.sv.
+
+Every vertex is projected on its own: |x| << LOG_D and |z| get shifted right
+until the dividend fits in 16 bits, go through divider3, get their sign back
+and are offset to the middle of the screen. The normal is the cross product
+of v1 - v2 and v1 - v3, done in 20 bits and >>> 4, then shifted right by
+cshift so the biggest component fits in a signed byte. P = n . v1 in 24 bits.
+"""
+import numpy as np
+
+from codec import pack_triangles, wrap
+from divider3 import divider3
+
+LOG_D = 8
+WIDTH = 1280
+HEIGHT = 720
+
+
+def _bit_length(v):
+    return np.frexp(np.asarray(v, dtype=np.float64))[1].astype(np.int64)
+
+
+def _magnitude(v):
+    # 16'hFFFF - v + 1 for negative inputs, so -32768 stays 32768
+    v = v & 0xFFFF
+    neg = (v >> 15).astype(bool)
+    return neg, np.where(neg, (0x10000 - v) & 0xFFFF, v)
+
+
+def project_coord(c, z, offset, log_d=LOG_D):
+    """Screen coordinate of one vertex coordinate (x or y) at depth z."""
+    neg, mag = _magnitude(np.asarray(c, dtype=np.int64))
+    _, z_mag = _magnitude(np.asarray(z, dtype=np.int64))
+    scaled = (mag << log_d) & 0xFFFFFF
+    shift = np.maximum(_bit_length(scaled) - 16, 0)
+    q = divider3((scaled >> shift) & 0xFFFF, (z_mag >> shift) & 0xFFFF)[0]
+    return wrap(np.where(neg, 0x10000 - q, q) + offset, 16)
+
+
+def _log2(c):
+    # log2.sv, really the bit length of |c| as a 20 bit number
+    return _bit_length(np.abs(c) & 0xFFFFF)
+
+
+def _cross(v):
+    a = wrap(v[:, 0] - v[:, 1], 16)
+    b = wrap(v[:, 0] - v[:, 2], 16)
+    ax, ay, az = a[:, 0], a[:, 1], a[:, 2]
+    bx, by, bz = b[:, 0], b[:, 1], b[:, 2]
+    # the whole expression is 20 bits wide, so the products wrap before the shift
+    return [
+        wrap(ay * bz - az * by, 20) >> 4,
+        wrap(az * bx - ax * bz, 20) >> 4,
+        wrap(ax * by - ay * bx, 20) >> 4,
+    ]
+
+
+def _cshift(c_raw):
+    big_log = np.maximum(np.maximum(_log2(c_raw[0]), _log2(c_raw[1])), _log2(c_raw[2]))
+    return np.where(big_log > 7, big_log - 7, 0)
+
+
+def cshift(vertices):
+    """How far the normal gets shifted right to fit 8 bits, per triangle."""
+    return _cshift(_cross(wrap(np.asarray(vertices, dtype=np.int64), 16)))
+
+
+def normal(vertices):
+    """(cx, cy, cz, P) for (N, 3, 3) vertices, as the 8 and 24 bit outputs."""
+    v = wrap(np.asarray(vertices, dtype=np.int64), 16)
+    c_raw = _cross(v)
+    shift = _cshift(c_raw)
+    cx, cy, cz = (wrap(c >> shift, 8) for c in c_raw)
+    P = wrap(
+        wrap(cx * v[:, 0, 0], 24) + wrap(cy * v[:, 0, 1], 24) + wrap(cz * v[:, 0, 2], 24), 24
+    )
+    return cx, cy, cz, P
+
+
+def ddd_projector(vertices, colors, log_d=LOG_D, width=WIDTH, height=HEIGHT):
+    """Triangle fields (see codec.TRIANGLE_FIELDS) for (N, 3, 3) vertices.
+
+    vertices[i] is the three (x, y, z) vertices of triangle i in the order they
+    are fed in, colors[i] is the color that comes with new_triangle_in.
+    """
+    v = np.asarray(vertices, dtype=np.int64).reshape(-1, 3, 3)
+    fields = {"color": np.asarray(colors, dtype=np.int64).reshape(-1) & 0xFFFF}
+    for k in range(3):
+        fields[f"p{k + 1}x"] = project_coord(v[:, k, 0], v[:, k, 2], width // 2, log_d)
+        fields[f"p{k + 1}y"] = project_coord(v[:, k, 1], v[:, k, 2], height // 2, log_d)
+    fields["nx"], fields["ny"], fields["nz"], fields["P"] = normal(v)
+    return fields
+
+
+def project(vertices, colors, log_d=LOG_D):
+    """Same as ddd_projector, packed into 160 bit ints like the triangle output."""
+    return pack_triangles(ddd_projector(vertices, colors, log_d))
@@ -0,0 +1,83 @@
+"""Bit exact model of hdl/depth_calculator.sv.
+
+depth = (|P| << LOG_D) / |n . (x, y, 1 << LOG_D)|, where both sides get shifted
+right until |P| << LOG_D fits in 16 bits (the divisor is just truncated to 16
+bits after the same shift) and then go through divider3.
+"""
+import numpy as np
+
+from codec import unpack_triangles, wrap
+from divider3 import divider3
+from small_multiplier import small_multiplier
+
+LOG_D = 8
+WIDTH = 1280
+HEIGHT = 720
+
+
+def _bit_length(v):
+    # exact for anything below 2**53, 0 for 0
+    return np.frexp(np.asarray(v, dtype=np.float64))[1].astype(np.int64)
+
+
+def n_dot_pixel(fields, x_coord, y_coord, log_d=LOG_D):
+    """signed 20 bit n_dot_pixel register for x_coord / y_coord port values."""
+    x = wrap(np.asarray(x_coord, dtype=np.int64), 11)
+    y = wrap(np.asarray(y_coord, dtype=np.int64), 10)  # sign extended to 11 bits
+    nx_times_x = wrap(x * fields["nx"], 19)
+    ny_times_y = small_multiplier(y, fields["ny"])
+    nz_times_z = wrap(fields["nz"] << log_d, 19)
+    return wrap(nx_times_x + ny_times_y + nz_times_z, 20)
+
+
+def divide_depth(P, n_dot, log_d=LOG_D):
+    """Normalization shift, truncation and divider3 stage of the datapath."""
+    P_left = ((np.abs(np.asarray(P, dtype=np.int64)) & 0xFFFFFF) << log_d) & 0xFFFFFFFF
+    n_abs = np.abs(np.asarray(n_dot, dtype=np.int64)) & 0xFFFFF
+    # leading one of P_left in bits 31..16 moves to bit 15
+    shift = np.maximum(_bit_length(P_left) - 16, 0)
+    dividend = (P_left >> shift) & 0xFFFF
+    divisor = (n_abs >> shift) & 0xFFFF
+    return divider3(dividend, divisor)[0]
+
+
+def depth_calculator(fields, x_coord, y_coord, log_d=LOG_D):
+    """16 bit depth output for every (triangle, x_coord, y_coord), broadcasting.
+
+    x_coord / y_coord are the depth_calculator ports, ie already centered
+    on the middle of the screen.
+    """
+    return divide_depth(fields["P"], n_dot_pixel(fields, x_coord, y_coord, log_d), log_d)
+
+
+def centered(x, y, width=WIDTH, height=HEIGHT):
+    """Screen coords -> depth_calculator port values, as tile_painter does it."""
+    x = np.asarray(x, dtype=np.int64) & 0x7FF
+    y = np.asarray(y, dtype=np.int64) & 0x3FF
+    return wrap(x - width // 2, 11), wrap(y - height // 2, 10)
+
+
+def pixel_depth(fields, x, y, log_d=LOG_D):
+    """depth for screen coords (x, y) in [0, 1280) x [0, 720)."""
+    return depth_calculator(fields, *centered(x, y), log_d)
+
+
+def depth_mask(fields, index=0, width=WIDTH, height=HEIGHT, log_d=LOG_D):
+    """(height, width) uint16 depths of triangle `index` at every pixel."""
+    f = {k: v[index:index + 1] for k, v in fields.items()}
+    xs, ys = centered(np.arange(width), np.arange(height), width, height)
+    # x and y terms are separable, only the sum and the division are per pixel
+    x_term = wrap(xs * f["nx"], 19)[None, :]
+    y_term = small_multiplier(ys, f["ny"])[:, None]
+    n_dot = wrap(x_term + y_term + wrap(f["nz"] << log_d, 19), 20)
+    return divide_depth(f["P"], n_dot, log_d).astype(np.uint16)
+
+
+def depth_frame(triangles, width=WIDTH, height=HEIGHT, log_d=LOG_D):
+    """(N, height, width) uint16 depths for a list of packed triangles."""
+    fields = unpack_triangles(triangles)
+    n = len(fields["color"])
+    out = np.empty((n, height, width), dtype=np.uint16)
+    for i in range(n):
+        out[i] = depth_mask(fields, i, width, height, log_d)
+    return out
@@ -0,0 +1,22 @@
+"""Bit exact model of hdl/divider3.sv (16 stage restoring divider)."""
+import numpy as np
+
+
+def divider3(dividend, divisor, width=16):
+    """Returns (quotient_out, remainder_out) for arrays of unsigned inputs.
+
+    Same as the RTL, the partial remainder is only `width` bits wide, so
+    it does not match true division once the divisor uses the top bit, and
+    dividing by 0 gives an all ones quotient.
+    """
+    mask = (1 << width) - 1
+    q = np.asarray(dividend, dtype=np.int64) & mask
+    d = np.asarray(divisor, dtype=np.int64) & mask
+    p = np.zeros(np.broadcast(q, d).shape, dtype=np.int64)
+    for _ in range(width):
+        # {p[14:0], dividend[15]}
+        t = ((p << 1) | (q >> (width - 1))) & mask
+        ge = t >= d
+        p = np.where(ge, t - d, t)
+        q = ((q << 1) & mask) | ge
+    return q, p
@@ -0,0 +1,361 @@
+"""Design space explorer for the fixed point widths of ddd_projector and
+depth_calculator.
+
+The datapath both models implement, with every width that is a choice
+pulled out into a FixedPoint:
+
+  log_d          LOG_D, the projection plane at z = 1 << log_d (it scales
+                 the picture too, so error is measured against the exact
+                 depth at the same log_d)
+  cross_width    the normal's cross product expression, 20 bits
+  cross_shift    the >>> 4 after it
+  normal_bits    nx / ny / nz, 8 bits, cshift shifts the biggest one to fit
+  p_width        P = n . v1, 24 bits
+  divider_width  divider3, and what both dividers normalize down to, 16 bits
+
+FixedPoint() is the HDL as it is, check() makes sure it is still bit exact
+against ddd_projector.py and depth_calculator.py.
+
+For every config, every recorded scene (scene.scenes(), game frames pushed
+through the triangle_creator / sprite_creator tables) is projected and
+depth tested the tile_painter way, on a grid of every `stride`th pixel,
+and compared with exact float projection and depth:
+
+  depth error    |depth - z| over every covered pixel, and relative to z
+  wrong pixels   the nearest triangle isn't the one that gets painted
+                 (a tie or an error flipping the order), not counting
+                 pixels where the exact depths are equal anyway
+  ties           pixels where two triangles get the same depth but the
+                 exact depths differ
+
+The cost side is the multiplier and divider widths the config needs:
+DSP48E1 slices (25 x 18) for the multipliers, one depth_calculator per
+painter, divider cells (stages x width) for the three dividers, and the
+bits of the cross products, of P and of the dividends the dividers
+normalize (16 + log_d in ddd_projector, p_width + log_d per painter). The
+DSPs hardly ever change, every product fits one, so the widths are what
+tells most configs apart.
+
+    python sim/model/fixed_point.py                          # one knob at a time around the HDL
+    python sim/model/fixed_point.py --normal-bits 6 8 10 --log-d 7 8 9 --grid
+    python sim/model/fixed_point.py --random 200      # tilted triangles, game geometry is axis aligned
+"""
+import argparse
+import itertools
+
+import numpy as np
+
+from codec import wrap
+from divider3 import divider3
+from pixel_calculator import pixel_inside
+from renderer import HEIGHT, N_WAY_PARALLEL, WIDTH
+
+DEFAULTS = {"log_d": 8, "cross_width": 20, "cross_shift": 4, "normal_bits": 8, "p_width": 24, "divider_width": 16}
+# values tried one at a time around the defaults
+SWEEP = {
+    "log_d": [6, 7, 8, 9, 10],
+    "cross_width": [18, 20, 22, 24],
+    "cross_shift": [0, 2, 4, 6],
+    "normal_bits": [6, 7, 8, 10, 12],
+    "p_width": [20, 22, 24, 28],
+    "divider_width": [12, 14, 16, 18, 20],
+}
+DEPTH_BITS = 16
+NO_DEPTH = (1 << DEPTH_BITS) - 1
+
+
+def _bit_length(v):
+    return np.frexp(np.asarray(v, dtype=np.float64))[1].astype(np.int64)
+
+
+def _dsp(a, b):
+    # DSP48E1 is a 25 x 18 signed multiplier
+    a, b = max(a, b), min(a, b)
+    return -(-a // 25) * -(-b // 18) if b > 18 else -(-a // 25)
+
+
+class FixedPoint:
+    """One point of the design space, the HDL's by default."""
+
+    def __init__(self, **widths):
+        unknown = set(widths) - set(DEFAULTS)
+        if unknown:
+            raise TypeError(f"unknown widths {sorted(unknown)}")
+        self.widths = {**DEFAULTS, **widths}
+        for name, value in self.widths.items():
+            setattr(self, name, value)
+
+    def __repr__(self):
+        changed = [f"{k}={v}" for k, v in self.widths.items() if v != DEFAULTS[k]]
+        return "FixedPoint(" + ", ".join(changed) + ")"
+
+    @property
+    def name(self):
+        changed = [f"{k}={v}" for k, v in self.widths.items() if v != DEFAULTS[k]]
+        return ", ".join(changed) or "HDL"
+
+    ######################## ddd_projector ########################
+
+    def project_coord(self, c, z, offset):
+        c = wrap(np.asarray(c, dtype=np.int64), 16)
+        z = np.abs(wrap(np.asarray(z, dtype=np.int64), 16))
+        scaled = (np.abs(c) << self.log_d) & ((1 << (16 + self.log_d)) - 1)
+        shift = np.maximum(_bit_length(scaled) - self.divider_width, 0)
+        q = divider3(scaled >> shift, z >> shift, self.divider_width)[0]
+        return wrap(np.where(c < 0, -q, q) + offset, 16)
+
+    def normal(self, vertices):
+        v = wrap(np.asarray(vertices, dtype=np.int64), 16)
+        a = wrap(v[:, 0] - v[:, 1], 16)
+        b = wrap(v[:, 0] - v[:, 2], 16)
+        cross = [a[:, 1] * b[:, 2] - a[:, 2] * b[:, 1],
+                 a[:, 2] * b[:, 0] - a[:, 0] * b[:, 2],
+                 a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0]]
+        c = [wrap(x, self.cross_width) >> self.cross_shift for x in cross]
+        mask = (1 << self.cross_width) - 1
+        big = np.max([_bit_length(np.abs(x) & mask) for x in c], axis=0)
+        cshift = np.maximum(big - (self.normal_bits - 1), 0)
+        n = [wrap(x >> cshift, self.normal_bits) for x in c]
+        P = wrap(sum(wrap(n[k] * v[:, 0, k], self.p_width) for k in range(3)), self.p_width)
+        return n[0], n[1], n[2], P
+
+    def project(self, vertices, colors):
+        """Triangle fields like ddd_projector.ddd_projector."""
+        v = np.asarray(vertices, dtype=np.int64).reshape(-1, 3, 3)
+        fields = {"color": np.asarray(colors, dtype=np.int64).reshape(-1) & 0xFFFF}
+        for k in range(3):
+            fields[f"p{k + 1}x"] = self.project_coord(v[:, k, 0], v[:, k, 2], WIDTH // 2)
+            fields[f"p{k + 1}y"] = self.project_coord(v[:, k, 1], v[:, k, 2], HEIGHT // 2)
+        fields["nx"], fields["ny"], fields["nz"], fields["P"] = self.normal(v)
+        return fields
+
+    ####################### depth_calculator #######################
+
+    @property
+    def product_bits(self):
+        # nx * x, ny * y: an 11 bit coordinate times a normal
+        return self.normal_bits + 11
+
+    @property
+    def n_dot_bits(self):
+        return self.product_bits + 1
+
+    @property
+    def dividend_bits(self):
+        """P << log_d, what depth_calculator normalizes into its divider."""
+        return self.p_width + self.log_d
+
+    def depth(self, fields, x_coord, y_coord):
+        """depth_calculator for centered port values."""
+        x = wrap(np.asarray(x_coord, dtype=np.int64), 11)
+        y = wrap(np.asarray(y_coord, dtype=np.int64), 10)
+        n_dot = wrap(wrap(x * fields["nx"], self.product_bits) + wrap(y * fields["ny"], self.product_bits)
+                     + wrap(fields["nz"] << self.log_d, self.product_bits), self.n_dot_bits)
+        P_left = ((np.abs(fields["P"]) & ((1 << self.p_width) - 1)) << self.log_d) & ((1 << self.dividend_bits) - 1)
+        n_abs = np.abs(n_dot) & ((1 << self.n_dot_bits) - 1)
+        shift = np.maximum(_bit_length(P_left) - self.divider_width, 0)
+        q = divider3(P_left >> shift, n_abs >> shift, self.divider_width)[0]
+        # the tile BRAM only keeps 16 bits of depth
+        return np.minimum(q, NO_DEPTH)
+
+    ############################# cost #############################
+
+    def cost(self):
+        """{what: count} of the hardware this config needs."""
+        nb = self.normal_bits
+        return {
+            # 6 cross products, 3 for P in ddd_projector, nx * x in every depth_calculator
+            "dsp": 6 * _dsp(16, 16) + 3 * _dsp(nb, 16) + N_WAY_PARALLEL * _dsp(nb, 11),
+            # ny * y is small_multiplier's shift and add, a stage per normal bit
+            "small multiplier bits": N_WAY_PARALLEL * nb * self.product_bits,
+            # 2 dividers in ddd_projector, one per depth_calculator
+            "divider cells": (2 + N_WAY_PARALLEL) * self.divider_width ** 2,
+            # the 6 products kept to cross_width, then the 3 shifted terms cshift searches
+            "cross bits": 6 * self.cross_width + 3 * (self.cross_width - self.cross_shift),
+            # n . v1: 3 products and their sum, kept to p_width
+            "P bits": 3 * min(nb + 16, self.p_width) + self.p_width,
+            # what gets shifted down to divider_width: |c| << log_d twice, P << log_d per painter
+            "dividend bits": 2 * (16 + self.log_d) + N_WAY_PARALLEL * self.dividend_bits,
+        }
+
+    def sort_key(self):
+        """Cheapest first: DSPs, then dividers, then the adder and shifter bits."""
+        cost = self.cost()
+        return (cost["dsp"], cost["divider cells"], cost["dividend bits"], cost["cross bits"] + cost["P bits"],
+                cost["small multiplier bits"])
+
+
+def check(samples=20000, seed=0):
+    """FixedPoint() against the bit exact models, raises if they differ."""
+    from ddd_projector import ddd_projector
+    from depth_calculator import depth_calculator
+
+    rng = np.random.default_rng(seed)
+    v = np.stack([rng.integers(-2000, 2000, (samples, 3)), rng.integers(-2000, 2000, (samples, 3)),
+                  rng.integers(1, 4000, (samples, 3))], axis=2)
+    colors = rng.integers(0, 1 << 16, samples)
+    exact = ddd_projector(v, colors)
+    ours = FixedPoint().project(v, colors)
+    for name in exact:
+        if not np.array_equal(exact[name], ours[name]):
+            raise AssertionError(f"FixedPoint().project differs from ddd_projector in {name}")
+    x, y = rng.integers(-640, 640, samples), rng.integers(-360, 360, samples)
+    if not np.array_equal(depth_calculator(exact, x, y), FixedPoint().depth(exact, x, y)):
+        raise AssertionError("FixedPoint().depth differs from depth_calculator")
+
+
+def exact_depth(vertices, x_coord, y_coord, log_d):
+    """Float depth along the ray through centered pixel coords, per triangle."""
+    v = np.asarray(vertices, dtype=np.float64)
+    n = np.cross(v[:, 0] - v[:, 1], v[:, 0] - v[:, 2])
+    P = np.einsum("ij,ij->i", n, v[:, 0])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.abs(P * (1 << log_d) / (n[:, 0] * x_coord + n[:, 1] * y_coord + n[:, 2] * (1 << log_d)))
+
+
+class Result:
+    """Depth error and visibility counts of one config over some scenes."""
+
+    def __init__(self, config):
+        self.config = config
+        self.errors = []
+        self.relative = []
+        self.covered = 0
+        self.wrong = 0
+        self.ties = 0
+
+    def add_scene(self, vertices, colors, stride=4):
+        config = self.config
+        fields = config.project(vertices, colors)
+        xs = np.arange(0, WIDTH, stride)
+        ys = np.arange(0, HEIGHT, stride)
+        gx, gy = np.meshgrid(xs, ys)
+        cx, cy = gx - WIDTH // 2, gy - HEIGHT // 2
+        painted = np.full(gx.shape, NO_DEPTH, dtype=np.int64)
+        painted_z = np.full(gx.shape, np.inf)
+        nearest_z = np.full(gx.shape, np.inf)
+        any_covered = np.zeros(gx.shape, dtype=bool)
+        for i in range(len(vertices)):
+            f = {k: v[i:i + 1] for k, v in fields.items()}
+            # only look inside the bounding box
+            px = [int(f[f"p{k}x"][0]) for k in (1, 2, 3)]
+            py = [int(f[f"p{k}y"][0]) for k in (1, 2, 3)]
+            c0, c1 = np.searchsorted(xs, min(px)), np.searchsorted(xs, max(px), side="right")
+            r0, r1 = np.searchsorted(ys, min(py)), np.searchsorted(ys, max(py), side="right")
+            if c0 >= c1 or r0 >= r1:
+                continue
+            inside = np.zeros(gx.shape, dtype=bool)
+            inside[r0:r1, c0:c1] = pixel_inside(f, gx[r0:r1, c0:c1], gy[r0:r1, c0:c1])
+            if not inside.any():
+                continue
+            d = config.depth(f, cx[inside], cy[inside])
+            z = exact_depth(vertices[i:i + 1], cx[inside], cy[inside], config.log_d)
+            ok = np.isfinite(z)
+            self.errors.append(np.abs(d[ok] - z[ok]))
+            self.relative.append(np.abs(d[ok] - z[ok]) / np.maximum(z[ok], 1))
+            old, old_z = painted[inside], painted_z[inside]
+            self.ties += int(((d == old) & (old < NO_DEPTH) & (np.abs(z - old_z) > 0.5)).sum())
+            # tile_painter: written only if pixel_depth > triangle_depth
+            win = d < old
+            painted[inside] = np.where(win, d, old)
+            painted_z[inside] = np.where(win, z, old_z)
+            nearest_z[inside] = np.minimum(nearest_z[inside], z)
+            any_covered |= inside
+        self.covered += int(any_covered.sum())
+        self.wrong += int((any_covered & np.isfinite(nearest_z) & ~(painted_z <= nearest_z + 0.5)).sum())
+
+    def summary(self):
+        errors = np.concatenate(self.errors) if self.errors else np.zeros(1)
+        relative = np.concatenate(self.relative) if self.relative else np.zeros(1)
+        return {
+            "mean error": float(errors.mean()),
+            "p99 error": float(np.percentile(errors, 99)),
+            "max relative": float(relative.max()),
+            "wrong pixels": self.wrong,
+            "tie pixels": self.ties,
+            "covered": self.covered,
+        }
+
+
+def explore(configs, frames, stride=4):
+    """{config: Result} for every config over (vertices, colors) frames."""
+    results = {}
+    for config in configs:
+        result = Result(config)
+        for vertices, colors in frames:
+            result.add_scene(vertices, colors, stride)
+        results[config] = result
+    return results
+
+
+def random_frame(n, seed=0):
+    """n triangles at random angles in front of the camera. Game geometry is
+    all axis aligned, which any normal width gets exactly right."""
+    rng = np.random.default_rng(seed)
+    centers = np.stack([rng.integers(-300, 300, n), rng.integers(-200, 200, n), rng.integers(200, 1500, n)], axis=1)
+    vertices = centers[:, None, :] + rng.integers(-120, 120, (n, 3, 3))
+    return vertices, rng.integers(0, 1 << 16, n)
+
+
+def configs_one_at_a_time(sweep=SWEEP):
+    configs = [FixedPoint()]
+    for name, values in sweep.items():
+        configs += [FixedPoint(**{name: v}) for v in values if v != DEFAULTS[name]]
+    return configs
+
+
+def configs_grid(sweep):
+    names = list(sweep)
+    return [FixedPoint(**dict(zip(names, values))) for values in itertools.product(*(sweep[n] for n in names))]
+
+
+def report(results):
+    baseline = next((r for c, r in results.items() if c.name == "HDL"), None)
+    lines = [f"{'config':32s} {'dsp':>4s} {'div cells':>9s} {'cross':>5s} {'P':>4s} {'dividend':>8s}"
+             f" {'mean err':>9s} {'p99 err':>8s} {'max rel':>8s} {'wrong px':>9s} {'ties':>6s}"]
+    rows = []
+    for config, result in results.items():
+        s, cost = result.summary(), config.cost()
+        rows.append((config, s, cost))
+        lines.append(f"{config.name:32s} {cost['dsp']:4d} {cost['divider cells']:9d} {cost['cross bits']:5d}"
+                     f" {cost['P bits']:4d} {cost['dividend bits']:8d} {s['mean error']:9.2f}"
+                     f" {s['p99 error']:8.1f} {s['max relative']:8.1%} {s['wrong pixels']:9d} {s['tie pixels']:6d}")
+    if baseline is not None:
+        # as cheap as possible without painting more pixels wrong than the HDL does
+        limit = baseline.summary()["wrong pixels"]
+        good = [r for r in rows if r[1]["wrong pixels"] <= limit]
+        config, s, cost = min(good, key=lambda r: (*r[0].sort_key(), r[1]["mean error"]))
+        lines.append(f"cheapest with at most the HDL's {limit} wrong pixels: {config.name} "
+                     f"({cost['dsp']} DSPs, {cost['divider cells']} divider cells, {cost['cross bits']} cross, "
+                     f"{cost['P bits']} P and {cost['dividend bits']} dividend bits, mean error {s['mean error']:.2f})")
+    return "\n".join(lines)
+
+
+def main():
+    from scene import frame_vertices, scenes
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    for name in DEFAULTS:
+        parser.add_argument("--" + name.replace("_", "-"), type=int, nargs="+", default=None,
+                            help=f"values to try (default: {SWEEP[name]})")
+    parser.add_argument("--grid", action="store_true", help="every combination instead of one knob at a time")
+    parser.add_argument("--scenes", type=int, default=6, help="game frames to record")
+    parser.add_argument("--speed", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stride", type=int, default=4, help="test every stride'th pixel")
+    parser.add_argument("--random", type=int, default=0, help="add a scene of this many randomly tilted triangles")
+    args = parser.parse_args()
+
+    check()
+    sweep = {name: getattr(args, name) or ([DEFAULTS[name]] if args.grid else SWEEP[name]) for name in DEFAULTS}
+    configs = configs_grid(sweep) if args.grid else configs_one_at_a_time(sweep)
+    frames = [frame_vertices(s["obstacles"], s["player_height"], s["player_lane"], s["ducking"])
+              for s in scenes(args.scenes, args.speed, seed=args.seed)]
+    if args.random:
+        frames.append(random_frame(args.random, args.seed))
+    print(f"{len(configs)} configs, {len(frames)} scenes, every {args.stride}th pixel")
+    print(report(explore(configs, frames, args.stride)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""Transaction level model of hdl/high_definition_frame_buffer.sv.
+
+The path a frame takes through DDR3, in 128 bit chunks of 8 pixels:
+
+  renderer --> stacker --> camera_data_fifo --> traffic_generator <--> DDR3
+  HDMI <-- unstacker <-- pdfifo (read_axis) <--'
+
+Everything on the left runs on clk_controller (83.333 MHz, top_level renders
+off it too), the unstacker on clk_pixel (74.25 MHz). The model steps once per
+controller cycle:
+
+  - the renderer finishes a chunk every 8 pixels it writes, one pixel every
+    `throttle` cycles of WRITING_TO_DRAM (2 with dram_output_counter). Nothing
+    backpressures it: with camera_data_fifo full, stacker drops the pixels
+  - traffic_generator alternates RD_HDMI / WR_CAM every cycle and issues at
+    most one request per cycle, never while busy; reads only while
+    read_axis_af (prog_full of pdfifo, 116 of 128) is low
+  - DDR: a request completes `latency` cycles after it was accepted, in order.
+    Busy (o_wb_stall) while refreshing, while `max_outstanding` requests are
+    in flight, and for `row_miss` cycles after a request opens a new row in
+    its bank. The address is {row, bank, col} with 7 column bits
+  - read data goes straight into pdfifo: read_axis_ready is not looked at, a
+    full FIFO loses the chunk
+  - the unstacker pops a chunk every 8 pixels of active video, 1280x720 out
+    of 1650x750; a chunk that isn't there yet is an underflow
+
+Crossing camera_data_fifo and pdfifo takes `cdc` cycles, which is also how
+late prog_full sees the unstacker's pops.
+
+    fb = FrameBufferModel(throttle=1)
+    stats = fb.run(hdmi_frames=2)
+    print(stats.summary())
+    python sim/model/frame_buffer.py --compare
+"""
+import argparse
+from collections import deque
+
+import numpy as np
+
+from frame_time import FrameTime, painter_work
+from renderer import HEIGHT, N_WAY_PARALLEL, TILE_HEIGHT, TILE_WIDTH, WIDTH
+
+CONTROLLER_HZ = 100e6 * 10 / 12
+PIXEL_HZ = 74.25e6
+H_TOTAL = 1650
+V_TOTAL = 750
+
+CHUNK_PIXELS = 8
+CHUNK_BYTES = 16
+FRAME_CHUNKS = WIDTH * HEIGHT // CHUNK_PIXELS
+FIFO_DEPTH = 128
+PROG_FULL = FIFO_DEPTH - 12
+# command_fifo DEPTH=64 keeps one slot empty
+COMMAND_FIFO = 63
+COL_BITS = 7
+BANK_BITS = 3
+
+# top_level START + WAIT before the projector even starts
+TOP_LEVEL_CYCLES = 1 + 101 + 1
+
+
+def render_chunk_cycles(timing, throttle=2, generation=0):
+    """Cycle, from the start of a render frame, at which every chunk of it
+    leaves the stacker, and the frame's length in cycles.
+
+    timing is a FrameTime, generation the cycles top_level waits on the
+    projector. The pixel at WRITING_TO_DRAM cycle k of row r is written at
+    cycle throttle * k.
+    """
+    row_pixels = N_WAY_PARALLEL * TILE_WIDTH * TILE_HEIGHT
+    writing = throttle * row_pixels
+    rows = (timing.rows - timing.states["WRITING_TO_DRAM"]) + writing
+    # WRITING_TO_DRAM of row r starts after all previous rows and its own painting
+    start = TOP_LEVEL_CYCLES + generation + 1 + np.concatenate([[0], np.cumsum(rows)[:-1]]) \
+        + timing.states["PAINTING_TILES"]
+    last_pixel = throttle * (np.arange(row_pixels // CHUNK_PIXELS) * CHUNK_PIXELS + CHUNK_PIXELS - 1)
+    cycles = (start[:, None] + last_pixel[None, :]).ravel()
+    return cycles, TOP_LEVEL_CYCLES + generation + 1 + int(rows.sum()) + 1
+
+
+def hdmi_pop_times(frames):
+    """Seconds at which the unstacker takes every chunk of `frames` frames,
+    starting at the beginning of vertical blanking so pdfifo can fill."""
+    pixel = np.arange(CHUNK_PIXELS - 1, WIDTH * HEIGHT, CHUNK_PIXELS)
+    clocks = (pixel // WIDTH) * H_TOTAL + pixel % WIDTH + (V_TOTAL - HEIGHT) * H_TOTAL
+    frame = np.arange(frames)[:, None] * (H_TOTAL * V_TOTAL)
+    return ((frame + clocks[None, :]).ravel()) / PIXEL_HZ
+
+
+class Stats:
+
+    def __init__(self, cycles, counters, read_occupancy, write_occupancy):
+        self.cycles = cycles
+        self.seconds = cycles / CONTROLLER_HZ
+        self.read_occupancy = read_occupancy
+        self.write_occupancy = write_occupancy
+        self.__dict__.update(counters)
+
+    @property
+    def write_bandwidth(self):
+        return self.writes * CHUNK_BYTES / self.seconds
+
+    @property
+    def read_bandwidth(self):
+        return self.reads * CHUNK_BYTES / self.seconds
+
+    @property
+    def fits(self):
+        """Nothing lost or late anywhere."""
+        return not (self.dropped_chunks or self.underflows or self.read_overflows or self.command_overflows)
+
+    def occupancy_percentile(self, q):
+        cdf = np.cumsum(self.read_occupancy) / self.read_occupancy.sum()
+        return int(np.searchsorted(cdf, q / 100))
+
+    def summary(self):
+        mb = 1e6
+        return "\n".join([
+            f"{self.seconds * 1e3:.1f} ms, {self.cycles} controller cycles",
+            f"  writes {self.writes:8d}  {self.write_bandwidth / mb:7.1f} MB/s, "
+            f"stalled {self.write_stalls} cycles with camera_data_fifo non empty, max occupancy {len(self.write_occupancy) - 1}",
+            f"  reads  {self.reads:8d}  {self.read_bandwidth / mb:7.1f} MB/s, "
+            f"read_axis_af high {self.af_cycles / self.cycles:.1%} of cycles",
+            f"  pdfifo occupancy min {self.min_read_occupancy}, p1 {self.occupancy_percentile(1)}, "
+            f"median {self.occupancy_percentile(50)}, max {len(self.read_occupancy) - 1}",
+            f"  DDR busy {self.busy_cycles / self.cycles:.1%} of cycles, "
+            f"{self.row_misses} row misses, max {self.max_outstanding} requests in flight",
+            f"  lost: {self.dropped_chunks} chunks at the stacker, {self.read_overflows} at pdfifo, "
+            f"{self.command_overflows} commands; {self.underflows} late chunks for HDMI",
+            f"  {'fits' if self.fits else 'DOES NOT FIT'}",
+        ])
+
+
+class FrameBufferModel:
+
+    def __init__(self, triangles=(), throttle=2, generation=0, latency=16, row_miss=4,
+                 max_outstanding=32, refresh_interval=650, refresh_cycles=14, cdc=5):
+        """triangles decide how long every tile row paints; none is the
+        worst case, rows written back to back."""
+        self.timing = FrameTime(*painter_work(triangles)) if len(triangles) else FrameTime(*_empty_work())
+        self.throttle = throttle
+        self.generation = generation
+        self.latency = latency
+        self.row_miss = row_miss
+        self.max_outstanding = max_outstanding
+        self.refresh_interval = refresh_interval
+        self.refresh_cycles = refresh_cycles
+        self.cdc = cdc
+
+    def schedules(self, cycles):
+        """Chunks arriving at the traffic generator and chunks the unstacker
+        wants, per controller cycle."""
+        chunks, period = render_chunk_cycles(self.timing, self.throttle, self.generation)
+        frames = -(-cycles // period)
+        arrive = (np.arange(frames)[:, None] * period + chunks[None, :]).ravel() + self.cdc
+        arrivals = np.bincount(arrive[arrive < cycles], minlength=cycles)
+        hdmi_frames = int(np.ceil(cycles / CONTROLLER_HZ * PIXEL_HZ / (H_TOTAL * V_TOTAL))) + 1
+        pop = np.ceil(hdmi_pop_times(hdmi_frames) * CONTROLLER_HZ).astype(np.int64) + self.cdc
+        demand = np.bincount(pop[pop < cycles], minlength=cycles)
+        return arrivals, demand
+
+    def run(self, hdmi_frames=2):
+        cycles = int(hdmi_frames * H_TOTAL * V_TOTAL / PIXEL_HZ * CONTROLLER_HZ)
+        arrivals, demand = self.schedules(cycles)
+        arrivals = arrivals.tolist()
+        demand = demand.tolist()
+
+        latency, row_miss, max_outstanding = self.latency, self.row_miss, self.max_outstanding
+        refresh_interval, refresh_cycles = self.refresh_interval, self.refresh_cycles
+        col_bank = COL_BITS + BANK_BITS
+        bank_mask = (1 << BANK_BITS) - 1
+
+        write_fifo = read_fifo = owed = 0
+        write_addr = read_addr = 0
+        in_flight = deque()  # (done cycle, is read)
+        open_rows = [-1] * (1 << BANK_BITS)
+        stall_until = 0
+        # pops prog_full doesn't know about yet
+        recent_pops = deque([0] * self.cdc)
+        unseen_pops = 0
+
+        read_occupancy = [0] * (FIFO_DEPTH + 1)
+        write_occupancy = [0] * (FIFO_DEPTH + 2)
+        c = dict(writes=0, reads=0, write_stalls=0, af_cycles=0, busy_cycles=0, row_misses=0,
+                 dropped_chunks=0, read_overflows=0, command_overflows=0, underflows=0,
+                 max_outstanding=0, min_read_occupancy=FIFO_DEPTH)
+        started = False
+
+        for cycle in range(cycles):
+            # one ack per cycle, in order
+            if in_flight and in_flight[0][0] <= cycle:
+                if in_flight.popleft()[1]:
+                    if read_fifo == FIFO_DEPTH:
+                        c["read_overflows"] += 1
+                    else:
+                        read_fifo += 1
+
+            # camera_data_fifo plus the chunk stacker holds on to
+            write_fifo += arrivals[cycle]
+            if write_fifo > FIFO_DEPTH + 1:
+                c["dropped_chunks"] += write_fifo - FIFO_DEPTH - 1
+                write_fifo = FIFO_DEPTH + 1
+
+            wanted = demand[cycle]
+            if wanted:
+                started = True
+            owed += wanted
+            served = min(owed, read_fifo)
+            read_fifo -= served
+            owed -= served
+            if owed and wanted:
+                c["underflows"] += 1
+            recent_pops.append(served)
+            unseen_pops += served - recent_pops.popleft()
+            if started and read_fifo < c["min_read_occupancy"]:
+                c["min_read_occupancy"] = read_fifo
+
+            busy = cycle < stall_until or len(in_flight) >= max_outstanding \
+                or cycle % refresh_interval < refresh_cycles
+            if busy:
+                c["busy_cycles"] += 1
+            af = read_fifo + unseen_pops >= PROG_FULL
+            if af:
+                c["af_cycles"] += 1
+
+            if cycle & 1 == 0:
+                # RD_HDMI
+                issue = not af and not busy
+                addr = read_addr
+            else:
+                # WR_CAM
+                issue = write_fifo > 0 and not busy
+                if write_fifo and busy:
+                    c["write_stalls"] += 1
+                addr = write_addr
+            if issue:
+                bank = (addr >> COL_BITS) & bank_mask
+                row = addr >> col_bank
+                done = cycle + latency
+                if open_rows[bank] != row:
+                    open_rows[bank] = row
+                    c["row_misses"] += 1
+                    stall_until = cycle + 1 + row_miss
+                    done += row_miss
+                if len(in_flight) >= COMMAND_FIFO:
+                    c["command_overflows"] += 1
+                reading = cycle & 1 == 0
+                in_flight.append((max(done, in_flight[-1][0] + 1) if in_flight else done, reading))
+                if reading:
+                    c["reads"] += 1
+                    read_addr = read_addr + 1 if read_addr + 1 < FRAME_CHUNKS else 0
+                else:
+                    c["writes"] += 1
+                    write_fifo -= 1
+                    write_addr = write_addr + 1 if write_addr + 1 < FRAME_CHUNKS else 0
+                if len(in_flight) > c["max_outstanding"]:
+                    c["max_outstanding"] = len(in_flight)
+
+            read_occupancy[read_fifo] += 1
+            write_occupancy[write_fifo] += 1
+
+        return Stats(cycles, c, np.trim_zeros(np.array(read_occupancy), "b"),
+                     np.trim_zeros(np.array(write_occupancy), "b"))
+
+
+def _empty_work():
+    shape = (HEIGHT // TILE_HEIGHT, N_WAY_PARALLEL)
+    return np.zeros(shape, dtype=np.int64), np.zeros(shape, dtype=np.int64)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--capture", default=None, help="projector capture, its busiest frame paces the renderer")
+    parser.add_argument("--throttle", type=int, default=2, help="cycles per renderer pixel")
+    parser.add_argument("--compare", action="store_true", help="run throttle 2 and 1 side by side")
+    parser.add_argument("--frames", type=float, default=2, help="HDMI frames to simulate")
+    parser.add_argument("--latency", type=int, default=16)
+    parser.add_argument("--row-miss", type=int, default=4)
+    parser.add_argument("--max-outstanding", type=int, default=32)
+    parser.add_argument("--refresh-interval", type=int, default=650)
+    parser.add_argument("--refresh-cycles", type=int, default=14)
+    args = parser.parse_args()
+
+    triangles = ()
+    if args.capture:
+        from capture import open_capture
+        capture = open_capture(args.capture)
+        triangles = max((capture.frame(i) for i in capture.frame_indices()), key=len)
+    ddr = dict(latency=args.latency, row_miss=args.row_miss, max_outstanding=args.max_outstanding,
+               refresh_interval=args.refresh_interval, refresh_cycles=args.refresh_cycles)
+    for throttle in ((2, 1) if args.compare else (args.throttle,)):
+        model = FrameBufferModel(triangles, throttle=throttle, **ddr)
+        print(f"throttle {throttle}: renderer writes {CONTROLLER_HZ / throttle * 2 / 1e6:.1f} MB/s while in WRITING_TO_DRAM")
+        print(model.run(args.frames).summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""Cycle counts of hdl/renderer.sv for a triangle list, without simulating it.
+
+One tile_painter spends, per triangle in BRAM order:
+
+    4 cycles      READING_NEW_TRIANGLE_1/2, DONE_READING_TRIANGLE, CALCULATING_BOUNDS
+  + w * h         ITERATING over the part of the bounding box in its tile
+  + 30            WAITING for the pixel/depth pipeline to drain
+
+where the last two only happen when the box touches the tile, and w / h are
+at least 1 (a degenerate box still gets one pass). Before its first triangle
+it sits in RST for a cycle, after its last one it takes a cycle to raise done.
+
+The renderer then goes through the 72 tile rows like this:
+
+  PAINTING_TILES      until all 16 painters are done, 3 cycles more than the
+                      slowest painter's work on row 0 (its RST cycle falls in
+                      PAINTING_TILES) and 2 more on every other row
+  WRITING_TO_DRAM     one pixel every other cycle, 12800 pixels. The counter
+                      starts at 0 so row 0 takes 25599 cycles, after that it
+                      is left at 1 and every row takes 25600
+  INTERMEDIATE x2     before wiping
+  WIPING_TILES        800 cycles of WIPE, plus a cycle to raise done
+  INTERMEDIATE x2     before painting the next row (not after row 71)
+
+plus the IDLE cycle that sees `active` and the DONE cycle before `done`. The
+only state that depends on the triangles is PAINTING_TILES, and only through
+its slowest painter.
+
+    timing = frame_time(triangles)
+    timing.cycles, timing.fps
+    timing.critical          # slowest painter of every tile row
+    python sim/model/frame_time.py sim_build/test_projector.cap
+"""
+import argparse
+import sys
+
+import numpy as np
+
+from codec import unpack_triangles
+from renderer import N_WAY_PARALLEL, TILE_HEIGHT, TILE_ROWS, TILE_WIDTH, triangle_bram
+
+# top_level currently runs the renderer off clk_controller, 83.333 MHz
+# (frame_buffer.CONTROLLER_HZ), pass that as clock_hz / --clock 83.333 for it
+CLOCK_HZ = 100_000_000
+
+READ_CYCLES = 4
+WAIT_CYCLES = 30
+CYCLES_PER_PIXEL = 2
+ROW_PIXELS = N_WAY_PARALLEL * TILE_WIDTH * TILE_HEIGHT
+WIPE_CYCLES = TILE_WIDTH * TILE_HEIGHT
+INTERMEDIATE_CYCLES = 2
+
+STATES = ("PAINTING_TILES", "WRITING_TO_DRAM", "INTERMEDIATE_BEFORE_WIPE",
+          "WIPING_TILES", "INTERMEDIATE_BEFORE_PAINTING")
+
+
+def bounding_boxes(triangles):
+    """min_x, max_x, min_y, max_y of every triangle in the BRAM."""
+    fields = unpack_triangles(triangle_bram(triangles))
+    xs = np.stack([fields["p1x"], fields["p2x"], fields["p3x"]])
+    ys = np.stack([fields["p1y"], fields["p2y"], fields["p3y"]])
+    return xs.min(axis=0), xs.max(axis=0), ys.min(axis=0), ys.max(axis=0)
+
+
+def spans(lo, hi, offsets, size):
+    """(hit, n) for every (offset, triangle): whether the painter at `offset`
+    reads past CALCULATING_BOUNDS, and how many coords it iterates on that
+    axis. Same clamping as the lower/upper bounds in tile_painter."""
+    lo = lo[None, :]
+    hi = hi[None, :]
+    offsets = np.asarray(offsets)[:, None]
+    hit = (lo < offsets + size) & (hi > offsets)
+    lower = np.clip(lo - offsets, 0, size)
+    upper = np.clip(hi - offsets, 0, size)
+    return hit, np.maximum(upper - lower, 1)
+
+
+def coverage(triangles):
+    """(hit, cells), both (72, 16, T): whether painter (row, tile) iterates
+    over triangle T at all, and how many ITERATING cycles that takes."""
+    min_x, max_x, min_y, max_y = bounding_boxes(triangles)
+    hit_y, h = spans(min_y, max_y, np.arange(TILE_ROWS) * TILE_HEIGHT, TILE_HEIGHT)
+    hit_x, w = spans(min_x, max_x, np.arange(N_WAY_PARALLEL) * TILE_WIDTH, TILE_WIDTH)
+    # (rows, 1, T) x (1, tiles, T)
+    hit = hit_y[:, None, :] & hit_x[None, :, :]
+    return hit, np.where(hit, h[:, None, :] * w[None, :, :], 0)
+
+
+def painter_work(triangles):
+    """Per painter (tile row, tile) work cycles, from its first
+    READING_NEW_TRIANGLE_1 to its last state before DONE, and how many
+    triangles it actually iterated over. Both (72, 16)."""
+    hit, cells = coverage(triangles)
+    work = READ_CYCLES * hit.shape[2] + (cells + WAIT_CYCLES * hit).sum(axis=2)
+    return work, hit.sum(axis=2)
+
+
+class FrameTime:
+    """Cycle counts for one frame. Everything per row is a (72,) array.
+
+    work:      (72, 16) cycles each painter is busy
+    hits:      (72, 16) triangles each painter iterated over
+    states:    {state: (72,) cycles spent in it per row}
+    critical:  index of the slowest painter per row
+    """
+
+    def __init__(self, work, hits, clock_hz=CLOCK_HZ):
+        self.work = work
+        self.hits = hits
+        self.clock_hz = clock_hz
+        self.critical = work.argmax(axis=1)
+        slowest = work.max(axis=1)
+        rows = np.arange(TILE_ROWS)
+        first = rows == 0
+        self.states = {
+            "PAINTING_TILES": slowest + np.where(first, 3, 2),
+            "WRITING_TO_DRAM": np.where(first, CYCLES_PER_PIXEL * ROW_PIXELS - 1, CYCLES_PER_PIXEL * ROW_PIXELS),
+            "INTERMEDIATE_BEFORE_WIPE": np.full(TILE_ROWS, INTERMEDIATE_CYCLES),
+            "WIPING_TILES": np.full(TILE_ROWS, WIPE_CYCLES + 1),
+            "INTERMEDIATE_BEFORE_PAINTING": np.where(rows == TILE_ROWS - 1, 0, INTERMEDIATE_CYCLES),
+        }
+
+    @property
+    def rows(self):
+        """Cycles per tile row, all states."""
+        return sum(self.states.values())
+
+    @property
+    def cycles(self):
+        """From the IDLE cycle that sees active to done going high."""
+        return 1 + int(self.rows.sum()) + 1
+
+    @property
+    def seconds(self):
+        return self.cycles / self.clock_hz
+
+    @property
+    def fps(self):
+        return self.clock_hz / self.cycles
+
+    @property
+    def idle(self):
+        """(72, 16) cycles each painter spends done, waiting on the slowest."""
+        return self.work.max(axis=1, keepdims=True) - self.work
+
+    def totals(self):
+        return {state: int(cycles.sum()) for state, cycles in self.states.items()}
+
+    def summary(self):
+        totals = self.totals()
+        lines = [f"{self.cycles} cycles, {self.seconds * 1e3:.2f} ms, {self.fps:.1f} fps at {self.clock_hz / 1e6:g} MHz"]
+        for state, cycles in totals.items():
+            lines.append(f"  {state:30s} {cycles:10d}  {cycles / self.cycles:6.1%}")
+        worst = int(self.states["PAINTING_TILES"].argmax())
+        lines.append(f"  slowest row {worst} (y {worst * TILE_HEIGHT}), painter {self.critical[worst]}: "
+                     f"{self.work[worst].max()} cycles, {self.hits[worst, self.critical[worst]]} triangles")
+        return "\n".join(lines)
+
+
+def frame_time(triangles, clock_hz=CLOCK_HZ):
+    return FrameTime(*painter_work(triangles), clock_hz=clock_hz)
+
+
+def painter_events(triangles, tile_index, tile):
+    """The states one painter goes through on one tile row, as a structured
+    array of (triangle, state, start, cycles), start counted from its first
+    READING_NEW_TRIANGLE_1. Slower than painter_work, for looking at one
+    painter cycle by cycle."""
+    min_x, max_x, min_y, max_y = bounding_boxes(triangles)
+    hit_y, h = spans(min_y, max_y, [tile_index * TILE_HEIGHT], TILE_HEIGHT)
+    hit_x, w = spans(min_x, max_x, [tile * TILE_WIDTH], TILE_WIDTH)
+    hit = (hit_y & hit_x)[0]
+    iterate = (h * w)[0]
+
+    names = ["READING", "ITERATING", "WAITING"]
+    events = np.zeros(3 * len(hit), dtype=[("triangle", "<i4"), ("state", "U9"), ("start", "<i8"), ("cycles", "<i8")])
+    events["triangle"] = np.repeat(np.arange(len(hit)), 3)
+    events["state"] = np.tile(names, len(hit))
+    cycles = np.stack([np.full(len(hit), READ_CYCLES), np.where(hit, iterate, 0), np.where(hit, WAIT_CYCLES, 0)], axis=1).ravel()
+    events["cycles"] = cycles
+    events["start"] = np.cumsum(cycles) - cycles
+    return events[events["cycles"] > 0]
+
+
+def main():
+    from capture import open_capture
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture", help="projector capture, one frame of triangles per index")
+    parser.add_argument("--clock", type=float, default=CLOCK_HZ / 1e6, help="MHz")
+    parser.add_argument("-v", "--rows", action="store_true", help="per tile row breakdown of the slowest frame")
+    args = parser.parse_args()
+
+    capture = open_capture(args.capture)
+    timings = {}
+    for index in capture.frame_indices():
+        timings[int(index)] = timing = frame_time(capture.frame(index), args.clock * 1e6)
+        print(f"frame {index:5d}: {len(capture.frame(index)):3d} triangles, {timing.cycles:9d} cycles, {timing.fps:6.1f} fps")
+    if not timings:
+        sys.exit(f"{args.capture} has no frames")
+    worst = max(timings, key=lambda i: timings[i].cycles)
+    print(f"worst frame {worst}:")
+    print(timings[worst].summary())
+    if args.rows:
+        timing = timings[worst]
+        print(" row  painting  critical  hits")
+        for row in range(TILE_ROWS):
+            painter = timing.critical[row]
+            print(f"{row:4d} {timing.states['PAINTING_TILES'][row]:9d} {painter:9d} {timing.hits[row, painter]:5d}")
+
+
+if __name__ == "__main__":
+    main()
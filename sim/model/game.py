@@ -0,0 +1,645 @@
+"""Frame level model of obstacle_generator.sv + game_logic.sv + speed_params.sv.
+
+Thousands of independent games run side by side, every piece of state is an
+array with one entry per run. One step() is one frame of top_level:
+
+  1. obstacle_generator gets `activate`: current_depth += speed, and when it
+     wraps the 16x3 obstacle storage shifts one half block closer and a new
+     row is generated from the rng (GENERATION)
+  2. the obstacles stream out, game_logic checks the ones in the player's
+     lane that are in the first row (block 3, or block 4 for train cars and
+     ramps) against the player, in that order
+  3. 2000 cycles after new_frame the game progresses: score, lane changes,
+     jumping / ducking / falling, exactly as the always_ff does it
+
+Everything else (projection, rendering) only decides how many clock cycles a
+frame takes, which matters because the rng steps every cycle. That is
+`frame_cycles`: either a fixed count or a (low, high) range to draw each
+run's frame length from every frame. The renderer's frame time depends on
+what is on screen, so a range is closer to the real thing.
+
+Player input is a policy, called every frame with the game and returning
+(left, right, jump, duck) arrays of button presses (rising edges, like
+actual_controls in top_level).
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from codec import OBSTACLE_DTYPE, wrap
+
+HALF_BLOCK = 64
+GROUND = -128
+# top_level overrides game_logic's default of 10
+MARGIN_OF_ERROR = 15
+CYCLES_PER_OBSTACLE = 30
+NEW_FRAME_DELAY = 2000
+RNG_STEP = 0x3A039
+RNG_MASK = (1 << 18) - 1
+ROWS = 16
+LANES = 3
+# half blocks past the first row (block 3 and 4) that the storage covers
+AHEAD = ROWS - 5
+
+EMPTY, LOW, HIGH, MIDDLE, TRAIN, RAMP = range(6)
+# bit 3 of a storage cell, the half of a train car / ramp closer to the player
+NEAR = 0b1000
+
+# speed -> (gravity, duck_limit, vertical_jump), speed_params.sv
+SPEED_PARAMS = {
+    1: (1, 128, 108),
+    2: (4, 64, 220),
+    4: (15, 32, 420),
+    8: (60, 16, 820),
+}
+
+# why a run ended, game_over_cause
+ALIVE = 0
+LANE_EDGE = 8
+FELL = 9
+CAUSES = {LOW: "low barrier", HIGH: "high barrier", MIDDLE: "middle barrier", TRAIN: "train car",
+          RAMP: "ramp", LANE_EDGE: "lane edge", FELL: "fell"}
+
+
+def speed_params(speed):
+    """(gravity, duck_limit, vertical_jump) for a speed setting."""
+    return SPEED_PARAMS.get(speed, SPEED_PARAMS[1])
+
+
+def generate(storage, cars_follow_ramp, rng):
+    """GENERATION state, in place, on the already shifted storage.
+
+    storage is (16, 3, runs) cells, cars_follow_ramp (3, runs) and rng
+    (runs,) the rng value on that cycle.
+    """
+    for j in range(LANES):
+        bit = [(rng >> (5 * j + k)) & 1 for k in range(5)]
+        follow = cars_follow_ramp[j] != 0
+        new = ~follow & (bit[1] == 0) & (bit[0] == 0) & (storage[14, j] == 0)
+        barrier = new & (bit[2] == 0)
+        kind = np.where((bit[4] == 0) & (bit[3] == 0), LOW, np.where(bit[4] == 0, HIGH, MIDDLE))
+        ramp = new & (bit[2] == 1) & (bit[4] == 0) & (bit[3] == 0)
+        car = (new & (bit[2] == 1) & ~ramp) | (follow & ((cars_follow_ramp[j] & 1) == 0))
+
+        far, near = storage[15, j], storage[14, j]
+        far[barrier] = kind[barrier]
+        far[car] = TRAIN
+        near[car] = NEAR | TRAIN
+        far[ramp] = RAMP
+        near[ramp] = NEAR | RAMP
+        cars_follow_ramp[j] = np.where(follow, cars_follow_ramp[j] - 1, np.where(ramp, 7, cars_follow_ramp[j]))
+
+
+######## lane sets, bit i for lane i ########
+
+def _bits(lanes):
+    """(..., 3, runs) bools to (..., runs) lane sets."""
+    lanes = lanes.view(np.uint8)
+    return lanes[..., 0, :] | (lanes[..., 1, :] << 1) | (lanes[..., 2, :] << 2)
+
+
+def _lanes(bits):
+    """(runs,) lane sets to (3, runs) bools."""
+    return ((bits >> np.arange(LANES, dtype=np.uint8)[:, None]) & 1).astype(bool)
+
+
+def _beside(bits):
+    """Lanes next to any in `bits`."""
+    return ((bits << 1) | (bits >> 1)) & 0b111
+
+
+def _spread(alive, open):
+    """Lanes the player gets to from `alive` through `open` ones, within a
+    half block."""
+    for _ in range(LANES - 1):
+        alive = alive | (open & _beside(alive))
+    return alive
+
+
+def _pick(cells, lane):
+    """cells[lane[run], run] of (3, runs) `cells`, fancy indexing is slow."""
+    return cells.ravel().take(lane * len(lane) + np.arange(len(lane)))
+
+
+def _through(alive, stay, enter, first=0):
+    """Half block in which the player runs out of lanes, from the lanes in
+    `alive` during half block `first` (one row per start), or len(stay) if
+    it never does; `stay` and `enter` as from Game.blocked_lanes(). The
+    player gets into the next half block by staying in a lane or by a step
+    into a neighbour right on the shift, and then through any open lanes
+    next to one it's in."""
+    # nowhere to be stays that way, count the half blocks there's a lane
+    out = (alive != 0).astype(np.int8) + first
+    for s in range(first + 1, len(stay)):
+        open = ~enter[s] & 0b111
+        alive = _spread(~stay[s] & (alive | (_beside(alive) & open)), open)
+        out += alive != 0
+    return out
+
+
+class Game:
+    """`runs` games at one speed setting, all reset on the same cycle."""
+
+    def __init__(self, runs, speed, frame_cycles=(250_000, 450_000), seed=0):
+        self.runs = runs
+        self.speed = speed
+        self.gravity, self.duck_limit, self.vertical_jump = speed_params(speed)
+        self.frame_cycles = frame_cycles
+        self.random = np.random.default_rng(seed)
+        self.frame = 0
+        # storage only changes on a shift, policies can cache on this
+        self.shifts = 0
+
+        # obstacle_generator, per lane arrays are (3, runs) here, numpy is
+        # slow along a short last axis
+        self.storage = np.zeros((ROWS, LANES, runs), dtype=np.uint8)
+        self.cars_follow_ramp = np.zeros((LANES, runs), dtype=np.int64)
+        self.current_depth = 0  # the same in every run
+        self.rng = np.zeros(runs, dtype=np.int64)
+
+        # game_logic
+        self.height_128ths = np.zeros(runs, dtype=np.int32)
+        self.velocity_128ths = np.zeros(runs, dtype=np.int32)
+        self.ground_level = np.full(runs, GROUND, dtype=np.int32)
+        self.lane = np.ones(runs, dtype=np.int32)
+        self.ducking = np.zeros(runs, dtype=bool)
+        self.ducking_duration = np.zeros(runs, dtype=np.int32)
+        self.half_block_progress = 0  # also the same in every run
+        self.score = np.zeros(runs, dtype=np.int64)
+        self.game_over = np.zeros(runs, dtype=bool)
+        self.cause = np.zeros(runs, dtype=np.int64)
+
+        # walls of train cars nobody can get through and half blocks until
+        # the next one closes, see wall()
+        self.walls = np.zeros(runs, dtype=np.int64)
+        self.wall_ahead = np.full(runs, -1, dtype=np.int64)
+        self.half_blocks = np.zeros(runs, dtype=np.int64)
+
+    @property
+    def height(self):
+        return self.height_128ths >> 7
+
+    @property
+    def airborne(self):
+        return self.height > self.ground_level
+
+    def _advance_rng(self):
+        if np.isscalar(self.frame_cycles):
+            cycles = self.frame_cycles
+        else:
+            lo, hi = self.frame_cycles
+            cycles = self.random.integers(lo, hi, size=self.runs, endpoint=True)
+        self.rng = (self.rng + cycles * RNG_STEP) & RNG_MASK
+
+    def _obstacles(self):
+        """OBSTACLE_SHIFT and GENERATION. Returns the depth of block 0."""
+        s = self.speed
+        shift = self.current_depth >= HALF_BLOCK - s
+        self.current_depth = (self.current_depth + s) % HALF_BLOCK
+        if shift:
+            self.shifts += 1
+            playing = ~self.game_over
+            storage = np.zeros_like(self.storage)
+            storage[:-1] = self.storage[1:]
+            cars = self.cars_follow_ramp.copy()
+            generate(storage, cars, self.rng)
+            self.storage = np.where(playing, storage, self.storage)
+            self.cars_follow_ramp = np.where(playing, cars, self.cars_follow_ramp)
+            self.half_blocks += playing
+            # a wall counts once, on the shift it comes in sight
+            ahead = np.where(self.wall_ahead > 0, self.wall_ahead - 1, -1)
+            wall = self.wall()
+            self.walls += playing & (wall >= 0) & (ahead < 0)
+            ahead = np.where(ahead < 0, wall, np.where(wall < 0, ahead, np.minimum(ahead, wall)))
+            self.wall_ahead = np.where(playing, ahead, self.wall_ahead)
+        return HALF_BLOCK - self.current_depth
+
+    def obstacles(self, run=0):
+        """What obstacle_generator streams to full_projector this frame for
+        one run: block by block, lane by lane, every cell that holds an
+        obstacle and isn't the near half of a train car or ramp."""
+        cells = self.storage[:, :, run]
+        block, lane = np.nonzero(((cells & NEAR) == 0) & ((cells & 0x7) != EMPTY))
+        obstacles = np.zeros(len(block), dtype=OBSTACLE_DTYPE)
+        obstacles["type"] = cells[block, lane] & 0x7
+        obstacles["lane"] = lane
+        obstacles["depth"] = HALF_BLOCK - self.current_depth + block * HALF_BLOCK
+        return obstacles
+
+    def blocked_lanes(self, shifts):
+        """Lanes a train car closes to a player on the ground, this half block
+        and the next `shifts`, as (stay, enter) lane sets of (shifts + 1, runs).
+        Nobody can be in a `stay` lane during that half block; `enter` lanes
+        also can't be moved into, that adds ramps under way and the train cars
+        behind them, which only take the player that came up the ramp."""
+        kinds = self.storage & 0x7
+        chain = _bits((kinds == TRAIN) | (kinds == RAMP))
+        ramp = _bits(kinds == RAMP)
+        ramped = np.zeros_like(chain)
+        # walk away from the player, a ramp starts a chain of cars; one still
+        # going at block 0 had its ramp shift out, plain cars don't touch
+        behind = np.full(self.runs, 0b111, dtype=np.uint8)
+        for b in range(ROWS):
+            behind = chain[b] & (behind | ramp[b])
+            ramped[b] = behind
+        # only the far half of a car gets checked, in block 3 and 4
+        train = _bits(self.storage == TRAIN) & ~ramped
+        stay = train[3:4 + shifts] | train[4:5 + shifts]
+        enter = stay | ramped[3:4 + shifts] | ramped[4:5 + shifts]
+        return stay, enter
+
+    def wall(self, shifts=AHEAD):
+        """Half blocks until train cars nobody can get on leave no way on,
+        wherever the player is now, -1 if not within `shifts`. A lane open in
+        one half block leads into the next by staying open or by a step into
+        an open neighbour right on the shift, and during one the player can
+        get to any open lane next to one it's in."""
+        stay, enter = self.blocked_lanes(shifts)
+        closed = _through(~stay[:1] & 0b111, stay, enter)[0]
+        return np.where(closed > shifts, -1, closed)
+
+    def cells(self, block, lane=None):
+        """Storage cell of `block` in each run's `lane`, the player's by default."""
+        return _pick(self.storage[block], self.lane if lane is None else lane)
+
+    def _collide(self, depth0):
+        """game_logic's OBSTACLE PROCESSING for the first row. Returns which
+        runs saw an obstacle in their lane."""
+        progress = self.half_block_progress
+        seen = np.zeros(self.runs, dtype=bool)
+        for b in (3, 4):
+            cell = self.cells(b)
+            kind = cell & 0x7
+            hit = ((cell & NEAR) == 0) & (kind != EMPTY) & ~self.game_over
+            if b == 4:
+                hit &= (kind & 0b100) != 0
+            depth = (depth0 + HALF_BLOCK * b) & 0x7FF
+            seen |= hit
+
+            # the rest only concerns the runs with something in their lane
+            runs = np.flatnonzero(hit)
+            kind = kind[runs]
+            height = self.height_128ths[runs] >> 7
+            top = height + np.where(self.ducking[runs], 16, 32)
+            ground = self.ground_level[runs]
+
+            over = np.zeros(len(runs), dtype=bool)
+            barrier = (kind >= LOW) & (kind <= MIDDLE)
+            ground[barrier] = GROUND
+            if progress == HALF_BLOCK // 2:
+                over |= (kind == LOW) & (height <= GROUND + HALF_BLOCK // 2)
+                over |= (kind == HIGH) & (top >= GROUND + HALF_BLOCK // 2) & (height <= GROUND + HALF_BLOCK)
+                over |= (kind == MIDDLE) & (height <= GROUND + HALF_BLOCK // 2 + 8) \
+                    & (top >= GROUND + HALF_BLOCK // 2 - 8)
+
+            train = kind == TRAIN
+            ground[train] = GROUND + HALF_BLOCK
+            over |= train & (height <= GROUND + HALF_BLOCK - MARGIN_OF_ERROR)
+
+            ramp_far = (kind == RAMP) & (depth <= 255)
+            ramp_near = (kind == RAMP) & (depth >= 256) & (depth <= 319)
+            ground[ramp_far] = GROUND + HALF_BLOCK // 2 + (progress >> 1)
+            over |= ramp_far & (height <= GROUND - MARGIN_OF_ERROR + HALF_BLOCK // 2 + (progress >> 1))
+            ground[ramp_near] = GROUND + (progress >> 1)
+            over |= ramp_near & (height <= GROUND - MARGIN_OF_ERROR + (progress >> 1))
+
+            self.ground_level[runs] = ground
+            self.cause[runs[over]] = kind[over]
+            self.game_over[runs[over]] = True
+        return seen
+
+    def _progress(self, left, right, jump, duck, seen):
+        """game_logic's GAME PROGRESSION, new_frame_delay == 1."""
+        s = self.speed
+        playing = ~self.game_over
+        # running along the ground with no button pressed just follows the
+        # ground, the rest goes through the always_ff
+        moving = np.flatnonzero(playing & (self.airborne | self.ducking | jump | duck))
+        jump, duck = jump[moving], duck[moving]
+        h128 = self.height_128ths[moving]
+        height = h128 >> 7
+        ground = self.ground_level[moving]
+        airborne = height > ground
+        ducking = self.ducking[moving]
+        dd = self.ducking_duration[moving]
+        vv = self.velocity_128ths[moving]
+        ground_128ths = ground << 7
+        vj = self.vertical_jump
+        boost = 128 if s == 1 else vj
+
+        new_vv = wrap(vv - self.gravity, 16)
+        landing = wrap(height + (new_vv >> 7), 16)
+        lands = landing < ground
+        land_ok = lands & (landing >= ground - MARGIN_OF_ERROR)
+        fell = lands & ~land_ok
+
+        held = dd < self.duck_limit - 1
+        # the four branches of the always_ff: airborne or not, ducking or not.
+        # Airborne the player falls unless a duck pulls it down fast, on the
+        # ground it jumps unless ducking wins
+        fast_fall = airborne & ~ducking & duck
+        falling = airborne & ~fast_fall
+        takeoff = ~airborne & jump & (ducking | ~duck)
+        high = ground < height - (vj >> 7)
+
+        next_h = np.where(
+            airborne,
+            np.where(fast_fall, np.where(high, h128 + boost, ground_128ths),
+                     np.where(lands, np.where(land_ok, ground_128ths, h128), h128 + new_vv)),
+            np.where(takeoff, h128 + boost, ground_128ths))
+        next_vv = np.where(
+            airborne,
+            np.where(fast_fall, wrap(-vj, 16), np.where(lands, np.where(land_ok, 0, vv), new_vv)),
+            np.where(takeoff, vj, vv))
+        # a duck is held for duck_limit frames, jumping cancels it
+        next_ducking = np.where(ducking, ~jump & (held | duck), duck)
+        next_dd = np.where(
+            ducking,
+            np.where(jump, np.where(airborne, 0, dd), np.where(held, dd + 1, duck)),
+            np.where(duck, 1, dd))
+        over = np.zeros(self.runs, dtype=bool)
+        over[moving] = falling & fell
+        self.cause[over] = FELL
+
+        # lane changes
+        go_left = playing & left
+        go_right = playing & ~left & right
+        edge = (go_left & (self.lane < 1)) | (go_right & (self.lane > 1))
+        self.lane = np.where(go_left & ~edge, self.lane - 1, np.where(go_right & ~edge, self.lane + 1, self.lane))
+        self.cause[edge & ~over] = LANE_EDGE
+        over |= edge
+
+        self.height_128ths = np.where(playing, self.ground_level << 7, self.height_128ths)
+        self.height_128ths[moving] = wrap(next_h, 23)
+        self.velocity_128ths[moving] = wrap(next_vv, 16)
+        self.ducking[moving] = next_ducking
+        self.ducking_duration[moving] = next_dd & 0x7F
+        self.score = np.where(playing, (self.score + s) & 0xFFFF, self.score)
+        self.game_over |= over
+        self.ground_level = np.where(playing & ~seen, GROUND, self.ground_level)
+        if self.half_block_progress < HALF_BLOCK - s:
+            self.half_block_progress += s
+        else:
+            self.half_block_progress = 0
+
+    def step(self, policy):
+        """One frame."""
+        self.frame += 1
+        self._advance_rng()
+        depth0 = self._obstacles()
+        seen = self._collide(depth0)
+        left, right, jump, duck = (np.asarray(b, dtype=bool) for b in policy(self))
+        self._progress(left, right, jump, duck, seen)
+
+    def frames_until_check(self, block):
+        """Frames until an obstacle now in `block` gets checked at half block
+        progress 32 in the first row, 0 meaning this frame's check."""
+        s = self.speed
+        return ((block - 3) * HALF_BLOCK + HALF_BLOCK // 2 + s - self.current_depth) // s
+
+
+############################################ players ############################################
+
+# how high over a low barrier a player wants to be at the check, a little room
+CLEAR = GROUND + HALF_BLOCK // 2 + 4
+
+def idle_policy(game):
+    """Never touches the buttons."""
+    none = np.zeros(game.runs, dtype=bool)
+    return none, none, none, none
+
+
+def random_policy(p=0.05, seed=0):
+    """Every button gets pressed with probability p every frame."""
+    random = np.random.default_rng(seed)
+
+    def policy(game):
+        return tuple(random.random(game.runs) < p for _ in range(4))
+    return policy
+
+
+def jump_profile(speed, frames=256):
+    """Height after k frames of a jump pressed on open ground, k = 1, 2, ..."""
+    game = Game(1, speed, frame_cycles=0)
+    # reset puts the player at 0, start from standing on the ground instead
+    game.height_128ths[:] = GROUND << 7
+    heights = []
+    pressed = [False]
+
+    def policy(g):
+        jump = not pressed[0]
+        pressed[0] = True
+        no = np.zeros(1, dtype=bool)
+        return no, no, np.array([jump]), no
+    for _ in range(frames):
+        game.step(policy)
+        heights.append(int(game.height[0]))
+    return np.array(heights)
+
+
+class ReflexPolicy:
+    """A player that sees the obstacle storage and reacts like a decent human.
+
+    It picks the lane that gets it furthest through the train cars of the
+    next `lookahead` half blocks (plan(), by default everything the storage
+    holds past the first row), but only moves into lanes it can get into right
+    now: no ramp under way and no low barrier too close to jump. It jumps low
+    barriers just early enough to clear them, or right away on top of a train,
+    and ducks under high and middle ones, in the lane it ends up in. Every
+    press is missed with probability `miss_rate`.
+    """
+
+    def __init__(self, miss_rate=0.0, lookahead=AHEAD, seed=0):
+        self.miss_rate = miss_rate
+        self.lookahead = lookahead
+        self.random = np.random.default_rng(seed)
+        self._jump_lead = {}
+        self._horizon = {}
+        # plan() of this game at this many shifts
+        self._plan = None
+        self._planned = None
+
+    def jump_lead(self, speed):
+        """Frames between pressing jump and the barrier check: the first
+        frame the jump clears a low barrier with a little room, so it lands
+        as early as possible for whatever comes next."""
+        if speed not in self._jump_lead:
+            clear = jump_profile(speed) > CLEAR
+            self._jump_lead[speed] = int(np.argmax(clear)) + 1
+        return self._jump_lead[speed]
+
+    def plan(self, game):
+        """How many half blocks of the next `lookahead` the player gets
+        through the train cars from each lane, as (3, runs) arrays for this
+        half block and the next. `direct` by staying put and at most one step
+        right on the shift, `best` when moving through open lanes first;
+        `enter` lanes are closed to moving in. Only changes when the storage
+        shifts."""
+        if self._planned != (game, game.shifts):
+            stay, enter = game.blocked_lanes(self.lookahead)
+            lanes = np.array([0b001, 0b010, 0b100], dtype=np.uint8)[:, None]
+            own = lanes & ~stay[0]
+            direct, best = np.split(_through(np.vstack([own, _spread(own, ~enter[0] & 0b111)]), stay, enter), 2)
+            later = _through(_spread(lanes & ~stay[1], ~enter[1] & 0b111), stay, enter, first=1)
+            self._plan = direct, best, later, _lanes(enter[0]), _lanes(enter[1])
+            self._planned = game, game.shifts
+        return self._plan
+
+    def horizon(self, speed):
+        """Frames ahead that can need a press now: a jump from the top of a
+        train car stays over a low barrier that long, landing for the next
+        one and ducking come sooner."""
+        if speed not in self._horizon:
+            gravity, duck_limit, vertical_jump = speed_params(speed)
+            k = np.arange(1, ROWS * HALF_BLOCK)
+            height = ((GROUND + HALF_BLOCK) << 7) + (128 if speed == 1 else vertical_jump) \
+                + (k - 1) * vertical_jump - gravity * ((k - 1) * k // 2)
+            reach = int(k[height >> 7 > CLEAR][-1])
+            self._horizon[speed] = max(reach, 2 * self.jump_lead(speed), duck_limit)
+        return self._horizon[speed]
+
+    @staticmethod
+    def _clears(game, frames, airborne, jump=False):
+        """Runs that will be over a low barrier, with a little room, in
+        `frames` frames: in the air as they are, or jumping right now."""
+        # the fall is the same in every run, move it to the other side
+        over = (CLEAR + 1) << 7
+        if jump:
+            frames = frames - 1
+            over -= (128 if game.speed == 1 else game.vertical_jump) + frames * game.vertical_jump
+            return ~airborne & (game.height_128ths >= over + game.gravity * frames * (frames + 1) // 2)
+        height = game.height_128ths + frames * game.velocity_128ths
+        return airborne & ~game.ducking & (height >= over + game.gravity * frames * (frames + 1) // 2)
+
+    def __call__(self, game):
+        lane = game.lane
+        airborne = game.airborne
+        lead_jump = self.jump_lead(game.speed)
+        # blocks close enough to matter, with frames until their check
+        sight = [(b, game.frames_until_check(b)) for b in range(3, 3 + self.lookahead)]
+        sight = [(b, frames) for b, frames in sight if 0 < frames <= self.horizon(game.speed)]
+
+        # lanes with a low barrier too close to jump anymore, unless the
+        # player is in the air and still over it by then
+        close = np.zeros((LANES, game.runs), dtype=bool)
+        for b, frames in sight:
+            if frames < lead_jump:
+                close |= ((game.storage[b] & 0x7) == LOW) & ~self._clears(game, frames, airborne)
+        direct, best, later, enter, enter_later = self.plan(game)
+        left_lane, right_lane = np.maximum(lane - 1, 0), np.minimum(lane + 1, 2)
+        if game.current_depth >= HALF_BLOCK - game.speed:
+            # the storage shifts before the next check: stay unless a
+            # neighbour that's open right then gets further
+            into = np.where(enter_later | close, 0, later)
+            here = _pick(later, lane)
+        else:
+            # move when a neighbour gets further, or as far with no more moves
+            # where this lane needs the step on the shift, which may come too
+            # late for a barrier over there
+            into = np.where(enter | close, 0, best) * 2 + (direct == best)
+            here = _pick(direct, lane) * 2 + (_pick(later, lane) == _pick(direct, lane))
+        to_left = np.where(lane > 0, _pick(into, left_lane), -1)
+        to_right = np.where(lane < 2, _pick(into, right_lane), -1)
+        left = (to_left > here) & (to_left >= to_right)
+        right = (to_right > here) & ~left
+        lane = lane - left + right
+
+        # a low barrier gets jumped on the last frame that still clears it,
+        # or right away on top of a train, before the train ends and the
+        # player can't jump anymore. One right behind the one just jumped
+        # comes before the jump is over, ducking in the air brings the player
+        # down in time to jump again, unless it gets over without. A duck is
+        # pressed until it's down, so a lane change late still gets under.
+        jump = duck = land = clearing = np.zeros(game.runs, dtype=bool)
+        riding = game.ground_level > GROUND
+        # in the air, ducking has to bring the player down first
+        lead_duck = np.where(airborne, game.duck_limit - 1, max(1, (game.duck_limit - 1) // 2))
+        for b, frames in sight:
+            kind = game.cells(b, lane) & 0x7
+            low = (kind == LOW) & ~self._clears(game, frames, airborne)
+            jump = jump | (low & self._clears(game, frames, airborne, jump=True)
+                           & (riding | ~self._clears(game, frames - 1, airborne, jump=True)))
+            if lead_jump < frames <= 2 * lead_jump:
+                land = land | low
+            elif frames < lead_jump:
+                clearing = clearing | (kind == LOW)
+            if frames < game.duck_limit:
+                duck = duck | ((frames <= lead_duck) & ((kind == HIGH) | (kind == MIDDLE)))
+        duck = duck | (land & ~clearing & airborne)
+
+        presses = [left, right, jump, duck]
+        if self.miss_rate:
+            presses = [p & (self.random.random(game.runs) >= self.miss_rate) for p in presses]
+        return tuple(presses)
+
+
+############################################ sweeps ############################################
+
+def play(runs, speed, policy=None, half_blocks=128, frame_cycles=(250_000, 450_000), seed=0):
+    """Play `runs` games for `half_blocks` half blocks (or until everyone
+    is dead). Returns the Game."""
+    policy = policy if policy is not None else ReflexPolicy(seed=seed)
+    game = Game(runs, speed, frame_cycles, seed)
+    for _ in range(half_blocks * HALF_BLOCK // speed):
+        game.step(policy)
+        if game.game_over.all():
+            break
+    return game
+
+
+def summary(game):
+    """Survival, score distribution, death causes and wall rate of a Game."""
+    score = game.score
+    causes = {CAUSES[c]: float(np.mean(game.cause == c)) for c in CAUSES if np.any(game.cause == c)}
+    return {
+        "speed": game.speed,
+        "runs": game.runs,
+        "frames": game.frame,
+        "survival": float(np.mean(~game.game_over)),
+        "score_mean": float(score.mean()),
+        "score_percentiles": {p: int(np.percentile(score, p)) for p in (10, 25, 50, 75, 90)},
+        "deaths": causes,
+        "runs_with_wall": float(np.mean(game.walls > 0)),
+        "walls_per_1000_half_blocks": float(1000 * game.walls.sum() / max(1, game.half_blocks.sum())),
+        "died_at_wall": float(np.mean(game.game_over & (game.wall_ahead >= 0) & (game.wall_ahead <= 1))),
+    }
+
+
+def _play_summary(args):
+    speed, runs, policy_factory, half_blocks, frame_cycles, seed = args
+    return summary(play(runs, speed, policy_factory(seed=seed), half_blocks, frame_cycles, seed))
+
+
+def sweep(speeds=(1, 2, 4, 8), runs=10_000, half_blocks=128, policy_factory=ReflexPolicy,
+          frame_cycles=(250_000, 450_000), seed=0, processes=None):
+    """summary() of `runs` games at every speed setting, a speed per worker.
+    processes=None uses every core, processes=1 stays in this process."""
+    jobs = [(speed, runs, policy_factory, half_blocks, frame_cycles, seed) for speed in speeds]
+    processes = min(len(jobs), processes or os.cpu_count() or 1)
+    if processes == 1:
+        return [_play_summary(job) for job in jobs]
+    with ProcessPoolExecutor(processes) as pool:
+        return list(pool.map(_play_summary, jobs))
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from functools import partial
+
+    parser = argparse.ArgumentParser(description="sweep the game over speed settings")
+    parser.add_argument("--runs", type=int, default=10_000)
+    parser.add_argument("--half-blocks", type=int, default=128)
+    parser.add_argument("--miss-rate", type=float, default=0.0)
+    parser.add_argument("--speeds", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--processes", type=int, default=None, help="workers (default: one per core)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = sweep(args.speeds, args.runs, args.half_blocks, partial(ReflexPolicy, args.miss_rate),
+                    processes=args.processes)
+    for r in results:
+        print(f"speed {r['speed']}: survival {r['survival']:.3f}, median score {r['score_percentiles'][50]}, "
+              f"walls/1000 half blocks {r['walls_per_1000_half_blocks']:.2f}, deaths {r['deaths']}")
+    print(f"{time.perf_counter() - start:.1f} s")
@@ -0,0 +1,258 @@
+"""How much of tile_painter's work a hierarchical Z test would save.
+
+Every painter runs each pixel of a triangle's box through depth_calculator
+and only then compares with the tile, so a triangle entirely behind what
+the tile already holds still costs its ITERATING cycles and the 30 cycle
+WAITING. A hierarchical Z stage would keep a max depth per tile and skip a
+(triangle, tile) pair whose nearest depth in the tile is not closer than
+that: no pixel of it could pass `tile depth > depth`.
+
+The triangle's depth range comes from P and the normal alone. n . (x, y,
+1 << LOG_D) is linear in the pixel, so over a box |n . p| is largest at a
+corner (nearest depth) and smallest at a corner or 0 where the sign flips
+(farthest). As long as the divisor stays below 2**15, divider3 is exact and
+depth only grows as |n . p| shrinks, so the bounds are bit exact bounds of
+depth_calculator; past that, a pair is just never skipped.
+
+Two ways to get the bounds:
+
+  triangle   one near depth per triangle over its whole bounding box, what
+             full_projector could compute next to the triangle
+  tile       per (triangle, tile) pair over the part of the box in the
+             tile, tighter but a depth computation per pair (test_cycles)
+
+and two ways to keep the per tile max:
+
+  exact      the real max depth in the tile before each triangle, the best
+             any hierarchical Z could do
+  covering   a register per tile, starting at tile_bram.mem's max and only
+             lowered to a triangle's far depth when it covers the whole
+             tile: every pixel ends up at most that far
+
+All of it under a few submission orders, the triangle BRAM order as is and
+sorted by near depth as full_projector could (front to back) or the other
+way round. Sorting changes which triangle wins a depth tie, the report
+counts the pixels that come out different from the BRAM order.
+
+Skipping a pair saves its ITERATING cells and WAITING, reading the triangle
+and CALCULATING_BOUNDS still happen. Skipped pairs are checked against the
+actual painting: a skipped pair that would have written a pixel is counted
+as unsafe, and there should never be one.
+
+    result = evaluate(triangles, order="front_to_back")
+    result["rejected"]["tile", "exact"]      # (72, 16, T) skipped pairs
+    print(report(summarize({order: [evaluate(triangles, order)] for order in ORDERS})))
+    python sim/model/hiz.py --frames 8
+    python sim/model/hiz.py sim_build/test_projector.cap --test-cycles 4
+"""
+import argparse
+
+import numpy as np
+
+from codec import unpack_triangles
+from depth_calculator import LOG_D, _bit_length, centered, depth_calculator, divide_depth, n_dot_pixel
+from frame_time import READ_CYCLES, WAIT_CYCLES, FrameTime, coverage
+from pixel_calculator import pixel_inside
+from renderer import (HEIGHT, N_WAY_PARALLEL, TILE_HEIGHT, TILE_ROWS, TILE_WIDTH, WIDTH, _visited, load_tile_init,
+                      triangle_bram)
+
+ORDERS = ("bram", "front_to_back", "back_to_front")
+BOUNDS = ("triangle", "tile")
+TILE_MAX = ("exact", "covering")
+# largest divisor divider3 divides exactly
+EXACT_DIVISOR = 1 << 15
+
+
+def depth_bounds(fields, x0, x1, y0, y1, log_d=LOG_D):
+    """(near, far) uint16 depth_calculator bounds over the pixels [x0, x1) x
+    [y0, y1), everything broadcasting per triangle. Boxes that are empty or
+    out of divider3's exact range get (0, 0xFFFF)."""
+    x0, x1, y0, y1 = (np.asarray(v, dtype=np.int64) for v in (x0, x1, y0, y1))
+    corners = []
+    for x in (x0, x1 - 1):
+        for y in (y0, y1 - 1):
+            corners.append(n_dot_pixel(fields, *centered(x, y), log_d))
+    corners = np.stack(corners)
+    high = np.abs(corners).max(axis=0)
+    flips = (corners.min(axis=0) <= 0) & (corners.max(axis=0) >= 0)
+    low = np.where(flips, 0, np.abs(corners).min(axis=0))
+    # same normalization shift as divide_depth
+    P_left = ((np.abs(np.asarray(fields["P"], dtype=np.int64)) & 0xFFFFFF) << log_d) & 0xFFFFFFFF
+    shift = np.maximum(_bit_length(P_left) - 16, 0)
+    known = (x1 > x0) & (y1 > y0) & ((high >> shift) < EXACT_DIVISOR)
+    near = np.where(known, divide_depth(fields["P"], high, log_d), 0)
+    far = np.where(known, divide_depth(fields["P"], low, log_d), 0xFFFF)
+    return near.astype(np.uint16), far.astype(np.uint16)
+
+
+def triangle_bounds(fields):
+    """(near, far) of every triangle over its bounding box on screen."""
+    xs = np.stack([fields["p1x"], fields["p2x"], fields["p3x"]])
+    ys = np.stack([fields["p1y"], fields["p2y"], fields["p3y"]])
+    x0, x1 = np.clip(xs.min(axis=0), 0, WIDTH), np.clip(xs.max(axis=0), 0, WIDTH)
+    y0, y1 = np.clip(ys.min(axis=0), 0, HEIGHT), np.clip(ys.max(axis=0), 0, HEIGHT)
+    # a degenerate box still gets its one line painted
+    return depth_bounds(fields, x0, np.maximum(x1, x0 + 1), y0, np.maximum(y1, y0 + 1))
+
+
+def submission_order(triangles, order):
+    """Indices into the triangle BRAM contents in `order` (see ORDERS)."""
+    fields = unpack_triangles(triangles)
+    near, far = triangle_bounds(fields)
+    if order == "bram":
+        return np.arange(len(near))
+    if order == "front_to_back":
+        return np.argsort(near, kind="stable")
+    if order == "back_to_front":
+        return np.argsort(-far.astype(np.int64), kind="stable")
+    raise ValueError(f"order is one of {ORDERS}, not {order!r}")
+
+
+def evaluate(triangles, order="bram", tile_init=None):
+    """Paints a frame in `order` and records which (row, tile, triangle)
+    pairs every BOUNDS x TILE_MAX variant would skip. Returns a dict of
+
+        order, triangles (in that order), pixels (720, 1280 color|depth),
+        hit, cells (72, 16, T) as frame_time.coverage,
+        rejected {(bounds, tile_max): (72, 16, T)}, unsafe {(bounds, tile_max): pairs}
+    """
+    triangles = triangle_bram(triangles)
+    triangles = triangles[submission_order(triangles, order)]
+    fields = unpack_triangles(triangles)
+    tile_init = load_tile_init() if tile_init is None else tile_init
+    wiped = np.full_like(tile_init, 0xFFFFFFFF)
+    hit, cells = coverage(triangles)
+    tri_near, _ = triangle_bounds(fields)
+    rejected = {(b, m): np.zeros(hit.shape, dtype=bool) for b in BOUNDS for m in TILE_MAX}
+    unsafe = {key: 0 for key in rejected}
+
+    xs_all = np.stack([fields["p1x"], fields["p2x"], fields["p3x"]])
+    ys_all = np.stack([fields["p1y"], fields["p2y"], fields["p3y"]])
+    min_x, max_x = xs_all.min(axis=0), xs_all.max(axis=0)
+    min_y, max_y = ys_all.min(axis=0), ys_all.max(axis=0)
+    lefts = np.arange(N_WAY_PARALLEL) * TILE_WIDTH
+    band = N_WAY_PARALLEL * TILE_WIDTH
+
+    rows = []
+    for row in range(TILE_ROWS):
+        y_offset = row * TILE_HEIGHT
+        # only row 0 sees the init file, the rest start out wiped, like renderer.paint
+        tiles = np.tile(tile_init if row == 0 else wiped, (1, N_WAY_PARALLEL))
+        color = (tiles >> 16).astype(np.uint16)
+        depth = (tiles & 0xFFFF).astype(np.uint16)
+        covering = depth.reshape(TILE_HEIGHT, N_WAY_PARALLEL, TILE_WIDTH).max(axis=(0, 2))
+        for i in np.flatnonzero(hit[row].any(axis=0)):
+            f = {k: v[i] for k, v in fields.items()}
+            y0, y1 = _visited(int(min_y[i]), int(max_y[i]), y_offset, TILE_HEIGHT, TILE_HEIGHT)
+            x0, x1 = _visited(int(min_x[i]), int(max_x[i]), 0, TILE_WIDTH, band)
+            k = np.flatnonzero(hit[row, :, i])
+            # the part of the painted box in each hit tile
+            tx0, tx1 = np.maximum(x0, lefts[k]), np.minimum(x1, lefts[k] + TILE_WIDTH)
+            tile_near, tile_far = depth_bounds(f, tx0, tx1, y0, y1)
+            exact = depth.reshape(TILE_HEIGHT, N_WAY_PARALLEL, TILE_WIDTH).max(axis=(0, 2))[k]
+            near = {"triangle": np.full(len(k), tri_near[i]), "tile": tile_near}
+            maxes = {"exact": exact, "covering": covering[k]}
+            for b, m in rejected:
+                rejected[b, m][row, k, i] = near[b] >= maxes[m]
+
+            if y0 >= y1 or x0 >= x1:
+                continue
+            xs = np.arange(x0, x1)[None, :]
+            ys = np.arange(y0, y1)[:, None]
+            d = depth_calculator(f, *centered(xs, ys)).astype(np.uint16)
+            inside = pixel_inside(f, xs, ys)
+            rows_, cols = slice(y0 - y_offset, y1 - y_offset), slice(x0, x1)
+            write = inside & (depth[rows_, cols] > d)
+            # per hit tile: any pixel written, every pixel of the tile inside
+            written = np.array([write[:, a - x0:c - x0].any() for a, c in zip(tx0, tx1)], dtype=bool)
+            whole = (y0 <= y_offset) & (y1 >= y_offset + TILE_HEIGHT) & (tx0 == lefts[k]) & (tx1 == lefts[k] + TILE_WIDTH)
+            covered = np.array([w and inside[:, a - x0:c - x0].all() for w, a, c in zip(whole, tx0, tx1)], dtype=bool)
+            for key in rejected:
+                unsafe[key] += int((rejected[key][row, k, i] & written).sum())
+            covering[k] = np.where(covered, np.minimum(covering[k], tile_far), covering[k])
+            depth[rows_, cols][write] = d[write]
+            color[rows_, cols][write] = f["color"]
+        rows.append((color.astype(np.uint32) << 16) | depth)
+
+    return {"order": order, "triangles": triangles, "pixels": np.concatenate(rows, axis=0), "hit": hit,
+            "cells": cells, "rejected": rejected, "unsafe": unsafe}
+
+
+def frame_time(result, key=None, test_cycles=0):
+    """FrameTime of an evaluate() result with the pairs of variant `key`
+    skipped (None: nothing skipped). test_cycles is charged on every hit
+    pair for the per tile bounds."""
+    hit, cells = result["hit"], result["cells"]
+    painted = hit & ~result["rejected"][key] if key is not None else hit
+    work = READ_CYCLES * hit.shape[2] + (cells * painted + WAIT_CYCLES * painted).sum(axis=2)
+    if key is not None and key[0] == "tile":
+        work = work + test_cycles * hit.sum(axis=2)
+    return FrameTime(work, painted.sum(axis=2))
+
+
+def summarize(results, test_cycles=0):
+    """One dict per (order, bounds, tile_max), totals over every frame.
+    results is {order: [evaluate() per frame]}."""
+    rows = []
+    for order, evaluations in results.items():
+        reference = results.get("bram", evaluations)
+        bram_painting = float(np.mean([frame_time(r).totals()["PAINTING_TILES"] for r in reference]))
+        differ = sum(int((e["pixels"] != r["pixels"]).sum()) for e, r in zip(evaluations, reference))
+        for key in [None] + [(b, m) for b in BOUNDS for m in TILE_MAX]:
+            pairs = sum(int(e["hit"].sum()) for e in evaluations)
+            pixels = sum(int(e["cells"].sum()) for e in evaluations)
+            if key is None:
+                skipped_pairs = skipped_pixels = unsafe = 0
+            else:
+                skipped_pairs = sum(int(e["rejected"][key].sum()) for e in evaluations)
+                skipped_pixels = sum(int(e["cells"][e["rejected"][key]].sum()) for e in evaluations)
+                unsafe = sum(e["unsafe"][key] for e in evaluations)
+            timings = [frame_time(e, key, test_cycles) for e in evaluations]
+            rows.append({"order": order, "bounds": key[0] if key else "-", "tile_max": key[1] if key else "-",
+                         "pairs": pairs, "skipped_pairs": skipped_pairs, "pixels": pixels,
+                         "skipped_pixels": skipped_pixels, "unsafe": unsafe, "differ": differ,
+                         "cycles": float(np.mean([t.cycles for t in timings])),
+                         "painting": float(np.mean([t.totals()["PAINTING_TILES"] for t in timings])),
+                         "bram_painting": bram_painting})
+    return rows
+
+
+def report(rows):
+    lines = ["  order          bounds    tile max      pairs  skipped      pixels  skipped  unsafe"
+             "      painting  vs bram order   frame cycles  pixels differ"]
+    for r in rows:
+        lines.append(f"  {r['order']:14s} {r['bounds']:9s} {r['tile_max']:9s} {r['pairs']:8d} {r['skipped_pairs'] / max(r['pairs'], 1):8.1%}"
+                     f" {r['pixels']:11d} {r['skipped_pixels'] / max(r['pixels'], 1):8.1%} {r['unsafe']:7d}"
+                     f" {r['painting']:13.0f} {r['painting'] / r['bram_painting'] - 1:+14.2%}"
+                     f" {r['cycles']:14.0f} {r['differ']:14d}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture", nargs="?", help="projector capture to take frames from, default recorded game frames")
+    parser.add_argument("--frames", type=int, default=8, help="game frames (scene.scenes) without a capture")
+    parser.add_argument("--order", nargs="+", default=ORDERS, choices=ORDERS, help="submission orders")
+    parser.add_argument("--test-cycles", type=int, default=0,
+                        help="cycles the per tile bound costs every hit pair")
+    args = parser.parse_args()
+
+    if args.capture:
+        from capture import open_capture
+        capture = open_capture(args.capture)
+        frames = [capture.frame(i) for i in capture.frame_indices()]
+    else:
+        from projector_cache import model_triangles
+        from scene import scenes
+        frames = [model_triangles(**frame) for frame in scenes(frames=args.frames)]
+
+    # the BRAM order is what the others are compared against
+    orders = ["bram"] + [o for o in args.order if o != "bram"]
+    results = {order: [evaluate(f, order) for f in frames] for order in orders}
+    print(f"{len(frames)} frames, {np.mean([len(f) for f in frames]):.1f} triangles on average; pixels are "
+          f"ITERATING cells, painting is PAINTING_TILES cycles a frame against the unskipped BRAM order")
+    print(report(summarize(results, args.test_cycles)))
+
+
+if __name__ == "__main__":
+    main()
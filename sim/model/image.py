@@ -0,0 +1,228 @@
+"""Color conversion and image / video output for simulation frames.
+
+The HDL has two pixel formats:
+
+  RGB565          what the renderer sends to DRAM (16 bits, r in the top 5)
+  color | depth   a tile BRAM word, RGB565 in bits 31:16 and depth in 15:0
+
+Both become RGB888 through a 65536 entry lookup table, so a whole frame is
+one np.take. By default a channel is just shifted up (r * 8, g * 4, b * 8),
+which is what the old per pixel rgb() helpers did; replicate=True copies the
+top bits into the bottom ones so 31 maps to 255.
+
+FrameWriter streams frames to disk as they come in, one at a time:
+
+  .png    one PNG, or one per frame if the path has an {index} in it
+  .apng   animated PNG, the frame count is filled in on close
+  .y4m    raw YUV4MPEG2, 4:4:4, BT.601 limited range (ffmpeg and mpv read it)
+
+    with FrameWriter("sim_build/frames.apng", fps=60) as video:
+        for frame in capture frames:
+            video.write(frame)          # uint16 RGB565, uint32 tile words or RGB888
+
+PNGs are written with zlib only, no pypng or PIL needed.
+
+    python sim/model/image.py sim_build/test_renderer.cap sim_build/frames.apng
+"""
+import argparse
+import struct
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def _lut(replicate):
+    p = np.arange(1 << 16, dtype=np.uint32)
+    r, g, b = (p >> 11) & 0x1F, (p >> 5) & 0x3F, p & 0x1F
+    if replicate:
+        rgb = (r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)
+    else:
+        rgb = r << 3, g << 2, b << 3
+    return np.stack(rgb, axis=-1).astype(np.uint8)
+
+
+_LUTS = {}
+
+
+def rgb565_to_rgb888(pixels, replicate=False):
+    """Any shape of RGB565 -> same shape + (3,) uint8."""
+    if replicate not in _LUTS:
+        _LUTS[replicate] = _lut(replicate)
+    return np.take(_LUTS[replicate], np.asarray(pixels).astype(np.uint16), axis=0)
+
+
+def tile_to_rgb888(words, haze=False, replicate=False):
+    """32 bit color | depth words -> RGB888. haze=True applies the renderer's
+    depth haze first, so it looks like it would on screen."""
+    words = np.asarray(words)
+    if haze:
+        from renderer import shade
+        return rgb565_to_rgb888(shade(words), replicate)
+    return rgb565_to_rgb888((words.astype(np.uint32) >> 16).astype(np.uint16), replicate)
+
+
+def rgb888_to_rgb565(rgb):
+    """(..., 3) uint8 or 0xRRGGBB ints -> RGB565 by truncation."""
+    rgb = np.asarray(rgb)
+    if rgb.ndim == 0 or rgb.shape[-1] != 3:
+        rgb = np.stack([(rgb >> 16) & 0xFF, (rgb >> 8) & 0xFF, rgb & 0xFF], axis=-1)
+    rgb = rgb.astype(np.uint16)
+    return (((rgb[..., 0] >> 3) << 11) | ((rgb[..., 1] >> 2) << 5) | (rgb[..., 2] >> 3)).astype(np.uint16)
+
+
+def to_rgb888(frame, replicate=False):
+    """Whatever a capture holds as an (h, w, 3) uint8 image: uint16 is
+    RGB565, uint32 color | depth, uint8 with a trailing 3 already RGB888."""
+    frame = np.asarray(frame)
+    if frame.dtype == np.uint8 and frame.shape[-1] == 3:
+        return frame
+    if frame.dtype in (np.uint32, np.int32, np.uint64, np.int64):
+        return tile_to_rgb888(frame, replicate=replicate)
+    return rgb565_to_rgb888(frame, replicate)
+
+
+######################################## PNG ########################################
+
+def _chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def _ihdr(width, height):
+    # 8 bit RGB, no interlace
+    return _chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+
+
+def _compress(rgb, level):
+    height, width, _ = rgb.shape
+    # filter type 0 (none) in front of every row
+    raw = np.zeros((height, 1 + 3 * width), dtype=np.uint8)
+    raw[:, 1:] = rgb.reshape(height, -1)
+    return zlib.compress(raw.tobytes(), level)
+
+
+def encode_png(rgb, level=1):
+    """(h, w, 3) uint8 -> PNG bytes."""
+    height, width, _ = rgb.shape
+    return PNG_SIGNATURE + _ihdr(width, height) + _chunk(b"IDAT", _compress(rgb, level)) + _chunk(b"IEND", b"")
+
+
+def write_png(path, frame, replicate=False, level=1):
+    Path(path).write_bytes(encode_png(to_rgb888(frame, replicate), level))
+
+
+###################################### writers ######################################
+
+class FrameWriter:
+    """Writes frames one by one, nothing but the current frame is kept."""
+
+    def __init__(self, path, fps=60, replicate=False, level=1):
+        self.path = str(path)
+        self.fps = fps
+        self.replicate = replicate
+        self.level = level
+        self.frames = 0
+        self.shape = None
+        self.kind = Path(self.path).suffix.lower().lstrip(".")
+        if self.kind not in ("png", "apng", "y4m"):
+            raise ValueError(f"don't know how to write {self.path}, use .png, .apng or .y4m")
+        self._file = None
+        self._sequence = 0
+
+    def write(self, frame):
+        rgb = to_rgb888(frame, self.replicate)
+        if self.shape is None:
+            self.shape = rgb.shape
+            self._open()
+        elif rgb.shape != self.shape and self.kind != "png":
+            raise ValueError(f"frame is {rgb.shape[:2]}, earlier ones were {self.shape[:2]}")
+        getattr(self, "_write_" + self.kind)(rgb)
+        self.frames += 1
+
+    def _open(self):
+        height, width, _ = self.shape
+        if self.kind == "y4m":
+            self._file = open(self.path, "wb")
+            self._file.write(f"YUV4MPEG2 W{width} H{height} F{self.fps}:1 Ip A1:1 C444\n".encode())
+        elif self.kind == "apng":
+            self._file = open(self.path, "wb")
+            self._file.write(PNG_SIGNATURE + _ihdr(width, height))
+            # frame count is patched on close
+            self._actl = self._file.tell()
+            self._file.write(_chunk(b"acTL", struct.pack(">II", 0, 0)))
+
+    def _write_png(self, rgb):
+        if "{index" in self.path:
+            path = self.path.format(index=self.frames)
+        elif self.frames:
+            raise ValueError(f"{self.path} holds one frame, put an {{index}} in the path for more")
+        else:
+            path = self.path
+        Path(path).write_bytes(encode_png(rgb, self.level))
+
+    def _write_apng(self, rgb):
+        height, width, _ = rgb.shape
+        control = struct.pack(">IIIIIHHBB", self._sequence, width, height, 0, 0, 1, self.fps, 0, 0)
+        self._file.write(_chunk(b"fcTL", control))
+        self._sequence += 1
+        data = _compress(rgb, self.level)
+        if self.frames == 0:
+            # the first frame doubles as the still image
+            self._file.write(_chunk(b"IDAT", data))
+        else:
+            self._file.write(_chunk(b"fdAT", struct.pack(">I", self._sequence) + data))
+            self._sequence += 1
+
+    def _write_y4m(self, rgb):
+        self._file.write(b"FRAME\n")
+        self._file.write(rgb_to_yuv444(rgb).tobytes())
+
+    def close(self):
+        if self._file is None:
+            return
+        if self.kind == "apng":
+            self._file.write(_chunk(b"IEND", b""))
+            self._file.seek(self._actl)
+            self._file.write(_chunk(b"acTL", struct.pack(">II", self.frames, 0)))
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def rgb_to_yuv444(rgb):
+    """(h, w, 3) uint8 -> (3, h, w) uint8 Y, Cb, Cr planes, BT.601 limited
+    range in 8 bit fixed point."""
+    r, g, b = (rgb[..., i].astype(np.int32) for i in range(3))
+    y = ((66 * r + 129 * g + 25 * b + 128) >> 8) + 16
+    u = ((-38 * r - 74 * g + 112 * b + 128) >> 8) + 128
+    v = ((112 * r - 94 * g - 18 * b + 128) >> 8) + 128
+    return np.stack([y, u, v]).astype(np.uint8)
+
+
+def main():
+    from capture import open_capture
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture", help="image capture (RGB565 frames or color|depth tiles)")
+    parser.add_argument("output", help=".png (with {index} for several), .apng or .y4m")
+    parser.add_argument("--fps", type=int, default=60)
+    parser.add_argument("--replicate", action="store_true", help="replicate low bits, 31 -> 255 instead of 248")
+    args = parser.parse_args()
+
+    capture = open_capture(args.capture)
+    with FrameWriter(args.output, args.fps, args.replicate) as writer:
+        for index in capture.frame_indices():
+            for frame in capture.frame(index):
+                writer.write(frame)
+    print(f"{writer.frames} frames to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
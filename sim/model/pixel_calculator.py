@@ -0,0 +1,90 @@
+"""Bit exact model of hdl/pixel_calculator.sv.
+
+Edge and pixel vectors are signed 16 bit (they wrap), the cross products are
+signed 32 bit and c11 - c12 etc. wrap at 32 bits too, same as the HDL. Triangles
+whose three x coords are equal (points_form_vertical_line) never cover anything.
+"""
+import numpy as np
+
+from codec import unpack_triangles, wrap
+
+WIDTH = 1280
+HEIGHT = 720
+
+
+def _edges(f):
+    # (ab, bc, ca) edge vectors and the vertex each pixel vector starts from
+    p = [(f["p1x"], f["p1y"]), (f["p2x"], f["p2y"]), (f["p3x"], f["p3y"])]
+    return [
+        (wrap(p[(i + 1) % 3][0] - p[i][0], 16), wrap(p[(i + 1) % 3][1] - p[i][1], 16), p[i][0], p[i][1])
+        for i in range(3)
+    ]
+
+
+def _vertical(f):
+    return (f["p1x"] == f["p2x"]) & (f["p2x"] == f["p3x"])
+
+
+def edge_functions(fields, x, y):
+    """The three cross products pixel_inside compares against 0, for every
+    (triangle, x, y). A pixel on an edge has one of them at exactly 0."""
+    x = np.asarray(x, dtype=np.int64) & 0x7FF  # xcoord_in is 11 bits, zero extended
+    y = np.asarray(y, dtype=np.int64) & 0x3FF  # ycoord_in is 10 bits
+    d = []
+    for ex, ey, px, py in _edges(fields):
+        c1 = ex * wrap(y - py, 16)
+        c2 = ey * wrap(x - px, 16)
+        d.append(wrap(c1 - c2, 32))
+    return d
+
+
+def pixel_inside(fields, x, y):
+    """pixel_inside for every (triangle, x, y), with numpy broadcasting.
+
+    fields is the dict from codec.unpack_triangles (or any broadcastable
+    subset of it), x and y are xcoord_in / ycoord_in.
+    """
+    d = edge_functions(fields, x, y)
+    lo = np.minimum(np.minimum(d[0], d[1]), d[2])
+    hi = np.maximum(np.maximum(d[0], d[1]), d[2])
+    return ~_vertical(fields) & ((lo >= 0) | (hi <= 0))
+
+
+def inside_mask(fields, index=0, width=WIDTH, height=HEIGHT, out=None):
+    """(height, width) bool mask of the pixels triangle `index` covers.
+
+    Every product only depends on x or on y, so they are computed per row and
+    per column and only the (wrapping) int32 difference is done per pixel.
+    """
+    f = {k: int(v[index]) for k, v in fields.items()}
+    if out is None:
+        out = np.empty((height, width), dtype=bool)
+    if f["p1x"] == f["p2x"] == f["p3x"]:
+        out[:] = False
+        return out
+    xs = np.arange(width, dtype=np.int64) & 0x7FF
+    ys = np.arange(height, dtype=np.int64) & 0x3FF
+    lo = hi = None
+    for ex, ey, px, py in _edges(f):
+        # each product fits in int32, int32 subtraction wraps like the HDL
+        row = (ex * wrap(ys - py, 16)).astype(np.int32)[:, None]
+        col = (ey * wrap(xs - px, 16)).astype(np.int32)[None, :]
+        d = row - col
+        if lo is None:
+            lo, hi = d, d.copy()
+        else:
+            np.minimum(lo, d, out=lo)
+            np.maximum(hi, d, out=hi)
+    np.greater_equal(lo, 0, out=out)
+    out |= hi <= 0
+    return out
+
+
+def inside_frame(triangles, width=WIDTH, height=HEIGHT):
+    """(N, height, width) bool coverage of a whole frame of packed triangles."""
+    fields = unpack_triangles(triangles)
+    n = len(fields["color"])
+    masks = np.empty((n, height, width), dtype=bool)
+    for i in range(n):
+        inside_mask(fields, i, width, height, out=masks[i])
+    return masks
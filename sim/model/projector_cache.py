@@ -0,0 +1,195 @@
+"""Content addressed cache of full_projector output.
+
+A renderer experiment needs the triangles full_projector makes for some
+obstacles and a player, and simulating triangle_creator -> ddd_projector
+for that every run is slow. The cache keys a frame by everything the
+triangles depend on:
+
+    the obstacle stream, as the 16 bit words that go into full_projector
+    player_height, player_lane, ducking
+    the contents of every projector HDL source (PROJECTOR_SOURCES)
+
+and keeps the triangle stream as a projector capture (capture.py, one
+frame, TRIANGLE_DTYPE). Editing any projector source changes every key, so
+stale triangles are never replayed, they just stop being hit and age out.
+
+    cache = ProjectorCache()
+    key = frame_key(obstacles, player_height=-128, player_lane=1)
+    triangles = cache.get(key)          # None on a miss
+    cache.put(key, triangles)           # test_full_projector does this
+
+projected() is the lookup renderer tests use: the cached triangles if the
+projector has been simulated on the frame, otherwise the model's (scene.py
+into ddd_projector.py), which are bit exact with it but not cached, only
+simulation output goes in here.
+
+The cache is bounded by total size (max_bytes, $PROJECTOR_CACHE_MB) and
+evicts least recently used frames first; a hit counts as a use. It lives in
+$PROJECTOR_CACHE, or sim_build/projector_cache under the project, shared by
+every testbench whatever its own sim_build is.
+
+    python sim/model/projector_cache.py           # what's in there
+    python sim/model/projector_cache.py --clear
+"""
+import argparse
+import hashlib
+import os
+import struct
+from pathlib import Path
+
+import numpy as np
+
+from capture import CaptureWriter, open_capture
+from codec import OBSTACLE_DTYPE, TRIANGLE_DTYPE, as_triangles, encode_obstacles, wrap
+
+PROJ_PATH = Path(__file__).resolve().parent.parent.parent
+HDL_PATH = PROJ_PATH / "hdl"
+# everything test_full_projector builds
+PROJECTOR_SOURCES = [
+    "full_projector.sv",
+    "triangle_creator.sv",
+    "ddd_projector.sv",
+    "pipeline.sv",
+    "divider3.sv",
+    "log2.sv",
+    "sprite_creator.sv",
+]
+# the frame test_full_projector simulates and caches and test_renderer replays
+PROJECTOR_FRAME = {"obstacles": [(4, 0, 128), (4, 1, 256), (4, 1, 128), (1, 2, 256)],
+                   "player_height": -128, "player_lane": 0, "ducking": False}
+CACHE_PATH = Path(os.getenv("PROJECTOR_CACHE", PROJ_PATH / "sim_build" / "projector_cache"))
+MAX_BYTES = int(float(os.getenv("PROJECTOR_CACHE_MB", "64")) * (1 << 20))
+SUFFIX = ".cap"
+
+_HDL_DIGESTS = {}
+
+
+def hdl_digest(sources=PROJECTOR_SOURCES):
+    """sha256 over the names and contents of the projector sources."""
+    h = hashlib.sha256()
+    for source in sources:
+        path = HDL_PATH / source
+        # rehashed only when the file changes
+        stamp = path.stat().st_mtime_ns
+        if _HDL_DIGESTS.get(source, (None,))[0] != stamp:
+            _HDL_DIGESTS[source] = (stamp, hashlib.sha256(path.read_bytes()).digest())
+        h.update(source.encode() + b"\0" + _HDL_DIGESTS[source][1])
+    return h.hexdigest()
+
+
+def frame_key(obstacles, player_height, player_lane, ducking=False, sources=PROJECTOR_SOURCES):
+    """Hex key of one frame: obstacle words, player inputs and projector HDL."""
+    obstacles = np.asarray(obstacles, dtype=OBSTACLE_DTYPE) if len(obstacles) else np.zeros(0, dtype=OBSTACLE_DTYPE)
+    h = hashlib.sha256()
+    h.update(b"obstacles" + struct.pack("<I", len(obstacles)) + encode_obstacles(obstacles))
+    h.update(struct.pack("<HBB", int(wrap(player_height, 16)) & 0xFFFF, int(player_lane) & 0x3, bool(ducking)))
+    h.update(hdl_digest(sources).encode())
+    return h.hexdigest()
+
+
+class ProjectorCache:
+    """A directory of <key>.cap files, least recently used by mtime."""
+
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_BYTES):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _file(self, key):
+        return self.path / f"{key}{SUFFIX}"
+
+    def get(self, key):
+        """The cached triangles (TRIANGLE_DTYPE) for key, or None."""
+        path = self._file(key)
+        try:
+            triangles = np.array(open_capture(path).frame(0))
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return triangles
+
+    def put(self, key, triangles):
+        """Stores triangles under key and evicts down to max_bytes."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        path = self._file(key)
+        # written next to it and renamed, a reader never sees half a frame
+        partial = path.with_suffix(f".{os.getpid()}.tmp")
+        with CaptureWriter(partial, TRIANGLE_DTYPE) as capture:
+            capture.write_many(as_triangles(triangles), index=0)
+        os.replace(partial, path)
+        self.evict()
+        return path
+
+    def entries(self):
+        """[(path, bytes, last use)] oldest use first."""
+        found = []
+        for path in self.path.glob(f"*{SUFFIX}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            found.append((path, stat.st_size, stat.st_mtime_ns))
+        return sorted(found, key=lambda e: e[2])
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, max_bytes=None):
+        """Drops least recently used frames until the cache fits, returns how many."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        dropped = 0
+        for path, size, _ in entries:
+            if total <= max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            dropped += 1
+        return dropped
+
+    def clear(self):
+        return self.evict(0)
+
+
+def model_triangles(obstacles, player_height, player_lane, ducking=False):
+    """What the projector model says full_projector puts out for a frame."""
+    from ddd_projector import project
+    from scene import frame_vertices
+
+    obstacles = np.asarray(obstacles, dtype=OBSTACLE_DTYPE) if len(obstacles) else np.zeros(0, dtype=OBSTACLE_DTYPE)
+    vertices, colors = frame_vertices(obstacles, player_height, player_lane, ducking)
+    return as_triangles(project(vertices, colors))
+
+
+def projected(obstacles, player_height, player_lane, ducking=False, cache=None):
+    """(triangles, "cache" or "model") for a frame, see the module docstring."""
+    cache = cache or ProjectorCache()
+    triangles = cache.get(frame_key(obstacles, player_height, player_lane, ducking))
+    if triangles is not None:
+        return triangles, "cache"
+    return model_triangles(obstacles, player_height, player_lane, ducking), "model"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--path", default=CACHE_PATH, help="cache directory")
+    parser.add_argument("--clear", action="store_true", help="drop everything")
+    parser.add_argument("--max-mb", type=float, default=None, help="evict down to this many MB")
+    args = parser.parse_args()
+
+    cache = ProjectorCache(args.path)
+    if args.clear:
+        print(f"dropped {cache.clear()} frames")
+    elif args.max_mb is not None:
+        print(f"dropped {cache.evict(int(args.max_mb * (1 << 20)))} frames")
+    entries = cache.entries()
+    print(f"{len(entries)} frames, {sum(e[1] for e in entries) / (1 << 20):.2f} MB in {cache.path} "
+          f"(limit {cache.max_bytes / (1 << 20):g} MB), projector HDL {hdl_digest()[:16]}")
+
+
+if __name__ == "__main__":
+    main()
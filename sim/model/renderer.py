@@ -0,0 +1,144 @@
+"""Reference model of hdl/renderer.sv, gives the same 1280x720 RGB565 frame.
+
+The renderer paints one row of 16 80x10 tiles at a time. Every tile_painter
+walks all the triangles in BRAM order, visits the part of each triangle's
+bounding box that falls in its tile (max_x / max_y are exclusive) and writes
+{color, depth} only where the pixel is inside and strictly closer than what the
+tile already holds, so on a depth tie the earlier triangle stays. tile_bram.mem
+is only the BRAM init, so it is what the first tile row of the first frame
+starts from; every row after that starts from the wipe to all ones. On the way
+to DRAM every pixel gets hazed towards white based on its depth.
+
+Tile rows don't depend on each other, so they are spread over a process pool.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from bram import read_memh
+from codec import as_triangles, unpack_triangles
+from depth_calculator import depth_calculator, centered
+from pixel_calculator import pixel_inside
+
+WIDTH = 1280
+HEIGHT = 720
+TILE_WIDTH = 80
+TILE_HEIGHT = 10
+N_WAY_PARALLEL = 16
+MAX_TRIANGLES = 256
+TILE_ROWS = HEIGHT // TILE_HEIGHT
+
+TILE_BRAM_MEM = Path(__file__).resolve().parent.parent.parent / "data" / "tile_bram.mem"
+
+
+def load_tile_init(path=TILE_BRAM_MEM):
+    """Initial tile BRAM contents (80x10 of color|depth) from a $readmemh file."""
+    return read_memh(path, 32).astype(np.uint32).reshape(TILE_HEIGHT, TILE_WIDTH)
+
+
+def triangle_bram(triangles):
+    """What the painters actually read: num_triangles is 8 bits and the write
+    address wraps, so triangle 256 overwrites triangle 0 and num_triangles
+    ends up as len(triangles) % 256."""
+    triangles = as_triangles(triangles)
+    n = len(triangles)
+    addr = np.arange(n % MAX_TRIANGLES)
+    # last triangle written to each address
+    return triangles[addr + MAX_TRIANGLES * ((n - 1 - addr) // MAX_TRIANGLES)]
+
+
+def _visited(lo, hi, offset, size, span):
+    """[start, stop) of the coords the painters of one tile row/column visit.
+
+    Non degenerate boxes are half open, a box with lo == hi still gets its one
+    line visited unless it sits exactly on a tile edge.
+    """
+    if lo == hi:
+        if offset < lo < offset + span and lo % size != 0:
+            return lo, lo + 1
+        return lo, lo
+    return max(lo, offset), min(hi, offset + span)
+
+
+def paint_tile_row(fields, tile_index, tile_init=None, tile_width=TILE_WIDTH, tile_height=TILE_HEIGHT,
+                   n_way=N_WAY_PARALLEL, x_offset=0):
+    """(10, 1280) uint32 color|depth tile contents of one tile row after painting.
+
+    The other arguments paint a (tile_height, n_way * tile_width) band of
+    some other tile geometry starting at x_offset, for tile_sweep.py.
+    """
+    y_offset = tile_index * tile_height
+    if tile_init is None:
+        tile_init = np.full((tile_height, tile_width), 0xFFFFFFFF, dtype=np.uint32)
+    tiles = np.tile(tile_init, (1, n_way))
+    color = (tiles >> 16).astype(np.uint16)
+    depth = (tiles & 0xFFFF).astype(np.uint16)
+
+    xs_all = np.stack([fields["p1x"], fields["p2x"], fields["p3x"]])
+    ys_all = np.stack([fields["p1y"], fields["p2y"], fields["p3y"]])
+    min_x, max_x = xs_all.min(axis=0), xs_all.max(axis=0)
+    min_y, max_y = ys_all.min(axis=0), ys_all.max(axis=0)
+
+    for i in range(len(fields["color"])):
+        y0, y1 = _visited(int(min_y[i]), int(max_y[i]), y_offset, tile_height, tile_height)
+        if y0 >= y1:
+            continue
+        x0, x1 = _visited(int(min_x[i]), int(max_x[i]), x_offset, tile_width, n_way * tile_width)
+        if x0 >= x1:
+            continue
+        f = {k: v[i] for k, v in fields.items()}
+        xs = np.arange(x0, x1)[None, :]
+        ys = np.arange(y0, y1)[:, None]
+        d = depth_calculator(f, *centered(xs, ys)).astype(np.uint16)
+        rows = slice(y0 - y_offset, y1 - y_offset)
+        cols = slice(x0 - x_offset, x1 - x_offset)
+        write = pixel_inside(f, xs, ys) & (depth[rows, cols] > d)
+        depth[rows, cols][write] = d[write]
+        color[rows, cols][write] = f["color"]
+    return (color.astype(np.uint32) << 16) | depth
+
+
+def _paint_rows(args):
+    fields, tile_indices, tile_init = args
+    # only row 0 sees the init file, the rest start out wiped
+    return [paint_tile_row(fields, t, tile_init if t == 0 else None) for t in tile_indices]
+
+
+def paint(triangles, processes=None, tile_init=None):
+    """(720, 1280) uint32 color|depth for a frame, before haze.
+
+    tile_init (default tile_bram.mem) is what tile row 0 starts from, as on
+    the first frame after configuration. processes=None uses every core,
+    processes=1 stays in this process.
+    """
+    fields = unpack_triangles(triangle_bram(triangles))
+    if tile_init is None:
+        tile_init = load_tile_init()
+    processes = processes or os.cpu_count() or 1
+    # contiguous chunks of tile rows, a few per worker to even out the load
+    chunks = np.array_split(np.arange(TILE_ROWS), min(TILE_ROWS, processes * 4))
+    jobs = [(fields, chunk, tile_init) for chunk in chunks if len(chunk)]
+    if processes == 1:
+        rows = [r for job in jobs for r in _paint_rows(job)]
+    else:
+        with ProcessPoolExecutor(processes) as pool:
+            rows = [r for result in pool.map(_paint_rows, jobs) for r in result]
+    return np.concatenate(rows, axis=0)
+
+
+def shade(pixels):
+    """r_final / g_final / b_final: haze from depth, clamped, packed as RGB565."""
+    pixels = np.asarray(pixels, dtype=np.uint32)
+    depth = (pixels & 0xFFFF).astype(np.int32)
+    haze = np.where(depth >= 960, 127, np.where(depth < 832, 0, depth - 832))
+    r = np.minimum((haze >> 2) + ((pixels >> 27) & 0x1F), 31)
+    g = np.minimum((haze >> 1) + ((pixels >> 21) & 0x3F), 63)
+    b = np.minimum((haze >> 2) + ((pixels >> 16) & 0x1F), 31)
+    return ((r << 11) | (g << 5) | b).astype(np.uint16)
+
+
+def render_frame(triangles, processes=None, tile_init=None):
+    """The (720, 1280) RGB565 frame the renderer sends to DRAM."""
+    return shade(paint(triangles, processes, tile_init))
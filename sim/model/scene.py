@@ -0,0 +1,233 @@
+"""Model of triangle_creator.sv + sprite_creator.sv: what full_projector feeds
+ddd_projector for a frame of obstacles and the player.
+
+The vertex tables aren't copied in here, they are read out of the HDL: every
+`vertex_counter == k` (or `counter == k`) block's assignments, with the
+registers that a block doesn't assign keeping their value from the one
+before, just like the always_ff. Vertex k of an obstacle comes out the
+cycle after block k, new_triangle with every third one, so triangle j is
+vertices 3j .. 3j + 2 and its color is the color register at vertex 3j.
+
+On top of the tables:
+  - triangle_creator clamps vertex z to MINZ
+  - types 1 to 3 closer than 32 + MINZ (whatever `obstacle_depth <` guard a
+    type has) make no geometry, but still pulse new_triangle once, so
+    ddd_projector projects a triangle of three copies of whatever vertex
+    triangle_creator put out last
+  - the sprite is 16 triangles after the obstacles, ducking picks the
+    first half of the table
+
+    vertices, colors = frame_vertices(obstacles, player_height=-128, player_lane=1)
+    triangles = project(vertices, colors)       # what full_projector puts out
+
+scenes() plays the game model and records frames to feed this.
+"""
+import re
+from pathlib import Path
+
+import numpy as np
+
+from codec import OBSTACLE_DTYPE, wrap
+
+HDL_PATH = Path(__file__).resolve().parent.parent.parent / "hdl"
+MINZ = 8
+TOO_CLOSE = 32 + MINZ
+# games scenes() starts over before giving up
+MAX_RESTARTS = 100
+REGISTERS = ("vertex_x", "vertex_y", "vertex_z", "color")
+
+
+def _source(name):
+    text = (HDL_PATH / name).read_text()
+    return re.sub(r"//[^\n]*", "", text)
+
+
+def _localparams(text):
+    params = {}
+    for name, value in re.findall(r"localparam\s+(?:signed\s+)?(?:\[[^\]]*\]\s*)?(\w+)\s*=\s*([^;]+);", text):
+        params[name] = int(eval(_expression(value), {}, params))
+    return params
+
+
+def _expression(verilog):
+    # sized literals and $signed() are all the tables use beyond + and -
+    python = re.sub(r"\d+'h([0-9a-fA-F]+)", r"0x\1", verilog)
+    python = re.sub(r"\d+'d(\d+)", r"\1", python)
+    return python.replace("$signed", "").strip()
+
+
+def _blocks(text, counter):
+    """{k: {register: expression}} for every `counter == k` block in text."""
+    blocks = {}
+    for k, body in re.findall(rf"\b{counter}\s*==\s*(\d+)\s*\)\s*begin(.*?)\bend\b", text, re.S):
+        blocks[int(k)] = {name: _expression(value) for name, value in re.findall(r"(\w+)\s*<=\s*([^;]+);", body)
+                          if name in REGISTERS}
+    return blocks
+
+
+def _table(blocks):
+    """Per vertex {register: expression}, with unassigned registers carried over."""
+    table = []
+    current = {}
+    for k in range(max(blocks) + 1):
+        current = {**current, **blocks.get(k, {})}
+        table.append(current)
+    return table
+
+
+def _obstacle_tables(text=None):
+    text = _source("triangle_creator.sv") if text is None else re.sub(r"//[^\n]*", "", text)
+    params = _localparams(text)
+    body = text[text.index("GEN_TRIANGLE) begin"):]
+    parts = re.split(r"obstacle_type\s*==\s*(\d+)\s*\)", body)
+    tables, skip = {}, {}
+    for t, part in zip(parts[1::2], parts[2::2]):
+        tables[int(t)] = _table(_blocks(part, "vertex_counter"))
+        # "if(obstacle_depth < 32 + MINZ) begin ... state <= IDLE" before the first vertex
+        guard = re.match(r"\s*begin\s*if\s*\(\s*obstacle_depth\s*<\s*([^)]+)\)", part)
+        if guard:
+            skip[int(t)] = int(eval(_expression(guard.group(1)), {}, params))
+    params["skip"] = skip
+    return tables, params
+
+
+def _sprite_tables(text=None):
+    text = _source("sprite_creator.sv") if text is None else re.sub(r"//[^\n]*", "", text)
+    params = _localparams(text)
+    body = text[text.index("state == ACTIVE"):]
+    ducking_start = body.index("if(ducking)")
+    standing_start = body.index("end else begin", ducking_start)
+    # the shared vertices start at the first `if (counter == k)` after the
+    # standing branch's own first one
+    firsts = [m.start() for m in re.finditer(r"(else\s+)?if\s*\(\s*counter\s*==", body[standing_start:])
+              if m.group(1) is None]
+    shared_start = standing_start + firsts[1]
+    shared = _blocks(body[shared_start:], "counter")
+    ducking = _blocks(body[ducking_start:standing_start], "counter")
+    standing = _blocks(body[standing_start:shared_start], "counter")
+    return {True: _table({**ducking, **shared}), False: _table({**standing, **shared})}, params
+
+
+_TABLES = {}
+
+
+def _tables():
+    if not _TABLES:
+        load_tables()
+    return _TABLES
+
+
+def load_tables(triangle_creator=None, sprite_creator=None):
+    """Reads the vertex tables out of SV source text instead of hdl/ (what
+    assets.py generates, say), until the next call. No arguments goes back
+    to hdl/."""
+    _TABLES["obstacle"] = _obstacle_tables(triangle_creator)
+    _TABLES["sprite"] = _sprite_tables(sprite_creator)
+
+
+def triangles_per_type():
+    """{obstacle type: triangles triangle_creator makes for it}."""
+    tables, _ = _tables()["obstacle"]
+    return {t: len(table) // 3 for t, table in sorted(tables.items())}
+
+
+def skip_depths():
+    """{obstacle type: depth below which it makes no geometry}."""
+    return dict(_tables()["obstacle"][1]["skip"])
+
+
+def sprite_triangles(ducking=False):
+    tables, _ = _tables()["sprite"]
+    return len(tables[bool(ducking)]) // 3
+
+
+def _evaluate(table, env):
+    """[x, y, z, color] per vertex of one table."""
+    values = {}
+    rows = []
+    for entry in table:
+        for name, expression in entry.items():
+            if expression not in values:
+                values[expression] = eval(expression, {}, env)
+        rows.append([values[entry[name]] for name in REGISTERS])
+    return rows
+
+
+def _lanes(lane, params):
+    lane = np.asarray(lane)
+    left = np.where(lane == 0, params["LEFTLANELEFT"], np.where(lane == 1, params["MIDDLELANELEFT"], params["RIGHTLANELEFT"]))
+    right = np.where(lane == 0, params["LEFTLANERIGHT"], np.where(lane == 1, params["MIDDLELANERIGHT"], params["RIGHTLANERIGHT"]))
+    return left, right
+
+
+def obstacle_vertices(obstacles, stale=(0, 0, 0, 0)):
+    """(vertices (N, 3, 3), colors (N,)) triangle_creator makes for a list
+    of obstacles, in order. stale is the (x, y, z, color) left in its
+    registers from before, which a too close obstacle turns into a triangle."""
+    tables, params = _tables()["obstacle"]
+    obstacles = np.asarray(obstacles, dtype=OBSTACLE_DTYPE)
+    vertices, colors = [], []
+    last = list(stale)
+    for obstacle in obstacles:
+        t, depth = int(obstacle["type"]), int(obstacle["depth"])
+        if t not in tables:
+            raise ValueError(f"triangle_creator never finishes an obstacle of type {t}")
+        if depth < params["skip"].get(t, 0):
+            vertices.append([last[:3]] * 3)
+            colors.append(last[3])
+            continue
+        left, right = _lanes(int(obstacle["lane"]), params)
+        env = {**params, "lane_left": int(left), "lane_right": int(right), "obstacle_depth": depth}
+        rows = _evaluate(tables[t], env)
+        for row in rows:
+            row[2] = max(int(row[2]), MINZ)
+        for j in range(0, len(rows), 3):
+            vertices.append([row[:3] for row in rows[j:j + 3]])
+            colors.append(rows[j][3])
+        last = rows[-1]
+    v = wrap(np.array(vertices, dtype=np.int64).reshape(-1, 3, 3), 16)
+    return v, np.array(colors, dtype=np.int64) & 0xFFFF
+
+
+def sprite_vertices(player_height, player_lane, ducking=False):
+    """(vertices (16, 3, 3), colors (16,)) sprite_creator makes."""
+    tables, params = _tables()["sprite"]
+    left, right = _lanes(player_lane, params)
+    env = {**params, "lane_left": int(left), "lane_right": int(right), "player_height": int(wrap(player_height, 16))}
+    rows = _evaluate(tables[bool(ducking)], env)
+    v = wrap(np.array([row[:3] for row in rows], dtype=np.int64).reshape(-1, 3, 3), 16)
+    return v, np.array([row[3] for row in rows[::3]], dtype=np.int64) & 0xFFFF
+
+
+def frame_vertices(obstacles, player_height, player_lane, ducking=False, stale=(0, 0, 0, 0)):
+    """Everything full_projector projects for one frame: obstacles, then the sprite."""
+    ov, oc = obstacle_vertices(obstacles, stale)
+    sv, sc = sprite_vertices(player_height, player_lane, ducking)
+    return np.concatenate([ov, sv]), np.concatenate([oc, sc])
+
+
+def scenes(frames=8, speed=2, every=64, start=640, seed=0, max_restarts=MAX_RESTARTS):
+    """Frames of a reflex player's game, every `every` frames from frame
+    `start` on (the storage takes a while to fill up), as dicts of
+    obstacles, player_height, player_lane and ducking. A game that ends
+    starts over with the next seed."""
+    from game import Game, ReflexPolicy
+
+    game = Game(1, speed, seed=seed)
+    policy = ReflexPolicy(seed=seed)
+    recorded = []
+    restarts = 0
+    while len(recorded) < frames:
+        game.step(policy)
+        if game.game_over[0]:
+            # the policy is deterministic, so the same seed would end the same way
+            restarts += 1
+            if restarts > max_restarts:
+                raise RuntimeError(f"{restarts - 1} games from seed {seed} at speed {speed} ended with "
+                                   f"{len(recorded)} of {frames} frames recorded")
+            game = Game(1, speed, seed=seed + restarts)
+            continue
+        if game.frame >= start and game.frame % every == 0:
+            recorded.append({"obstacles": game.obstacles(0), "player_height": int(game.height[0]),
+                             "player_lane": int(game.lane[0]), "ducking": bool(game.ducking[0])})
+    return recorded
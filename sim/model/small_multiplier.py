@@ -0,0 +1,15 @@
+"""Bit exact model of hdl/small_multiplier.sv (shift and add, 9 stages)."""
+import numpy as np
+
+from codec import wrap
+
+
+def small_multiplier(signed_11, signed_8):
+    """signed_output for arrays of 11 bit and 8 bit signed inputs."""
+    a = wrap(np.asarray(signed_11, dtype=np.int64), 11)
+    b = np.asarray(signed_8, dtype=np.int64) & 0xFF
+    total = np.zeros(np.broadcast(a, b).shape, dtype=np.int64)
+    for i in range(7):
+        total = wrap(total + np.where((b >> i) & 1, a << i, 0), 19)
+    # bit 7 is the sign bit of signed_8, so that partial product is subtracted
+    return wrap(total - np.where((b >> 7) & 1, a << 7, 0), 19)
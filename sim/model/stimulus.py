@@ -0,0 +1,519 @@
+"""Coverage directed random stimulus for the projection and raster pipeline.
+
+Three generators, one per testbench:
+
+  VertexStimulus    triangles of three (x, y, z) vertices for ddd_projector
+  PixelStimulus     a projected triangle plus probe pixels for pixel_calculator
+  ObstacleStimulus  a frame of obstacles and the player for full_projector
+
+Each one tracks functional coverage bins on what it hands out, worked out
+with the bit exact models (cshift from ddd_projector.normal, edge functions
+from pixel_calculator, depth from depth_calculator), so nothing needs the
+simulator to know what got covered.
+
+Steering: every item is the best of `tries` candidates, each drawn from a
+random recipe (uniform, off screen, degenerate, a chosen cshift, a depth
+tie, a frame at the triangle limit...). A candidate scores 1 / (1 + hits)
+for every bin it lands in, per simulated cycle it costs, so unhit bins win
+and cheap items win. steer=False is the blind baseline: one uniform draw
+per item, like the old test_against_model benches.
+
+    stimulus = VertexStimulus(seed=0)
+    for vertices, color in stimulus.until_covered():
+        ...
+    print(stimulus.coverage.report())
+
+    python sim/model/stimulus.py all          # steered vs blind, items and cycles to closure
+
+Constraints worth knowing:
+  - vertex z is kept >= 8, triangle_creator clamps to MINZ so the
+    projector never sees less
+  - obstacle types are 1 to 5 and lanes 0 to 2: triangle_creator has no
+    branch for types 0, 6 and 7 and never leaves GEN_TRIANGLE for them
+  - c1 - c2 in pixel_calculator can't overflow 32 bits for any 16 bit
+    inputs, so there is no bin for it; the 16 bit edge vectors can wrap
+"""
+import argparse
+
+import numpy as np
+
+from codec import OBSTACLE_DTYPE
+from ddd_projector import cshift, ddd_projector, normal
+from depth_calculator import pixel_depth
+from pixel_calculator import edge_functions, pixel_inside
+from scene import sprite_triangles, triangles_per_type
+
+WIDTH = 1280
+HEIGHT = 720
+MINZ = 8
+TRIES = 8
+
+# triangles triangle_creator makes for obstacle types 1 to 5, out of the
+# tables in hdl/ (data/scene.json, through assets.py)
+TRIANGLES_PER_TYPE = triangles_per_type()
+# types 1 to 3 skip obstacles this close, still pulsing new_triangle once
+TOO_CLOSE = 32 + MINZ
+SPRITE_TRIANGLES = sprite_triangles()
+MAX_TRIANGLES = 256
+MAX_OBSTACLES = 48
+# WAIT + 48 sprite vertices + ddd_projector latency + the done handshake
+FRAME_OVERHEAD = 72
+GROUND = -128
+
+
+class Coverage:
+    """Hit counts for a fixed list of bins."""
+
+    def __init__(self, bins):
+        self.hits = dict.fromkeys(bins, 0)
+
+    def add(self, bins):
+        for name in bins:
+            self.hits[name] += 1
+
+    def score(self, bins):
+        return sum(1 / (1 + self.hits[name]) for name in bins)
+
+    @property
+    def missing(self):
+        return [name for name, hits in self.hits.items() if not hits]
+
+    @property
+    def fraction(self):
+        return 1 - len(self.missing) / len(self.hits)
+
+    def report(self):
+        width = max(map(len, self.hits))
+        lines = [f"{name:<{width}} {hits:7d}" for name, hits in self.hits.items()]
+        lines.append(f"{len(self.hits) - len(self.missing)}/{len(self.hits)} bins covered")
+        return "\n".join(lines)
+
+
+class Stimulus:
+    """Base generator: subclasses give BINS, RECIPES (methods named _<recipe>),
+    bins(item) and cost(item) in cycles."""
+
+    BINS = ()
+    RECIPES = ("uniform",)
+
+    def __init__(self, seed=0, steer=True, tries=TRIES):
+        self.rng = np.random.default_rng(seed)
+        self.steer = steer
+        self.tries = tries
+        self.coverage = Coverage(self.BINS)
+        self.items = 0
+        self.cycles = 0
+
+    def next(self):
+        if self.steer:
+            names = self.rng.choice(self.RECIPES, self.tries)
+            candidates = [getattr(self, "_" + name)() for name in names]
+            scores = [self.coverage.score(self.bins(c)) / self.cost(c) for c in candidates]
+            item = candidates[int(np.argmax(scores))]
+        else:
+            item = self._uniform()
+        self.coverage.add(self.bins(item))
+        self.accept(item)
+        self.items += 1
+        self.cycles += self.cost(item)
+        return item
+
+    def accept(self, item):
+        """Hook for generators that remember what they handed out."""
+
+    def take(self, n):
+        return [self.next() for _ in range(n)]
+
+    def until_covered(self, max_items=10000):
+        """Items until every bin is hit (or max_items)."""
+        while self.coverage.missing and self.items < max_items:
+            yield self.next()
+
+    def _int(self, lo, hi, size=None):
+        # inclusive, like random.randint
+        return self.rng.integers(lo, hi + 1, size=size)
+
+
+##################################### ddd_projector #####################################
+
+def _vertex_bins(vertices):
+    """Bins of one (3, 3) triangle as ddd_projector sees it."""
+    v = np.asarray(vertices, dtype=np.int64).reshape(1, 3, 3)
+    f = ddd_projector(v, [0])
+    xs = np.array([f[f"p{k}x"][0] for k in (1, 2, 3)])
+    ys = np.array([f[f"p{k}y"][0] for k in (1, 2, 3)])
+    bins = set()
+    if (v[0, :, 0] < 0).any():
+        bins.add("negative x")
+    if (v[0, :, 1] < 0).any():
+        bins.add("negative y")
+    for name, hit in (("left", xs < 0), ("right", xs >= WIDTH), ("top", ys < 0), ("bottom", ys >= HEIGHT)):
+        if hit.any():
+            bins.add("off screen " + name)
+    if xs[0] == xs[1] == xs[2]:
+        bins.add("vertical line")
+    # project_coord's normalization: |c| << 8 past 16 bits shifts z too
+    mag = np.abs(v[0, :, :2]) << 8
+    shift = np.maximum(np.frexp(mag.astype(np.float64))[1] - 16, 0)
+    if (shift > 0).any():
+        bins.add("shifted dividend")
+    if ((v[0, :, 2:] >> shift) == 0).any():
+        bins.add("zero divisor")
+    cx, cy, cz, _ = normal(v)
+    if cx[0] == cy[0] == cz[0] == 0:
+        bins.add("zero normal")
+    bins.add(f"cshift {cshift(v)[0]}")
+    return bins
+
+
+class VertexStimulus(Stimulus):
+    """Items are (vertices, color), vertices a (3, 3) int array of (x, y, z)."""
+
+    BINS = ["negative x", "negative y", "off screen left", "off screen right", "off screen top",
+            "off screen bottom", "vertical line", "zero normal", "shifted dividend", "zero divisor"] \
+        + [f"cshift {k}" for k in range(10)]
+    RECIPES = ("uniform", "wide", "vertical", "plane")
+
+    def bins(self, item):
+        return _vertex_bins(item[0])
+
+    def cost(self, item):
+        return 3
+
+    def _color(self):
+        return int(self._int(0, 0xFFFF))
+
+    def _uniform(self):
+        # what test_ddd_projector's test_against_model drew
+        v = np.stack([self._int(-400, 400, 3), self._int(-300, 300, 3), self._int(MINZ, 2000, 3)], axis=1)
+        return v, self._color()
+
+    def _wide(self):
+        v = np.stack([self._int(-4000, 4000, 3), self._int(-3000, 3000, 3), self._int(MINZ, 400, 3)], axis=1)
+        return v, self._color()
+
+    def _vertical(self):
+        # same x / z on all three projects to one screen x, so does x = 0
+        if self.rng.random() < 0.5:
+            x = np.zeros(3, dtype=np.int64)
+            z = self._int(MINZ, 2000, 3)
+        else:
+            x = np.full(3, self._int(-400, 400))
+            z = np.full(3, self._int(MINZ, 2000))
+        return np.stack([x, self._int(-300, 300, 3), z], axis=1), self._color()
+
+    def _plane(self):
+        # edges along two axes, sized so the cross product lands on a chosen cshift
+        k = int(self._int(0, 9))
+        if k == 9:
+            # |c >>> 4| only reaches 1 << 15 by wrapping at 20 bits
+            cross = (1 << 19) + int(self._int(0, 15))
+        else:
+            cross = int(self._int(1 << (k + 10), (1 << (k + 11)) - 1))
+        p = int(self._int(max(1, -(-cross // 16384)), min(cross, 16384)))
+        q = cross // p
+        i = int(self._int(0, 2))
+        j = (i + 1) % 3
+        a = np.zeros(3, dtype=np.int64)
+        b = np.zeros(3, dtype=np.int64)
+        a[i] = p * self.rng.choice((-1, 1))
+        b[j] = q * self.rng.choice((-1, 1))
+        v1 = np.array([self._int(-200, 200), self._int(-200, 200), self._int(MINZ, 2000)])
+        v = np.stack([v1, v1 - a, v1 - b])
+        # translating keeps the cross product, bring z back up to MINZ
+        v[:, 2] += max(0, MINZ - v[:, 2].min())
+        if np.abs(v).max() > 32767:
+            return self._uniform()
+        return v, self._color()
+
+
+#################################### pixel_calculator ####################################
+
+PIXELS = 16
+
+
+class PixelStimulus(Stimulus):
+    """Items are dicts: fields (ddd_projector output for one triangle,
+    arrays of length 1), vertices, x and y (PIXELS probe pixels).
+
+    Depth bins compare every covered probe pixel against the nearest depth
+    earlier items left there, which is what tile_painter's
+    pixel_depth > triangle_depth does with the tile BRAM."""
+
+    BINS = ["inside", "outside", "on edge", "vertical line", "horizontal line", "negative vertex",
+            "off screen vertex", "edge vector wraps", "nearer", "behind", "depth tie"]
+    RECIPES = ("uniform", "inside", "edge", "degenerate", "wide", "huge", "duplicate", "quad")
+
+    def __init__(self, seed=0, steer=True, tries=TRIES, pixels=PIXELS):
+        self.pixels = pixels
+        self.depth = {}
+        self.last = None
+        super().__init__(seed, steer, tries)
+
+    def cost(self, item):
+        # a cycle per pixel and one to put the triangle up
+        return len(item["x"]) + 1
+
+    def _inside_depth(self, item):
+        f, x, y = item["fields"], item["x"], item["y"]
+        inside = pixel_inside(f, x, y)
+        return inside, pixel_depth(f, x, y)
+
+    def bins(self, item):
+        f, x, y = item["fields"], item["x"], item["y"]
+        bins = set()
+        inside, depth = self._inside_depth(item)
+        if inside.any():
+            bins.add("inside")
+        if not inside.all():
+            bins.add("outside")
+        d = edge_functions(f, x, y)
+        if (inside & ((d[0] == 0) | (d[1] == 0) | (d[2] == 0))).any():
+            bins.add("on edge")
+        xs = [int(f[f"p{k}x"][0]) for k in (1, 2, 3)]
+        ys = [int(f[f"p{k}y"][0]) for k in (1, 2, 3)]
+        if xs[0] == xs[1] == xs[2]:
+            bins.add("vertical line")
+        elif ys[0] == ys[1] == ys[2]:
+            bins.add("horizontal line")
+        if min(xs + ys) < 0:
+            bins.add("negative vertex")
+        if max(xs) >= WIDTH or max(ys) >= HEIGHT:
+            bins.add("off screen vertex")
+        for k in range(3):
+            k2 = (k + 1) % 3
+            if not (-32768 <= xs[k2] - xs[k] < 32768 and -32768 <= ys[k2] - ys[k] < 32768):
+                bins.add("edge vector wraps")
+        for px, py, covered, z in zip(x, y, inside, depth):
+            old = self.depth.get((int(px), int(py)))
+            if covered and old is not None:
+                bins.add("nearer" if z < old else "behind" if z > old else "depth tie")
+        return bins
+
+    def accept(self, item):
+        inside, depth = self._inside_depth(item)
+        for px, py, covered, z in zip(item["x"], item["y"], inside, depth):
+            if covered:
+                key = int(px), int(py)
+                self.depth[key] = min(self.depth.get(key, 1 << 16), int(z))
+        self.last = item
+
+    def _item(self, vertices, x=None, y=None):
+        vertices = np.asarray(vertices, dtype=np.int64).reshape(3, 3)
+        fields = ddd_projector(vertices[None], [int(self._int(0, 0xFFFF))])
+        if x is None:
+            x, y = self._int(0, WIDTH - 1, self.pixels), self._int(0, HEIGHT - 1, self.pixels)
+        return {"fields": fields, "vertices": vertices, "x": np.asarray(x), "y": np.asarray(y)}
+
+    def _vertices(self, x=(-400, 400), y=(-300, 300), z=(MINZ, 2000)):
+        return np.stack([self._int(*x, 3), self._int(*y, 3), self._int(*z, 3)], axis=1)
+
+    def _uniform(self):
+        return self._item(self._vertices())
+
+    def _screen(self, item):
+        f = item["fields"]
+        return (np.array([f[f"p{k}x"][0] for k in (1, 2, 3)]), np.array([f[f"p{k}y"][0] for k in (1, 2, 3)]))
+
+    def _inside(self):
+        # probes in the bounding box, clipped to the screen
+        item = self._item(self._vertices(z=(200, 2000)))
+        xs, ys = self._screen(item)
+        x0, x1 = np.clip([xs.min(), xs.max()], 0, WIDTH - 1)
+        y0, y1 = np.clip([ys.min(), ys.max()], 0, HEIGHT - 1)
+        item["x"], item["y"] = self._int(x0, x1, self.pixels), self._int(y0, y1, self.pixels)
+        return item
+
+    def _edge(self):
+        # vertices and points along the edges, where an edge function is 0
+        item = self._item(self._vertices(z=(200, 2000)))
+        xs, ys = self._screen(item)
+        k = self._int(0, 2, self.pixels)
+        k2 = (k + 1) % 3
+        steps = np.maximum(np.gcd(xs[k2] - xs[k], ys[k2] - ys[k]), 1)
+        t = self.rng.integers(0, steps + 1)
+        x = xs[k] + t * (xs[k2] - xs[k]) // steps
+        y = ys[k] + t * (ys[k2] - ys[k]) // steps
+        keep = (x >= 0) & (x < WIDTH) & (y >= 0) & (y < HEIGHT)
+        if not keep.any():
+            return item
+        item["x"], item["y"] = x[keep], y[keep]
+        return item
+
+    def _degenerate(self):
+        # same x / z projects to a vertical line, same y / z to a horizontal one
+        v = self._vertices()
+        axis = int(self._int(0, 1))
+        v[:, axis] = v[0, axis]
+        v[:, 2] = v[0, 2]
+        item = self._item(v)
+        xs, ys = self._screen(item)
+        # probe along the line, where the horizontal case covers pixels
+        if axis == 1 and 0 <= ys[0] < HEIGHT:
+            item["y"] = np.full(self.pixels, ys[0])
+            item["x"] = self._int(max(xs.min(), 0), max(min(xs.max(), WIDTH - 1), 0), self.pixels)
+        return item
+
+    def _wide(self):
+        return self._item(self._vertices((-4000, 4000), (-3000, 3000), (MINZ, 400)))
+
+    def _huge(self):
+        # screen coords anywhere in 16 bits, far enough apart to wrap
+        item = self._uniform()
+        for k in (1, 2, 3):
+            item["fields"][f"p{k}x"] = self._int(-32768, 32767, 1)
+            item["fields"][f"p{k}y"] = self._int(-32768, 32767, 1)
+        return item
+
+    def _duplicate(self):
+        # the last triangle again in another color: ties everywhere it covers
+        if self.last is None:
+            return self._inside()
+        item = self._item(self.last["vertices"], self.last["x"], self.last["y"])
+        return item
+
+    def _quad(self):
+        # the other half of the last triangle's parallelogram, probed on the
+        # shared edge, like the two triangles of a train car face
+        if self.last is None:
+            return self._inside()
+        v1, v2, v3 = self.last["vertices"]
+        item = self._item(np.stack([v2, v2 + v3 - v1, v3]))
+        xs, ys = self._screen(self.last)
+        t = self.rng.random(self.pixels)
+        x = np.rint(xs[1] + t * (xs[2] - xs[1])).astype(np.int64)
+        y = np.rint(ys[1] + t * (ys[2] - ys[1])).astype(np.int64)
+        keep = (x >= 0) & (x < WIDTH) & (y >= 0) & (y < HEIGHT)
+        if keep.any():
+            item["x"], item["y"] = x[keep], y[keep]
+        return item
+
+
+#################################### full_projector ####################################
+
+def obstacle_triangles(obstacles):
+    """Triangles triangle_creator makes for every obstacle. A skipped (too
+    close) obstacle still makes one: triangle_creator pulses new_triangle on
+    its way back to IDLE and ddd_projector projects whatever vertex was
+    left over."""
+    obstacles = np.asarray(obstacles, dtype=OBSTACLE_DTYPE)
+    per = np.array([0] + [TRIANGLES_PER_TYPE[t] for t in range(1, 6)] + [0, 0])[obstacles["type"]]
+    skipped = (obstacles["type"] <= 3) & (obstacles["depth"] < TOO_CLOSE)
+    return np.where(skipped, 1, per)
+
+
+def triangle_count(obstacles):
+    """Triangles full_projector puts out for one frame, sprite included."""
+    return SPRITE_TRIANGLES + int(obstacle_triangles(obstacles).sum())
+
+
+class ObstacleStimulus(Stimulus):
+    """Items are dicts: obstacles (OBSTACLE_DTYPE array, in the order they
+    are fed), player_height, player_lane and ducking, one frame each."""
+
+    BINS = [f"type {t}" for t in range(1, 6)] + [f"lane {l}" for l in range(3)] \
+        + ["too close", "clamped z", "empty frame"] \
+        + [f"player lane {l}" for l in range(3)] + ["ducking", "on ground", "on train", "airborne"] \
+        + ["255 triangles", "256 triangles", "over 256 triangles"]
+    RECIPES = ("uniform", "close", "limit")
+
+    def bins(self, item):
+        o = item["obstacles"]
+        bins = {f"type {t}" for t in np.unique(o["type"])} | {f"lane {l}" for l in np.unique(o["lane"])}
+        if ((o["type"] <= 3) & (o["depth"] < TOO_CLOSE)).any():
+            bins.add("too close")
+        if ((o["type"] >= 4) & (o["depth"] < 128 + MINZ)).any():
+            bins.add("clamped z")
+        if not len(o):
+            bins.add("empty frame")
+        bins.add(f"player lane {item['player_lane']}")
+        if item["ducking"]:
+            bins.add("ducking")
+        height = item["player_height"]
+        bins.add("on ground" if height == GROUND else "on train" if height == GROUND + 64 else "airborne")
+        n = triangle_count(o)
+        if n == MAX_TRIANGLES - 1:
+            bins.add("255 triangles")
+        elif n == MAX_TRIANGLES:
+            bins.add("256 triangles")
+        elif n > MAX_TRIANGLES:
+            bins.add("over 256 triangles")
+        return bins
+
+    def cost(self, item):
+        # obstacle_valid, then 3 cycles a triangle before triangle_creator is IDLE again
+        return int((3 * obstacle_triangles(item["obstacles"]) + 2).sum()) + FRAME_OVERHEAD
+
+    def _frame(self, types, depths):
+        obstacles = np.zeros(len(types), dtype=OBSTACLE_DTYPE)
+        obstacles["type"] = types
+        obstacles["lane"] = self._int(0, 2, len(types))
+        obstacles["depth"] = depths
+        pick = int(self._int(0, 2))
+        height = (GROUND, GROUND + 64, int(self._int(GROUND, 32)))[pick]
+        return {"obstacles": obstacles, "player_height": height,
+                "player_lane": int(self._int(0, 2)), "ducking": int(self._int(0, 1))}
+
+    def _uniform(self):
+        n = int(self._int(0, 12))
+        return self._frame(self._int(1, 5, n), self._int(0, 2047, n))
+
+    def _close(self):
+        n = int(self._int(1, 4))
+        return self._frame(self._int(1, 5, n), self._int(0, 160, n))
+
+    def _limit(self):
+        # fill up to just around 256 triangles, topping off with too close
+        # barriers (one triangle each)
+        target = int(self.rng.choice([MAX_TRIANGLES - 1, MAX_TRIANGLES, int(self._int(MAX_TRIANGLES + 1, 320))]))
+        types, depths = [], []
+        left = target - SPRITE_TRIANGLES
+        while left > 0 and len(types) < MAX_OBSTACLES:
+            t = int(self._int(1, 5))
+            if TRIANGLES_PER_TYPE[t] <= left and len(types) < MAX_OBSTACLES - 8:
+                types.append(t)
+                depths.append(int(self._int(TOO_CLOSE + 128, 2047)))
+                left -= TRIANGLES_PER_TYPE[t]
+            else:
+                types.append(int(self._int(1, 3)))
+                depths.append(int(self._int(0, TOO_CLOSE - 1)))
+                left -= 1
+        return self._frame(np.array(types, dtype=np.int64), np.array(depths, dtype=np.int64))
+
+
+GENERATORS = {"vertex": VertexStimulus, "pixel": PixelStimulus, "obstacle": ObstacleStimulus}
+
+
+def closure(kind, seed=0, max_items=5000, tries=TRIES):
+    """(steered, blind) generators of `kind`, each run until covered."""
+    runs = []
+    for steer in (True, False):
+        stimulus = GENERATORS[kind](seed=seed, steer=steer, tries=tries)
+        for _ in stimulus.until_covered(max_items):
+            pass
+        runs.append(stimulus)
+    return runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("kind", choices=[*GENERATORS, "all"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-items", type=int, default=5000)
+    parser.add_argument("--tries", type=int, default=TRIES)
+    parser.add_argument("-v", "--verbose", action="store_true", help="print the steered coverage")
+    args = parser.parse_args()
+
+    for kind in GENERATORS if args.kind == "all" else [args.kind]:
+        steered, blind = closure(kind, args.seed, args.max_items, args.tries)
+        print(f"{kind}:")
+        for name, stimulus in (("steered", steered), ("blind", blind)):
+            missing = stimulus.coverage.missing
+            print(f"  {name:8s} {stimulus.items:6d} items {stimulus.cycles:9d} cycles  "
+                  f"{stimulus.coverage.fraction:6.1%} covered" + (f", missing {', '.join(missing)}" if missing else ""))
+        if args.verbose:
+            print(steered.coverage.report())
+
+
+if __name__ == "__main__":
+    main()
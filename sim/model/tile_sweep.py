@@ -0,0 +1,322 @@
+"""Sweep of the renderer's tile geometry: tile width, tile height and painter
+count, against frame cycles, BRAM and the order pixels go to DRAM.
+
+renderer.sv is built around 16 painters of 80x10 tiles, one row of tiles
+covering the 1280 wide screen. A TileGeometry(w, h, n) is the same renderer
+with n painters of w x h tiles: the screen is painted in bands of n tiles,
+ceil(1280 / (n * w)) bands ("passes") per tile row, and every band goes
+through the same states as a tile row does now:
+
+  PAINTING_TILES      slowest painter's work (frame_time.py, same per
+                      triangle costs) + 2, + 3 on the first band
+  WRITING_TO_DRAM     2 cycles a pixel for the band's on screen pixels
+  INTERMEDIATE x2, WIPING_TILES (w * h + 1), INTERMEDIATE x2 (not after
+  the last band)
+
+which for (80, 10, 16) is exactly frame_time(). paint() is the software
+tile renderer for a geometry (renderer.paint_tile_row per band), to check
+a geometry still draws the same frame: only degenerate boxes on a tile
+edge can come out differently.
+
+BRAM is estimated the way synthesis maps the two RAMs of every painter
+(each is written on port a and read on port b, so simple dual port, up to
+72 bits wide on a RAMB36): a 256 x 160 triangle BRAM is 2 RAMB36 + 1
+RAMB18 and an 800 x 32 tile BRAM 1 RAMB36, the renderer's 56 tiles in
+builds/final. DSPs scale with painters from the same build.
+
+The DRAM write order matters because traffic_generator writes chunks to
+consecutive addresses in the order stacker fills them: only raster order
+lands in the right place. More than one pass per tile row writes runs of
+n * w pixels a line apart instead, which needs the address made from
+h_count / v_count and opens DDR rows more often (row activations are
+counted on frame_buffer.py's {row, bank, col} split).
+
+    geometry = TileGeometry(160, 10, 8)
+    geometry.frame_cycles(triangles), geometry.brams(), geometry.dram_pattern()
+    geometry.write_mem("sim_build/tiles_160x10x8")
+    python sim/model/tile_sweep.py --frames 8
+    python sim/model/tile_sweep.py sim_build/test_projector.cap --width 80 160 --height 10 --painters 8 16 --check
+    python sim/model/tile_sweep.py --write sim_build/tile_sweep
+"""
+import argparse
+import math
+from pathlib import Path
+
+import numpy as np
+
+from bram import write_memh
+from codec import unpack_triangles
+from frame_buffer import BANK_BITS, CHUNK_PIXELS, COL_BITS
+from frame_time import CLOCK_HZ, CYCLES_PER_PIXEL, INTERMEDIATE_CYCLES, READ_CYCLES, WAIT_CYCLES, bounding_boxes, spans
+from renderer import (HEIGHT, MAX_TRIANGLES, N_WAY_PARALLEL, TILE_HEIGHT, TILE_WIDTH, WIDTH, load_tile_init,
+                      paint_tile_row, triangle_bram)
+
+# xc7s50 (build.tcl)
+DEVICE_BRAM_TILES = 75
+DEVICE_DSPS = 120
+# builds/final post_synth_util.rpt: everything but the renderer, and the
+# renderer's DSPs (all of them in the 16 tile_painters)
+OTHER_BRAM_TILES = 4
+OTHER_DSPS = 9
+DSPS_PER_PAINTER = 111 / 16
+TRIANGLE_WIDTH = 160
+PIXEL_WIDTH = 32
+
+# simple dual port aspect ratios, (depth, width)
+RAMB36 = [(32768, 1), (16384, 2), (8192, 4), (4096, 9), (2048, 18), (1024, 36), (512, 72)]
+RAMB18 = [(16384, 1), (8192, 2), (4096, 4), (2048, 9), (1024, 18), (512, 36)]
+
+WIDTHS = (40, 80, 160, 320)
+HEIGHTS = (5, 10, 20)
+PAINTERS = (4, 8, 16, 32)
+
+
+def bram_primitives(depth, width):
+    """(RAMB36, RAMB18) for one depth x width simple dual port RAM, the
+    cheapest in BRAM tiles and then in primitives: columns of one RAMB36
+    aspect ratio, what's left over in RAMB18s or one more RAMB36 column,
+    or only RAMB18s."""
+    def only18(w_left):
+        return min(math.ceil(depth / d) * math.ceil(w_left / w) for d, w in RAMB18)
+
+    options = [(0, only18(width))]
+    for d, w in RAMB36:
+        rows = math.ceil(depth / d)
+        columns, left = divmod(width, w)
+        options.append((rows * (columns + (left > 0)), 0))
+        if left:
+            options.append((rows * columns, only18(left)))
+    return min(options, key=lambda o: (o[0] + o[1] / 2, o[0] + o[1]))
+
+
+class TileGeometry:
+
+    def __init__(self, tile_width=TILE_WIDTH, tile_height=TILE_HEIGHT, painters=N_WAY_PARALLEL):
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.painters = painters
+        self.tile_rows = math.ceil(HEIGHT / tile_height)
+        self.passes = math.ceil(WIDTH / (painters * tile_width))
+        self.tile_words = tile_width * tile_height
+
+    def __repr__(self):
+        return f"TileGeometry({self.tile_width}, {self.tile_height}, {self.painters})"
+
+    @property
+    def name(self):
+        return f"{self.tile_width}x{self.tile_height}x{self.painters}"
+
+    @property
+    def current(self):
+        return (self.tile_width, self.tile_height, self.painters) == (TILE_WIDTH, TILE_HEIGHT, N_WAY_PARALLEL)
+
+    def band_pixels(self):
+        """(tile_rows, passes) on screen pixels of every band."""
+        lines = np.minimum(HEIGHT - np.arange(self.tile_rows) * self.tile_height, self.tile_height)
+        band = self.painters * self.tile_width
+        columns = np.minimum(WIDTH - np.arange(self.passes) * band, band)
+        return lines[:, None] * columns[None, :]
+
+    ######## cycles ########
+
+    def coverage(self, triangles):
+        """(hit, cells), both (tile_rows, passes, painters, T), like
+        frame_time.coverage for every band."""
+        min_x, max_x, min_y, max_y = bounding_boxes(triangles)
+        hit_y, h = spans(min_y, max_y, np.arange(self.tile_rows) * self.tile_height, self.tile_height)
+        hit_x, w = spans(min_x, max_x, np.arange(self.passes * self.painters) * self.tile_width, self.tile_width)
+        hit = hit_y[:, None, :] & hit_x[None, :, :]
+        cells = np.where(hit, h[:, None, :] * w[None, :, :], 0)
+        shape = (self.tile_rows, self.passes, self.painters, -1)
+        return hit.reshape(shape), cells.reshape(shape)
+
+    def work(self, triangles):
+        """(tile_rows, passes, painters) work cycles of every painter."""
+        triangles = triangle_bram(triangles)
+        hit, cells = self.coverage(triangles)
+        return READ_CYCLES * len(triangles) + (cells + WAIT_CYCLES * hit).sum(axis=3)
+
+    def states(self, triangles):
+        """{state: (tile_rows, passes) cycles}, frame_time's states per band."""
+        slowest = self.work(triangles).max(axis=2)
+        first = np.zeros(slowest.shape, dtype=bool)
+        first[0, 0] = True
+        last = np.zeros(slowest.shape, dtype=bool)
+        last[-1, -1] = True
+        return {
+            "PAINTING_TILES": slowest + np.where(first, 3, 2),
+            "WRITING_TO_DRAM": CYCLES_PER_PIXEL * self.band_pixels() - first,
+            "INTERMEDIATE_BEFORE_WIPE": np.full(slowest.shape, INTERMEDIATE_CYCLES),
+            "WIPING_TILES": np.full(slowest.shape, self.tile_words + 1),
+            "INTERMEDIATE_BEFORE_PAINTING": np.where(last, 0, INTERMEDIATE_CYCLES),
+        }
+
+    def frame_cycles(self, triangles):
+        """From the IDLE cycle that sees active to done going high."""
+        return 1 + int(sum(cycles.sum() for cycles in self.states(triangles).values())) + 1
+
+    ######## resources ########
+
+    def brams(self):
+        """{ram: (RAMB36, RAMB18)} for the whole renderer, and "tiles" in BRAM36 tiles."""
+        triangle = bram_primitives(MAX_TRIANGLES, TRIANGLE_WIDTH)
+        tile = bram_primitives(self.tile_words, PIXEL_WIDTH)
+        out = {"triangle": tuple(self.painters * n for n in triangle), "tile": tuple(self.painters * n for n in tile)}
+        out["tiles"] = sum(n36 + n18 / 2 for n36, n18 in out.values())
+        return out
+
+    def dsps(self):
+        return round(self.painters * DSPS_PER_PAINTER)
+
+    def fits(self):
+        """Whether the whole design would still fit the device."""
+        return (self.brams()["tiles"] + OTHER_BRAM_TILES <= DEVICE_BRAM_TILES
+                and self.dsps() + OTHER_DSPS <= DEVICE_DSPS)
+
+    ######## dram ########
+
+    def write_order(self):
+        """Screen pixel index (y * 1280 + x) of every pixel in the order the
+        renderer writes them."""
+        band = self.painters * self.tile_width
+        order = []
+        for row in range(self.tile_rows):
+            ys = np.arange(row * self.tile_height, min(HEIGHT, (row + 1) * self.tile_height))
+            for p in range(self.passes):
+                xs = np.arange(p * band, min(WIDTH, (p + 1) * band))
+                order.append((ys[:, None] * WIDTH + xs[None, :]).ravel())
+        return np.concatenate(order)
+
+    def dram_pattern(self):
+        """Dict of what the write stream looks like to the frame buffer."""
+        order = self.write_order()
+        breaks = np.flatnonzero(np.diff(order) != 1)
+        runs = np.diff(np.concatenate([[0], breaks + 1, [len(order)]]))
+        chunks = order[:len(order) // CHUNK_PIXELS * CHUNK_PIXELS].reshape(-1, CHUNK_PIXELS)
+        whole = (chunks[:, 0] % CHUNK_PIXELS == 0) & (np.diff(chunks, axis=1) == 1).all(axis=1)
+        return {
+            "raster": bool(np.array_equal(order, np.arange(WIDTH * HEIGHT))),
+            "runs": len(runs),
+            "shortest_run": int(runs.min()),
+            "split_chunks": int((~whole).sum()),
+            "row_activations": row_activations(chunks[:, 0] // CHUNK_PIXELS),
+        }
+
+    ######## files ########
+
+    def tile_init(self, tile_init=None):
+        """(tile_height, tile_width) initial tile contents: tile_bram.mem's
+        80x10 repeated / cut to size."""
+        tile_init = load_tile_init() if tile_init is None else tile_init
+        reps = (math.ceil(self.tile_height / tile_init.shape[0]), math.ceil(self.tile_width / tile_init.shape[1]))
+        return np.tile(tile_init, reps)[:self.tile_height, :self.tile_width]
+
+    def write_mem(self, directory, tile_init=None):
+        """tile_bram.mem for this geometry, what INIT_FILE of the tile BRAMs takes."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / "tile_bram.mem"
+        write_memh(path, self.tile_init(tile_init).ravel(), PIXEL_WIDTH)
+        return path
+
+    ######## software tile renderer ########
+
+    def paint(self, triangles, tile_init=None):
+        """(720, 1280) uint32 color|depth for a frame, painted band by band."""
+        fields = unpack_triangles(triangle_bram(triangles))
+        init = self.tile_init(tile_init)
+        band = self.painters * self.tile_width
+        rows = []
+        for row in range(self.tile_rows):
+            # only row 0 sees the init file, the rest start out wiped, like renderer.paint
+            passes = [paint_tile_row(fields, row, init if row == 0 else None, self.tile_width, self.tile_height,
+                                     self.painters, p * band)
+                      for p in range(self.passes)]
+            rows.append(np.concatenate(passes, axis=1)[:, :WIDTH])
+        return np.concatenate(rows, axis=0)[:HEIGHT]
+
+
+def row_activations(addresses):
+    """DDR rows opened by writing chunk addresses in order, one open row per
+    bank, address {row, bank, col}."""
+    addresses = np.asarray(addresses)
+    bank = (addresses >> COL_BITS) & ((1 << BANK_BITS) - 1)
+    row = addresses >> (COL_BITS + BANK_BITS)
+    order = np.argsort(bank, kind="stable")
+    bank, row = bank[order], row[order]
+    # the first access to a bank, or a different row than the last access to it
+    return int(((np.diff(bank, prepend=-1) != 0) | (np.diff(row, prepend=-1) != 0)).sum())
+
+
+def sweep(frames, widths=WIDTHS, heights=HEIGHTS, painters=PAINTERS, check=False):
+    """One dict per geometry over every combination, fastest first. Painters
+    that would start past the right edge of the screen are left out."""
+    reference = [TileGeometry().paint(f) for f in frames] if check else None
+    results = []
+    for w in widths:
+        for h in heights:
+            for n in painters:
+                if (n - 1) * w >= WIDTH:
+                    continue
+                geometry = TileGeometry(w, h, n)
+                cycles = np.array([geometry.frame_cycles(f) for f in frames])
+                result = {"geometry": geometry, "cycles": cycles, "brams": geometry.brams(),
+                          "dsps": geometry.dsps(), "dram": geometry.dram_pattern(), "fits": geometry.fits()}
+                if check:
+                    result["mismatches"] = sum(int((geometry.paint(f) != r).sum()) for f, r in zip(frames, reference))
+                results.append(result)
+    return sorted(results, key=lambda r: r["cycles"].mean())
+
+
+def report(results, clock_hz=CLOCK_HZ):
+    """Table of sweep() results, the current geometry marked with *."""
+    check = "mismatches" in results[0]
+    lines = ["  geometry     passes  mean cycles  max cycles    fps   RAMB36  RAMB18  tiles  DSP  fits"
+             "  raster    runs  shortest  DDR rows" + ("  mismatches" if check else "")]
+    for r in results:
+        g, brams, dram = r["geometry"], r["brams"], r["dram"]
+        n36 = brams["triangle"][0] + brams["tile"][0]
+        n18 = brams["triangle"][1] + brams["tile"][1]
+        line = (f"{'*' if g.current else ' '} {g.name:12s} {g.passes:6d} {r['cycles'].mean():12.0f} {r['cycles'].max():11d}"
+                f" {clock_hz / r['cycles'].mean():6.1f} {n36:8d} {n18:7d} {brams['tiles']:6.1f} {r['dsps']:4d}"
+                f"  {'yes' if r['fits'] else 'no':4s}  {'yes' if dram['raster'] else 'no':6s}"
+                f" {dram['runs']:7d} {dram['shortest_run']:9d} {dram['row_activations']:9d}")
+        if check:
+            line += f" {r['mismatches']:11d}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture", nargs="?", help="projector capture to take frames from, default recorded game frames")
+    parser.add_argument("--frames", type=int, default=8, help="game frames (scene.scenes) without a capture")
+    parser.add_argument("--width", type=int, nargs="+", default=WIDTHS, help="tile widths")
+    parser.add_argument("--height", type=int, nargs="+", default=HEIGHTS, help="tile heights")
+    parser.add_argument("--painters", type=int, nargs="+", default=PAINTERS, help="N_WAY_PARALLEL values")
+    parser.add_argument("--check", action="store_true", help="paint every frame with every geometry and count "
+                        "pixels that differ from 80x10x16")
+    parser.add_argument("--clock", type=float, default=CLOCK_HZ / 1e6, help="MHz")
+    parser.add_argument("--write", help="directory to write <geometry>/tile_bram.mem into")
+    args = parser.parse_args()
+
+    if args.capture:
+        from capture import open_capture
+        capture = open_capture(args.capture)
+        frames = [capture.frame(i) for i in capture.frame_indices()]
+    else:
+        from projector_cache import model_triangles
+        from scene import scenes
+        frames = [model_triangles(**frame) for frame in scenes(frames=args.frames)]
+
+    results = sweep(frames, args.width, args.height, args.painters, args.check)
+    print(f"{len(frames)} frames, {np.mean([len(f) for f in frames]):.1f} triangles on average")
+    print(report(results, args.clock * 1e6))
+    if args.write:
+        for r in results:
+            r["geometry"].write_mem(Path(args.write) / r["geometry"].name)
+        print(f"wrote {len(results)} tile_bram.mem files under {args.write}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Headless stand-in for the old py5 sketch of projector output.
+
+Draws a triangle list the way test_projected_triangles.py's sketch did: on
+white, filled, no stroke, in painter's order sorted by the last 16 bits of
+the triangle (ny | nz) from high to low. Coverage is a plain edge function
+test at integer pixel coords, either winding, clipped to the screen, so
+it's close to what Processing drew and not what the hardware draws. For
+that, render the same list with renderer.render_frame.
+
+Overlays, on top of the fill:
+  wireframe   every triangle's edges in black, including ones that got
+              covered up and degenerate ones that cover nothing
+  depth       the depth_calculator depth of whatever triangle won each
+              pixel, as grey (near is dark), blended half and half
+
+    rgb = view(triangles, wireframe=True)
+"""
+import numpy as np
+
+from codec import unpack_triangles
+from depth_calculator import pixel_depth
+from image import rgb565_to_rgb888
+
+WIDTH = 1280
+HEIGHT = 720
+BACKGROUND = 0xFFFF
+
+
+def painter_order(fields):
+    """Indices in drawing order: sorted(key=-(ny | nz)), stable like sorted()."""
+    key = ((fields["ny"] & 0xFF) << 8) | (fields["nz"] & 0xFF)
+    return np.argsort(-key, kind="stable")
+
+
+def _cover(x, y, xs, ys):
+    """Bool mask over the xs x ys grid of pixels inside triangle (x, y)."""
+    d = []
+    for i in range(3):
+        j = (i + 1) % 3
+        ex, ey = x[j] - x[i], y[j] - y[i]
+        d.append(ex * (ys[:, None] - y[i]) - ey * (xs[None, :] - x[i]))
+    lo = np.minimum(np.minimum(d[0], d[1]), d[2])
+    hi = np.maximum(np.maximum(d[0], d[1]), d[2])
+    return (lo >= 0) | (hi <= 0)
+
+
+def rasterize(fields, width=WIDTH, height=HEIGHT):
+    """(color, owner): (height, width) RGB565 and the index of the triangle
+    drawn last at every pixel (-1 for background)."""
+    color = np.full((height, width), BACKGROUND, dtype=np.uint16)
+    owner = np.full((height, width), -1, dtype=np.int64)
+    xs_all = np.stack([fields["p1x"], fields["p2x"], fields["p3x"]], axis=1)
+    ys_all = np.stack([fields["p1y"], fields["p2y"], fields["p3y"]], axis=1)
+    for i in painter_order(fields):
+        x, y = xs_all[i], ys_all[i]
+        area = (x[1] - x[0]) * (y[2] - y[0]) - (x[2] - x[0]) * (y[1] - y[0])
+        x0, x1 = max(int(x.min()), 0), min(int(x.max()) + 1, width)
+        y0, y1 = max(int(y.min()), 0), min(int(y.max()) + 1, height)
+        if area == 0 or x0 >= x1 or y0 >= y1:
+            continue
+        inside = _cover(x, y, np.arange(x0, x1), np.arange(y0, y1))
+        color[y0:y1, x0:x1][inside] = fields["color"][i]
+        owner[y0:y1, x0:x1][inside] = i
+    return color, owner
+
+
+def draw_wireframe(rgb, fields, ink=(0, 0, 0)):
+    """Draws every edge into rgb, in place."""
+    height, width, _ = rgb.shape
+    points = [(fields[f"p{k}x"], fields[f"p{k}y"]) for k in (1, 2, 3)]
+    for k in range(3):
+        (ax, ay), (bx, by) = points[k], points[(k + 1) % 3]
+        steps = np.maximum(np.abs(bx - ax), np.abs(by - ay)) + 1
+        # one sample per pixel along the longer axis of every edge
+        edge = np.repeat(np.arange(len(steps)), steps)
+        t = (np.arange(len(edge)) - np.repeat(np.cumsum(steps) - steps, steps)) / np.maximum(steps[edge] - 1, 1)
+        px = np.rint(ax[edge] + t * (bx - ax)[edge]).astype(np.int64)
+        py = np.rint(ay[edge] + t * (by - ay)[edge]).astype(np.int64)
+        keep = (px >= 0) & (px < width) & (py >= 0) & (py < height)
+        rgb[py[keep], px[keep]] = ink
+    return rgb
+
+
+def depth_overlay(rgb, fields, owner):
+    """Blends the winning triangle's depth at every pixel into rgb, in place."""
+    covered = owner >= 0
+    if not covered.any():
+        return rgb
+    ys, xs = np.nonzero(covered)
+    index = owner[ys, xs]
+    depth = pixel_depth({k: v[index] for k, v in fields.items()}, xs, ys).astype(np.float64)
+    lo, hi = depth.min(), depth.max()
+    grey = np.rint(255 * (depth - lo) / max(hi - lo, 1)).astype(np.uint16)
+    rgb[ys, xs] = ((rgb[ys, xs].astype(np.uint16) + grey[:, None]) // 2).astype(np.uint8)
+    return rgb
+
+
+def view(triangles, wireframe=False, depth=False, width=WIDTH, height=HEIGHT):
+    """(height, width, 3) uint8 picture of a triangle list."""
+    fields = unpack_triangles(triangles)
+    color, owner = rasterize(fields, width, height)
+    rgb = rgb565_to_rgb888(color)
+    if depth:
+        depth_overlay(rgb, fields, owner)
+    if wireframe:
+        draw_wireframe(rgb, fields)
+    return rgb
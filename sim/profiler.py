@@ -0,0 +1,276 @@
+"""Per state cycle counts of the renderer and tile_painter FSMs in cocotb.
+
+An FsmProfiler samples a few signals once per rising edge and keeps only
+the cycles they change on, so it can stay on for whole frames:
+
+    profiler = FsmProfiler(dut.clk, select(dut, PROFILED), enums=ENUMS).start()
+    ...
+    profiler.stop()
+    profiler.histograms()        # {signal: {state: cycles}}
+    profiler.painter_time()      # {painter: {"iterating": ..., "waiting_on_others": ...}}
+    profiler.write_trace("renderer_profile.json")
+
+ENUMS maps signal names (fnmatch on the last part) to the state names of
+their enum, read out of the typedefs in hdl/ so they can't go stale. The
+trace is Chrome trace event JSON (chrome://tracing, ui.perfetto.dev): a
+track per FSM with a slice per state, counters for the indices, and the
+histograms and painter breakdown under "profile".
+
+painter_time() splits every tile_painter's cycles by what it is doing:
+
+    reading             READING_NEW_TRIANGLE_1/2, DONE_READING_TRIANGLE,
+                        CALCULATING_BOUNDS
+    iterating           ITERATING over a triangle's box
+    pipeline_drain      WAITING the 30 cycles for depth_calculator
+    waiting_on_others   DONE or WIPEDONE while the renderer is still in
+                        PAINTING_TILES / WIPING_TILES, i.e. on a slower painter
+    wiping              WIPE
+    parked              everything else, mostly the renderer writing to DRAM
+
+    python sim/profiler.py sim_build/test_renderer_profile.json
+"""
+import argparse
+import fnmatch
+import json
+import re
+from pathlib import Path
+
+import numpy as np
+
+HDL_PATH = Path(__file__).resolve().parent.parent / "hdl"
+# unknown / X values in series()
+UNKNOWN = -1
+
+
+def hdl_enum(source, type_name):
+    """State names of `typedef enum {...} type_name;` in an hdl/ file, in
+    encoding order."""
+    text = re.sub(r"//[^\n]*", "", (HDL_PATH / source).read_text())
+    found = re.search(rf"typedef\s+enum\s*(?:\w+\s*)?(?:\[[^\]]*\]\s*)?\{{([^}}]*)\}}\s*{type_name}\s*;", text)
+    if found is None:
+        raise LookupError(f"no enum {type_name} in {source}")
+    return [name.split("=")[0].strip() for name in found.group(1).split(",") if name.strip()]
+
+
+RENDERER_STATES = hdl_enum("renderer.sv", "renderer_state")
+TILE_STATES = hdl_enum("tile_painter.sv", "tile_state_type")
+ENUMS = {"state": RENDERER_STATES, "tile_state": TILE_STATES}
+PROFILED = ["state", "tile_index", "genblk*.tile_painter_inst.tile_state", "genblk*.tile_painter_inst.triangle_index"]
+
+ACTIVITIES = {
+    "READING_NEW_TRIANGLE_1": "reading",
+    "READING_NEW_TRIANGLE_2": "reading",
+    "DONE_READING_TRIANGLE": "reading",
+    "CALCULATING_BOUNDS": "reading",
+    "ITERATING": "iterating",
+    "WAITING": "pipeline_drain",
+    "WIPE": "wiping",
+}
+ACTIVITY_NAMES = ["reading", "iterating", "pipeline_drain", "waiting_on_others", "wiping", "parked"]
+# renderer states in which a finished painter holds the others up
+WAITED_ON = ("PAINTING_TILES", "WIPING_TILES")
+
+
+def _painter(name):
+    # "genblk3[4].tile_painter_inst.tile_state" -> 4
+    found = re.search(r"\[(\d+)\]\.tile_painter_inst\.", name)
+    if found is None:
+        raise ValueError(f"{name} is not in a tile painter of the generate loop")
+    return int(found.group(1))
+
+
+class FsmProfiler:
+
+    def __init__(self, clk, signals, enums=ENUMS):
+        """signals: {name: handle}, from tracer.select(). enums: {pattern:
+        state names}, matched against the last part of each signal name."""
+        self.clk = clk
+        self.names = list(signals)
+        self.handles = [signals[name] for name in self.names]
+        self.enums = {}
+        for name in self.names:
+            leaf = name.rpartition(".")[2]
+            for pattern, states in enums.items():
+                if fnmatch.fnmatchcase(leaf, pattern):
+                    self.enums[name] = list(states)
+        # per signal: cycles it changed on and what it changed to
+        self.changes = [([], []) for _ in self.names]
+        self.cycles = 0
+        self.start_ns = None
+        self.period_ns = None
+        self._task = None
+
+    def start(self):
+        # cocotb only in here, so the CLI can read profiles without it
+        import cocotb
+        self._task = cocotb.start_soon(self._run())
+        return self
+
+    def stop(self):
+        if self._task is not None:
+            self._task.kill()
+            self._task = None
+
+    async def _run(self):
+        from cocotb.triggers import ReadOnly, RisingEdge
+        from cocotb.utils import get_sim_time
+
+        rising = RisingEdge(self.clk)
+        read_only = ReadOnly()
+        handles = self.handles
+        changes = self.changes
+        previous = [None] * len(handles)
+        while True:
+            await rising
+            if self.cycles < 2:
+                now = get_sim_time("ns")
+                if self.cycles == 0:
+                    self.start_ns = now
+                else:
+                    self.period_ns = now - self.start_ns
+            await read_only
+            cycle = self.cycles
+            self.cycles += 1
+            for i, h in enumerate(handles):
+                value = h.value.binstr
+                if value != previous[i]:
+                    previous[i] = value
+                    at, to = changes[i]
+                    at.append(cycle)
+                    to.append(int(value, 2) if set(value) <= {"0", "1"} else UNKNOWN)
+
+    ######## results ########
+
+    def series(self, name):
+        """(cycles,) value of a signal on every sampled cycle, UNKNOWN for X/Z."""
+        at, to = self.changes[self.names.index(name)]
+        lengths = np.diff(np.append(at, self.cycles))
+        return np.repeat(np.asarray(to, dtype=np.int64), lengths)
+
+    def segments(self, name):
+        """[(start cycle, cycles, value)] of a signal, one per run of a value."""
+        at, to = self.changes[self.names.index(name)]
+        ends = at[1:] + [self.cycles]
+        return [(start, end - start, value) for start, end, value in zip(at, ends, to)]
+
+    def _label(self, name, value):
+        states = self.enums.get(name)
+        if value == UNKNOWN:
+            return "x"
+        if states is None:
+            return str(value)
+        return states[value] if value < len(states) else f"?{value}"
+
+    def histogram(self, name):
+        """{state: cycles} of one signal, in encoding order."""
+        counts = {}
+        for _, cycles, value in sorted(self.segments(name), key=lambda s: s[2]):
+            label = self._label(name, value)
+            counts[label] = counts.get(label, 0) + cycles
+        return counts
+
+    def histograms(self):
+        """{signal: {state: cycles}} for every enum signal."""
+        return {name: self.histogram(name) for name in self.names if name in self.enums}
+
+    def painter_time(self, renderer="state"):
+        """{painter: {activity: cycles}} for every tile_state signal, see the
+        module docstring for the activities. `renderer` is the renderer
+        state signal, needed to tell waiting on other painters from parked."""
+        states = self.series(renderer) if renderer in self.names else None
+        waited_on = np.isin(states, [RENDERER_STATES.index(s) for s in WAITED_ON]) if states is not None else None
+        painters = {}
+        for name in self.names:
+            if not name.endswith("tile_state"):
+                continue
+            series = self.series(name)
+            labels = self.enums[name]
+            # state -> activity, with X (UNKNOWN) last
+            lookup = np.array([ACTIVITY_NAMES.index(ACTIVITIES.get(state, "parked")) for state in labels]
+                              + [ACTIVITY_NAMES.index("parked")])
+            activity = lookup[series]
+            if waited_on is not None:
+                finished = np.isin(series, [labels.index("DONE"), labels.index("WIPEDONE")])
+                activity[finished & waited_on] = ACTIVITY_NAMES.index("waiting_on_others")
+            counts = np.bincount(activity, minlength=len(ACTIVITY_NAMES))
+            painters[_painter(name)] = dict(zip(ACTIVITY_NAMES, counts.tolist()))
+        return painters
+
+    def summary(self):
+        lines = [f"{self.cycles} cycles profiled"]
+        for name, counts in self.histograms().items():
+            if name.endswith("tile_state"):
+                continue
+            lines.append(f"  {name}")
+            lines += [f"    {state:32s} {cycles:10d}  {cycles / max(self.cycles, 1):6.1%}" for state, cycles in counts.items()]
+        lines += _painter_table(self.painter_time())
+        return "\n".join(lines)
+
+    ######## trace ########
+
+    def trace_events(self):
+        """Chrome trace events: a slice per state of every enum signal, a
+        counter for every other signal, timestamps in us of sim time."""
+        start = self.start_ns or 0
+        period = self.period_ns or 1
+        events = []
+        for tid, name in enumerate(self.names):
+            events.append({"ph": "M", "name": "thread_name", "pid": 1, "tid": tid, "args": {"name": name}})
+            events.append({"ph": "M", "name": "thread_sort_index", "pid": 1, "tid": tid, "args": {"sort_index": tid}})
+            for cycle, cycles, value in self.segments(name):
+                ts = (start + cycle * period) / 1000
+                if name in self.enums:
+                    events.append({"ph": "X", "name": self._label(name, value), "pid": 1, "tid": tid,
+                                   "ts": ts, "dur": cycles * period / 1000, "args": {"cycle": cycle, "cycles": cycles}})
+                else:
+                    events.append({"ph": "C", "name": name, "pid": 1, "tid": tid, "ts": ts,
+                                   "args": {name.rpartition(".")[2]: value}})
+        return events
+
+    def write_trace(self, path):
+        trace = {
+            "traceEvents": self.trace_events(),
+            "displayTimeUnit": "ns",
+            "profile": {
+                "cycles": self.cycles,
+                "period_ns": self.period_ns,
+                "histograms": self.histograms(),
+                "painters": {str(k): v for k, v in self.painter_time().items()},
+            },
+        }
+        Path(path).write_text(json.dumps(trace))
+        return path
+
+
+def _painter_table(painters):
+    if not painters:
+        return []
+    activities = ACTIVITY_NAMES
+    lines = ["  painter " + " ".join(f"{a:>17s}" for a in activities)]
+    # ints from painter_time(), strings once read back from the JSON
+    for painter, counts in sorted(painters.items(), key=lambda kv: int(kv[0])):
+        lines.append(f"  {painter:>7} " + " ".join(f"{counts.get(a, 0):17d}" for a in activities))
+    total = {a: sum(c.get(a, 0) for c in painters.values()) for a in activities}
+    all_cycles = max(sum(total.values()), 1)
+    lines.append("  share   " + " ".join(f"{total[a] / all_cycles:17.1%}" for a in activities))
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("trace", help="profile written by FsmProfiler.write_trace")
+    args = parser.parse_args()
+
+    profile = json.loads(Path(args.trace).read_text())["profile"]
+    print(f"{profile['cycles']} cycles profiled, {profile['period_ns']} ns per cycle")
+    for name, counts in profile["histograms"].items():
+        if name.endswith("tile_state"):
+            continue
+        print(f"  {name}")
+        for state, cycles in counts.items():
+            print(f"    {state:32s} {cycles:10d}  {cycles / max(profile['cycles'], 1):6.1%}")
+    print("\n".join(_painter_table(profile["painters"])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Runs every cocotb testbench in sim/ at once and writes a JSON report.
+
+    python sim/regress.py                  # everything, one process per core
+    python sim/regress.py -k projector -j 2
+    SIM=icarus python sim/regress.py --report regression.json
+
+A testbench is any sim/test_*.py with a @cocotb.test in it (test_image.py
+and friends just look at captures), and its module level RUNNER is the
+function that builds and runs it. Each one runs in its own worker process
+with SIM_BUILD=sim_build/<testbench>, so captures and results of different
+testbenches never collide, and it gets its own build cache in there.
+sim_build/data links to data/ so the ../data paths in the HDL still work one
+level down.
+
+The report has pass/fail, simulated time and cycles (from cocotb's results
+xml and the testbench's CLK_PERIOD), wall time and cycles per second for
+every testbench. The exit code is 0 only if everything passed.
+"""
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+import traceback
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+SIM_PATH = Path(__file__).resolve().parent
+PROJ_PATH = SIM_PATH.parent
+
+
+def testbenches(pattern=None):
+    found = []
+    for path in sorted(SIM_PATH.glob("test_*.py")):
+        if "@cocotb.test" not in path.read_text():
+            continue
+        if pattern is not None and pattern not in path.stem:
+            continue
+        found.append(path)
+    return found
+
+
+def _runner_function(module):
+    runner = getattr(module, "RUNNER", None)
+    if not callable(runner):
+        raise LookupError(f"{module.__name__} has no RUNNER = <runner function>")
+    return runner
+
+
+def parse_results(path):
+    """(tests, failures, simulated ns) from a cocotb results xml."""
+    tests = failures = 0
+    sim_time_ns = 0.0
+    for case in ET.parse(path).getroot().iter("testcase"):
+        tests += 1
+        if case.find("failure") is not None or case.find("error") is not None:
+            failures += 1
+        sim_time_ns += float(case.get("sim_time_ns", 0))
+    return tests, failures, sim_time_ns
+
+
+def run_testbench(path, sim_build, sim=None):
+    """Runs one testbench, in a worker process. Returns its report entry."""
+    name = Path(path).stem
+    test_dir = Path(sim_build) / name
+    test_dir.mkdir(parents=True, exist_ok=True)
+    os.environ["SIM_BUILD"] = str(test_dir)
+    if sim is not None:
+        os.environ["SIM"] = sim
+    log = test_dir / "regress.log"
+    entry = {"name": name, "passed": False, "log": str(log)}
+
+    # everything the simulator prints goes to the log, not over the other
+    # workers; the worker's own stdout / stderr come back afterwards
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = os.dup(1), os.dup(2)
+    with open(log, "w") as f:
+        os.dup2(f.fileno(), 1)
+        os.dup2(f.fileno(), 2)
+    start = time.perf_counter()
+    try:
+        sys.path.insert(0, str(SIM_PATH))
+        module = importlib.import_module(name)
+        results = _runner_function(module)() or test_dir / "results.xml"
+        tests, failures, sim_time_ns = parse_results(results)
+        cycles = int(sim_time_ns // getattr(module, "CLK_PERIOD", 10))
+        entry.update(passed=tests > 0 and failures == 0, tests=tests, failures=failures,
+                     sim_time_ns=sim_time_ns, cycles=cycles)
+    except Exception:
+        entry["error"] = traceback.format_exc()
+        print(entry["error"], file=sys.stderr)
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        for fd, copy in zip((1, 2), saved):
+            os.dup2(copy, fd)
+            os.close(copy)
+    entry["wall_time"] = time.perf_counter() - start
+    if entry.get("cycles"):
+        entry["cycles_per_second"] = entry["cycles"] / entry["wall_time"]
+    return entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-k", dest="pattern", help="only testbenches with this in their name")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: one per testbench)")
+    parser.add_argument("--sim", default=None, help="simulator, overrides $SIM")
+    parser.add_argument("--sim-build", default="sim_build", help="where every testbench gets its directory")
+    parser.add_argument("--report", default=None, help="JSON report path (default: <sim-build>/regression.json)")
+    args = parser.parse_args()
+
+    benches = testbenches(args.pattern)
+    if not benches:
+        sys.exit("no testbenches found")
+    sim_build = Path(args.sim_build).resolve()
+    sim_build.mkdir(parents=True, exist_ok=True)
+    data = sim_build / "data"
+    if not data.exists():
+        data.symlink_to(PROJ_PATH / "data", target_is_directory=True)
+
+    start = time.perf_counter()
+    entries = []
+    jobs = args.jobs or min(len(benches), os.cpu_count() or 1)
+    with ProcessPoolExecutor(jobs) as pool:
+        futures = [pool.submit(run_testbench, path, sim_build, args.sim) for path in benches]
+        for future in as_completed(futures):
+            entry = future.result()
+            entries.append(entry)
+            status = "PASS" if entry["passed"] else "FAIL"
+            rate = f"{entry['cycles_per_second']:10.0f} cycles/s" if "cycles_per_second" in entry else ""
+            print(f"{status} {entry['name']:28s} {entry['wall_time']:8.1f} s {rate}")
+
+    entries.sort(key=lambda e: e["name"])
+    report = {
+        "sim": args.sim or os.getenv("SIM", "vivado"),
+        "wall_time": time.perf_counter() - start,
+        "passed": all(e["passed"] for e in entries),
+        "testbenches": entries,
+    }
+    report_path = Path(args.report) if args.report else sim_build / "regression.json"
+    report_path.write_text(json.dumps(report, indent=2))
+    print(f"{sum(e['passed'] for e in entries)}/{len(entries)} passed in {report['wall_time']:.1f} s, report in {report_path}")
+    sys.exit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Builds and runs a testbench on vivado (through vicoco), icarus or verilator.
+
+    def renderer_runner():
+        run(__file__, "renderer", ["renderer.sv", "tile_painter.sv", ...])
+
+The simulator comes from $SIM (vivado by default). Builds go to
+sim_build/builds/<toplevel>-<sim>-<key>, where key hashes the simulator, the
+source list and the contents of every source, the parameters and the build
+args. A build is only forced when that key changes, so running the same
+testbench twice elaborates once. An unchanged build still goes through the
+runner's build() with always=False, which leaves the work to the
+simulator's own up to date check. The test itself still runs in sim_build
+so relative paths like ../data/tile_bram.mem resolve the same as before.
+
+Only the public runner API is used: build(always=, build_dir=, ...) and
+test(build_dir=, test_dir=, ...), both there since cocotb 1.8 (MIN_COCOTB),
+which vicoco's runner builds on.
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+
+PROJ_PATH = Path(__file__).resolve().parent.parent
+HDL_PATH = PROJ_PATH / "hdl"
+
+SIMULATORS = ("vivado", "icarus", "verilator")
+# -Wall is fatal on verilator
+EXTRA_BUILD_ARGS = {"verilator": ["-Wno-fatal"]}
+MIN_COCOTB = (1, 8)
+
+
+def check_cocotb():
+    try:
+        found = version("cocotb")
+    except PackageNotFoundError:
+        raise ImportError("cocotb is not installed") from None
+    if tuple(int(n) for n in re.findall(r"\d+", found)[:2]) < MIN_COCOTB:
+        raise ImportError(f"runner.py needs cocotb {'.'.join(map(str, MIN_COCOTB))} or newer, not {found}")
+
+
+def get_runner(sim):
+    if sim not in SIMULATORS:
+        raise ValueError(f"SIM must be one of {', '.join(SIMULATORS)}, not {sim}")
+    check_cocotb()
+    if sim == "vivado":
+        from vicoco.vivado_runner import get_runner as vivado_runner
+        return vivado_runner(sim)
+    try:
+        from cocotb_tools.runner import get_runner as cocotb_runner
+    except ImportError:
+        from cocotb.runner import get_runner as cocotb_runner
+    return cocotb_runner(sim)
+
+
+def hdl_sources(sources):
+    """Paths for `sources` (relative ones are under hdl/), duplicates dropped."""
+    paths = []
+    for source in sources:
+        path = Path(source)
+        if not path.is_absolute():
+            path = HDL_PATH / path
+        if path not in paths:
+            paths.append(path)
+    return paths
+
+
+def build_key(sim, hdl_toplevel, sources, parameters, build_args, timescale, waves):
+    h = hashlib.sha256()
+    config = {
+        "sim": sim,
+        "hdl_toplevel": hdl_toplevel,
+        "sources": [str(s) for s in sources],
+        "parameters": {k: str(v) for k, v in sorted(parameters.items())},
+        "build_args": list(build_args),
+        "timescale": list(timescale),
+        "waves": waves,
+    }
+    h.update(json.dumps(config, sort_keys=True).encode())
+    for source in sources:
+        h.update(source.read_bytes())
+    return h.hexdigest()
+
+
+def run(test_file, hdl_toplevel, sources, parameters=None, build_args=("-Wall",), test_args=(),
+        sim=None, sim_build=None, timescale=("1ns", "1ps"), waves=None):
+    """Build `hdl_toplevel` from `sources` if needed and run the cocotb tests
+    in `test_file` (a testbench's __file__) against it. Returns the results
+    xml cocotb wrote.
+
+    sim_build defaults to $SIM_BUILD, or sim_build in the working directory.
+    waves defaults to on unless $WAVES is 0; with it off, use a
+    tracer.WaveTracer for just the signals and cycles that matter.
+    """
+    sim = sim or os.getenv("SIM", "vivado")
+    sim_build = sim_build or os.getenv("SIM_BUILD", "sim_build")
+    if waves is None:
+        waves = os.getenv("WAVES", "1") != "0"
+    sources = hdl_sources(sources)
+    parameters = dict(parameters or {})
+    build_args = list(build_args) + EXTRA_BUILD_ARGS.get(sim, [])
+    key = build_key(sim, hdl_toplevel, sources, parameters, build_args, timescale, waves)
+
+    sim_build = Path(sim_build)
+    build_dir = sim_build / "builds" / f"{hdl_toplevel}-{sim}-{key[:16]}"
+    stamp = build_dir / "build_key"
+
+    sys.path.append(str(PROJ_PATH / "sim"))
+    sys.path.append(str(PROJ_PATH / "sim" / "model"))
+    runner = get_runner(sim)
+    up_to_date = stamp.exists() and stamp.read_text() == key
+    if up_to_date:
+        print(f"{hdl_toplevel}: reusing {build_dir}")
+    runner.build(
+        sources=sources,
+        hdl_toplevel=hdl_toplevel,
+        # forced only when something changed, otherwise the simulator's up to date check decides
+        always=not up_to_date,
+        build_dir=build_dir,
+        build_args=build_args,
+        parameters=parameters,
+        timescale=timescale,
+        waves=waves,
+    )
+    if not up_to_date:
+        stamp.write_text(key)
+    return runner.test(
+        hdl_toplevel=hdl_toplevel,
+        test_module=Path(test_file).stem,
+        test_args=list(test_args),
+        parameters=parameters,
+        build_dir=build_dir,
+        test_dir=sim_build,
+        waves=waves,
+    )
@@ -8,10 +8,16 @@ from pathlib import Path
 from cocotb.clock import Clock
 from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
 from cocotb.utils import get_sim_time as gst
-# from cocotb.runner import get_runner
-from vicoco.vivado_runner import get_runner
 test_file = os.path.basename(__file__).replace(".py","")
 
+sys.path.append(str(Path(__file__).resolve().parent))
+from runner import run
+
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+from codec import convert_to_vertex
+from ddd_projector import project
+from stimulus import VertexStimulus
+
 CLK_PERIOD = 10
 PCLK_PERIOD = 20
 
@@ -42,12 +48,6 @@ async def test_a(dut):
     # (-640,-360,256), (-640,-350,256), (640, -350, 1000)
     # (640,-360,256), (640,-350,256), (-640, -350, 1000)
 
-    def convert_to_vertex(x, y, z):
-        return x * (2**32) + y * (2**16) + z
-
-    def convert_to_triangle(color, p1x, p1y, p2x, p2y, p3x, p3y, total_depth):
-        return color * (2**112) + p1x * (2**96) + p1y * (2**80) + p2x * (2**64) + p2y * (2**48) + p3x * (2**32) + p3y * (2**16) + total_depth
-
     await ClockCycles(dut.clk, 1)
     dut.vertex.value = convert_to_vertex(2**16-640, 2**16-360, 256)
     dut.color.value = 63
@@ -111,38 +111,101 @@ async def test_a(dut):
 
     await ClockCycles(dut.clk, 20)
 
+@cocotb.test()
+async def test_against_model(dut):
+    """back to back random triangles, checked against sim/model/ddd_projector.py"""
+    cocotb.start_soon(Clock(dut.clk, CLK_PERIOD, units="ns").start())
+    random.seed(0)
+
+    dut.rst.value = 1
+    dut.new_triangle_in.value = 0
+    dut.done_in.value = 0
+    await ClockCycles(dut.clk, 3)
+    dut.rst.value = 0
+
+    n = 200
+    vertices = [[(random.randint(-400, 400), random.randint(-300, 300), random.randint(8, 2000)) for _ in range(3)] for _ in range(n)]
+    colors = [random.randint(0, 2**16 - 1) for _ in range(n)]
+    expected = project(vertices, colors)
+
+    got = []
+    async def monitor():
+        while True:
+            await RisingEdge(dut.clk)
+            await ReadOnly()
+            if dut.new_triangle_out.value == 1:
+                got.append(int(dut.triangle.value))
+    cocotb.start_soon(monitor())
+
+    for triangle, color in zip(vertices, colors):
+        for k, (x, y, z) in enumerate(triangle):
+            await FallingEdge(dut.clk)
+            dut.vertex.value = convert_to_vertex(x, y, z)
+            dut.color.value = color
+            dut.new_triangle_in.value = 1 if k == 0 else 0
+
+    await FallingEdge(dut.clk)
+    dut.new_triangle_in.value = 0
+    await ClockCycles(dut.clk, 30)
+
+    assert len(got) == n
+    for i, (g, e) in enumerate(zip(got, expected)):
+        assert g == e, f"triangle {i}: {g:040x} != {e:040x}"
+
+@cocotb.test()
+async def test_coverage(dut):
+    """coverage directed triangles (sim/model/stimulus.py) until every bin is hit, checked against the model"""
+    cocotb.start_soon(Clock(dut.clk, CLK_PERIOD, units="ns").start())
+
+    dut.rst.value = 1
+    dut.new_triangle_in.value = 0
+    dut.done_in.value = 0
+    await ClockCycles(dut.clk, 3)
+    dut.rst.value = 0
+
+    stimulus = VertexStimulus(seed=0)
+    items = list(stimulus.until_covered(2000))
+    assert not stimulus.coverage.missing, stimulus.coverage.report()
+    dut._log.info(f"{len(items)} triangles for full coverage\n{stimulus.coverage.report()}")
+    expected = project([v for v, _ in items], [c for _, c in items])
+
+    got = []
+    async def monitor():
+        while True:
+            await RisingEdge(dut.clk)
+            await ReadOnly()
+            if dut.new_triangle_out.value == 1:
+                got.append(int(dut.triangle.value))
+    cocotb.start_soon(monitor())
+
+    for vertices, color in items:
+        for k, (x, y, z) in enumerate(vertices):
+            await FallingEdge(dut.clk)
+            dut.vertex.value = convert_to_vertex(int(x), int(y), int(z))
+            dut.color.value = color
+            dut.new_triangle_in.value = 1 if k == 0 else 0
+
+    await FallingEdge(dut.clk)
+    dut.new_triangle_in.value = 0
+    await ClockCycles(dut.clk, 30)
+
+    assert len(got) == len(items)
+    for i, (g, e) in enumerate(zip(got, expected)):
+        assert g == e, f"triangle {i} {items[i][0].tolist()}: {g:040x} != {e:040x}"
+
 
 def ddd_projector_runner():
     """3D Projector Tester."""
-    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
-    # sim = os.getenv("SIM", "icarus")
-    sim = os.getenv("SIM","vivado")
-    proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
-    sources = [proj_path / "hdl" / "ddd_projector.sv", proj_path / "hdl" / "pipeline.sv", proj_path / "hdl" / "divider3.sv", proj_path / "hdl" / "log2.sv"]
-    build_test_args = ["-Wall"]
-    #values for parameters defined earlier in the code.
-    # parameters = { 'KERNEL_DIMENSION': 3, 'K_SELECT': 2} # sharpen for now
- 
-    sys.path.append(str(proj_path / "sim"))
-    hdl_toplevel = "ddd_projector"
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel=hdl_toplevel,
-        always=True,
-        build_args=build_test_args,
-        # parameters = parameters,
-        timescale = ('1ns','1ps'),
-        waves=True
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel=hdl_toplevel,
-        test_module=test_file,
-        test_args=run_test_args,
-        waves=True
-    )
+    sources = [
+        "ddd_projector.sv",
+        "pipeline.sv",
+        "divider3.sv",
+        "log2.sv",
+    ]
+    return run(__file__, "ddd_projector", sources)
+
+# what regress.py runs
+RUNNER = ddd_projector_runner
 
 if __name__ == '__main__':
     ddd_projector_runner()
\ No newline at end of file
@@ -8,10 +8,15 @@ from pathlib import Path
 from cocotb.clock import Clock
 from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
 from cocotb.utils import get_sim_time as gst
-# from cocotb.runner import get_runner
-from vicoco.vivado_runner import get_runner
 test_file = os.path.basename(__file__).replace(".py","")
 
+sys.path.append(str(Path(__file__).resolve().parent))
+from runner import run
+
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+from codec import unpack_triangles
+from depth_calculator import depth_calculator
+
 CLK_PERIOD = 10
 PCLK_PERIOD = 20
 
@@ -75,38 +80,46 @@ async def test_a(dut):
 
     await ClockCycles(dut.clk, 20)
 
+LATENCY = 27
+
+@cocotb.test()
+async def test_against_model(dut):
+    """stream random (triangle, x, y) every cycle, check against sim/model/depth_calculator.py"""
+    cocotb.start_soon(Clock(dut.clk, CLK_PERIOD, units="ns").start())
+    random.seed(0)
+
+    n = 500
+    triangles = [random.randint(0, 2**160 - 1) for _ in range(n)]
+    xs = [random.randint(-640, 639) for _ in range(n)]
+    ys = [random.randint(-360, 359) for _ in range(n)]
+    expected = depth_calculator(unpack_triangles(triangles), xs, ys)
+
+    for i in range(n + LATENCY):
+        await FallingEdge(dut.clk)
+        if i < n:
+            dut.triangle.value = triangles[i]
+            dut.x_coord.value = xs[i] & 0x7FF
+            dut.y_coord.value = ys[i] & 0x3FF
+        await RisingEdge(dut.clk)
+        await ReadOnly()
+        # input sampled on edge k comes out after edge k + LATENCY - 1
+        k = i - (LATENCY - 1)
+        if 0 <= k < n:
+            assert int(dut.depth.value) == expected[k], f"{triangles[k]:040x} ({xs[k]}, {ys[k]})"
+
 
 def depth_calculator_runner():
     """3D Projector Tester."""
-    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
-    # sim = os.getenv("SIM", "icarus")
-    sim = os.getenv("SIM","vivado")
-    proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
-    sources = [proj_path / "hdl" / "depth_calculator.sv", proj_path / "hdl" / "pipeline.sv", proj_path / "hdl" / "divider3.sv", proj_path / "hdl" / "small_multiplier.sv"]
-    build_test_args = ["-Wall"]
-    #values for parameters defined earlier in the code.
-    # parameters = { 'KERNEL_DIMENSION': 3, 'K_SELECT': 2} # sharpen for now
- 
-    sys.path.append(str(proj_path / "sim"))
-    hdl_toplevel = "depth_calculator"
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel=hdl_toplevel,
-        always=True,
-        build_args=build_test_args,
-        # parameters = parameters,
-        timescale = ('1ns','1ps'),
-        waves=True
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel=hdl_toplevel,
-        test_module=test_file,
-        test_args=run_test_args,
-        waves=True
-    )
+    sources = [
+        "depth_calculator.sv",
+        "pipeline.sv",
+        "divider3.sv",
+        "small_multiplier.sv",
+    ]
+    return run(__file__, "depth_calculator", sources)
+
+# what regress.py runs
+RUNNER = depth_calculator_runner
 
 if __name__ == '__main__':
     depth_calculator_runner()
\ No newline at end of file
@@ -8,20 +8,24 @@ from pathlib import Path
 from cocotb.clock import Clock
 from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
 from cocotb.utils import get_sim_time as gst
-# from cocotb.runner import get_runner
-from vicoco.vivado_runner import get_runner
 test_file = os.path.basename(__file__).replace(".py","")
 
-CLK_PERIOD = 10
-PCLK_PERIOD = 20
+sys.path.append(str(Path(__file__).resolve().parent))
+from runner import run
 
-def convert_to_triangle(color, p1x, p1y, p2x, p2y, p3x, p3y, total_depth):
-    return color * (2**112) + p1x * (2**96) + p1y * (2**80) + p2x * (2**64) + p2y * (2**48) + p3x * (2**32) + p3y * (2**16) + total_depth
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+from bus_monitor import BusMonitor
+from capture import CaptureWriter
+from codec import TRIANGLE_DTYPE, convert_to_obstacle, decode_triangles, obstacles_to_words
+from projector_cache import PROJECTOR_FRAME, PROJECTOR_SOURCES, ProjectorCache, frame_key
+from stimulus import MAX_TRIANGLES, ObstacleStimulus, obstacle_triangles, triangle_count
 
-def convert_to_obstacle(type, lane, depth):
-    return lane * (2**11) + type * (2**13) + depth
+CLK_PERIOD = 10
+PCLK_PERIOD = 20
 
-OBSTACLES = [ (4, 0, 128), (4, 1, 256), (4,1,128), (1, 2, 256) ]
+OBSTACLES = PROJECTOR_FRAME["obstacles"]
+PLAYER_HEIGHT = PROJECTOR_FRAME["player_height"]
+PLAYER_LANE = PROJECTOR_FRAME["player_lane"]
 
 @cocotb.test()
 async def test_a(dut):
@@ -35,8 +39,9 @@ async def test_a(dut):
     dut.obstacle_valid.value = 0
     dut.done_in.value = 0
     dut.obstacle.value = 0
-    dut.player_height.value = 2**16-128
-    dut.player_lane.value = 0
+    dut.player_height.value = PLAYER_HEIGHT & 0xFFFF
+    dut.player_lane.value = PLAYER_LANE
+    dut.ducking.value = int(PROJECTOR_FRAME["ducking"])
 
     await ClockCycles(dut.clk, 3)
 
@@ -44,81 +49,97 @@ async def test_a(dut):
 
     await ClockCycles(dut.clk, 3)
 
+    monitor = BusMonitor(dut.clk, dut, ["triangle"], when="triangle_valid").start()
+
     for obstacle in OBSTACLES:
-            
+        await FallingEdge(dut.clk)
+
         dut.obstacle_valid.value = 1
         dut.obstacle.value = convert_to_obstacle(*obstacle)
         # dut.obstacle.value = obstacle
 
-        await read_clock_cycle(dut)
+        await FallingEdge(dut.clk)
 
         dut.obstacle_valid.value = 0
 
-        for _ in range(30):
-            await read_clock_cycle(dut)
+        await ClockCycles(dut.clk, 30)
 
     dut.done_in.value = 1
 
-    for _ in range(200):
-        await read_clock_cycle(dut)
-
-    with open("test_projector_list.txt", "w") as file:
-        file.write(str(triangles))
-
-def p_int(str):
-    if str == 'X':
-        return 0
-    else:
-        try:
-            return int(str)
-        except:
-            return 0
-
-triangles = []
-
-async def read_clock_cycle(dut):
+    await ClockCycles(dut.clk, 200)
+    monitor.stop()
 
-    await FallingEdge(dut.clk)
+    # the triangle column is already little endian wire bytes
+    triangles = decode_triangles(monitor.data()["triangle"].tobytes())
+    with CaptureWriter("test_projector.cap", TRIANGLE_DTYPE) as capture:
+        capture.write_many(triangles, index=0)
+    # so renderer tests can replay this frame instead of simulating the projector
+    path = ProjectorCache().put(frame_key(**PROJECTOR_FRAME), triangles)
+    dut._log.info(f"{len(triangles)} triangles cached in {path}")
 
-    if p_int(dut.triangle_valid.value) == 1:
-        triangle = p_int(dut.triangle.value)
-        triangles.append(triangle)
 
-    await RisingEdge(dut.clk)
+@cocotb.test()
+async def test_coverage(dut):
+    """coverage directed obstacle frames (sim/model/stimulus.py), checking how many triangles come out of each"""
+    cocotb.start_soon(Clock(dut.clk, CLK_PERIOD, units="ns").start())
 
+    dut.rst.value = 1
+    dut.obstacle_valid.value = 0
+    dut.done_in.value = 0
+    dut.obstacle.value = 0
+    dut.ducking.value = 0
+    await ClockCycles(dut.clk, 3)
+    dut.rst.value = 0
+    await ClockCycles(dut.clk, 3)
 
+    triangles = 0
+    async def monitor():
+        nonlocal triangles
+        while True:
+            await RisingEdge(dut.clk)
+            await ReadOnly()
+            if dut.triangle_valid.value == 1:
+                triangles += 1
+    cocotb.start_soon(monitor())
+
+    stimulus = ObstacleStimulus(seed=0)
+    for frame in stimulus.until_covered(300):
+        obstacles = frame["obstacles"]
+        await FallingEdge(dut.clk)
+        dut.player_height.value = frame["player_height"] & 0xFFFF
+        dut.player_lane.value = frame["player_lane"]
+        dut.ducking.value = frame["ducking"]
+        triangles = 0
+
+        for word, n in zip(obstacles_to_words(obstacles), obstacle_triangles(obstacles)):
+            await FallingEdge(dut.clk)
+            dut.obstacle_valid.value = 1
+            dut.obstacle.value = int(word)
+            await FallingEdge(dut.clk)
+            dut.obstacle_valid.value = 0
+            # 3 cycles a triangle until triangle_creator is back in IDLE
+            await ClockCycles(dut.clk, 3 * int(n))
+
+        dut.done_in.value = 1
+        await RisingEdge(dut.done_out)
+        await FallingEdge(dut.clk)
+        dut.done_in.value = 0
+
+        expected = triangle_count(obstacles)
+        assert triangles == expected, f"{triangles} triangles for {obstacles.tolist()}, expected {expected}"
+        if expected >= MAX_TRIANGLES:
+            dut._log.info(f"{expected} triangles in one frame, num_triangles in the renderer wraps to {expected % MAX_TRIANGLES}")
+
+    assert not stimulus.coverage.missing, stimulus.coverage.report()
+    dut._log.info(f"{stimulus.items} frames, about {stimulus.cycles} cycles for full coverage\n{stimulus.coverage.report()}")
 
 def projector_runner():
     """Full Projector Tester."""
-    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
-    # sim = os.getenv("SIM", "icarus")
-    sim = os.getenv("SIM","vivado")
-    proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
-    sources = [proj_path / "hdl" / "full_projector.sv", proj_path / "hdl" / "triangle_creator.sv", proj_path / "hdl" / "ddd_projector.sv", proj_path / "hdl" / "pipeline.sv", proj_path / "hdl" / "divider3.sv", proj_path / "hdl" / "log2.sv", proj_path / "hdl" / "sprite_creator.sv"]
-    build_test_args = ["-Wall"]
-    #values for parameters defined earlier in the code.
-    # parameters = { 'KERNEL_DIMENSION': 3, 'K_SELECT': 2} # sharpen for now
- 
-    sys.path.append(str(proj_path / "sim"))
-    hdl_toplevel = "full_projector"
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel=hdl_toplevel,
-        always=True,
-        build_args=build_test_args,
-        # parameters = parameters,
-        timescale = ('1ns','1ps'),
-        waves=True
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel=hdl_toplevel,
-        test_module=test_file,
-        test_args=run_test_args,
-        waves=True
-    )
+    sources = PROJECTOR_SOURCES
+    return run(__file__, "full_projector", sources)
+
+# what regress.py runs
+RUNNER = projector_runner
 
 if __name__ == '__main__':
     projector_runner()
\ No newline at end of file
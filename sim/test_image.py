@@ -1,31 +1,11 @@
-import png
+import sys
+from pathlib import Path
 
-with open("sim_build/test_image_list.txt", "r") as file:
-    img = eval(file.read())
-    
-def rgb(num):
-    num //= 2**16
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+from capture import open_capture
+from image import write_png
 
-    b = (num % 32) * 8
-    num //= 32
-    g = (num % 64) * 4
-    num //= 64
-    r = num * 8
-    return (r,g,b)
+# frame 0 is the tile right after painting, 10x80 color|depth words
+tile = open_capture(sys.argv[1] if len(sys.argv) > 1 else "sim_build/test_image.cap").frame(0)[0]
 
-print(rgb(65280))
-
-def create_png(tile):
-    width = 80
-    height = 10
-    img = []
-    for y in range(height):
-        row = ()
-        for x in range(width):
-            row = row + rgb( tile[y * 80 + x] )
-        img.append(row)
-    with open('result.png', 'wb') as f:
-        w = png.Writer(width, height, greyscale=False)
-        w.write(f, img)
-
-create_png(img)
\ No newline at end of file
+write_png("result.png", tile)
@@ -8,10 +8,16 @@ from pathlib import Path
 from cocotb.clock import Clock
 from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
 from cocotb.utils import get_sim_time as gst
-# from cocotb.runner import get_runner
-from vicoco.vivado_runner import get_runner
 test_file = os.path.basename(__file__).replace(".py","")
 
+sys.path.append(str(Path(__file__).resolve().parent))
+from runner import run
+
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+from codec import convert_to_triangle, pack_triangles, unpack_triangles
+from pixel_calculator import pixel_inside
+from stimulus import PixelStimulus
+
 CLK_PERIOD = 10
 PCLK_PERIOD = 20
 
@@ -41,9 +47,6 @@ async def test_a(dut):
     # output logic [31:0] pixel_data_out, // top 16 bits color, bottom 16 bits depth
     # output logic pixel_out_valid
 
-    def convert_to_triangle(color, p1x, p1y, p2x, p2y, p3x, p3y, total_depth):
-        return (color * (2**112) + p1x * (2**96) + p1y * (2**80) + p2x * (2**64) + p2y * (2**48) + p3x * (2**32) + p3y * (2**16)) * 2**32
-
     # await ClockCycles(dut.clk, 1)
     # dut.xcoord_in.value = 300
     # dut.ycoord_in.value = 200
@@ -113,37 +116,77 @@ async def test_a(dut):
 
     await ClockCycles(dut.clk, 3)
 
+@cocotb.test()
+async def test_against_model(dut):
+    """random triangles and pixels, checked against sim/model/pixel_calculator.py"""
+    cocotb.start_soon(Clock(dut.clk, CLK_PERIOD, units="ns").start())
+    random.seed(0)
+
+    dut.rst.value = 1
+    dut.pixel_in_valid.value = 0
+    await ClockCycles(dut.clk, 3)
+    dut.rst.value = 0
+
+    for _ in range(20):
+        # mostly on screen, sometimes negative / off screen coords
+        coords = [random.randint(-300, 1500) & 0xFFFF for _ in range(6)]
+        triangle = random.randint(0, 2**16 - 1)
+        for c in coords:
+            triangle = triangle * 2**16 + c
+        triangle = triangle * 2**48
+
+        xs = [random.randint(0, 1279) for _ in range(200)]
+        ys = [random.randint(0, 719) for _ in range(200)]
+        expected = pixel_inside(unpack_triangles([triangle]), xs, ys)
+
+        await FallingEdge(dut.clk)
+        dut.triangle.value = triangle
+        for x, y, inside in zip(xs, ys, expected):
+            dut.xcoord_in.value = x
+            dut.ycoord_in.value = y
+            # cross products are registered, pixel_inside shows up the next cycle
+            await RisingEdge(dut.clk)
+            await ReadOnly()
+            assert int(dut.pixel_inside.value) == int(inside), f"{triangle:040x} ({x}, {y})"
+            await FallingEdge(dut.clk)
+
+@cocotb.test()
+async def test_coverage(dut):
+    """coverage directed triangles and probe pixels (sim/model/stimulus.py), checked against the model"""
+    cocotb.start_soon(Clock(dut.clk, CLK_PERIOD, units="ns").start())
+
+    dut.rst.value = 1
+    dut.pixel_in_valid.value = 0
+    await ClockCycles(dut.clk, 3)
+    dut.rst.value = 0
+
+    stimulus = PixelStimulus(seed=0)
+    for item in stimulus.until_covered(1000):
+        triangle = pack_triangles(item["fields"])[0]
+        expected = pixel_inside(item["fields"], item["x"], item["y"])
+
+        await FallingEdge(dut.clk)
+        dut.triangle.value = triangle
+        for x, y, inside in zip(item["x"], item["y"], expected):
+            dut.xcoord_in.value = int(x)
+            dut.ycoord_in.value = int(y)
+            await RisingEdge(dut.clk)
+            await ReadOnly()
+            assert int(dut.pixel_inside.value) == int(inside), f"{triangle:040x} ({x}, {y})"
+            await FallingEdge(dut.clk)
+
+    assert not stimulus.coverage.missing, stimulus.coverage.report()
+    dut._log.info(f"{stimulus.items} triangles, {stimulus.cycles} cycles for full coverage\n{stimulus.coverage.report()}")
+
 def pixel_calculator_runner():
     """Tile Painter Tester."""
-    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
-    # sim = os.getenv("SIM", "icarus")
-    sim = os.getenv("SIM","vivado")
-    proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
-    sources = [proj_path / "hdl" / "pixel_calculator.sv"]
-    build_test_args = ["-Wall"]
-    #values for parameters defined earlier in the code.
-    # parameters = { 'KERNEL_DIMENSION': 3, 'K_SELECT': 2} # sharpen for now
- 
-    sys.path.append(str(proj_path / "sim"))
-    hdl_toplevel = "pixel_calculator"
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel=hdl_toplevel,
-        always=True,
-        build_args=build_test_args,
-        # parameters = parameters,
-        timescale = ('1ns','1ps'),
-        waves=True
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel=hdl_toplevel,
-        test_module=test_file,
-        test_args=run_test_args,
-        waves=True
-    )
+    sources = [
+        "pixel_calculator.sv",
+    ]
+    return run(__file__, "pixel_calculator", sources)
+
+# what regress.py runs
+RUNNER = pixel_calculator_runner
 
 if __name__ == '__main__':
     pixel_calculator_runner()
\ No newline at end of file
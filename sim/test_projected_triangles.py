@@ -1,64 +1,54 @@
-import py5
-
-with open("sim_build/test_projector_list.txt", "r") as file:
-    triangles = eval(file.read())
-    
-
-def rgb(num):
-    
-    b = (num % 32) * 8
-    num //= 32
-    g = (num % 64) * 4
-    num //= 64
-    r = num * 8
-    return (r,g,b)
-
-def twos_comp_16_bit(num):
-    if num < 2 ** 15:
-        return num
-    else:
-        return num - 2 ** 16
-
-def to_triangle(num):
-    depth = num % (2 ** 16)
-    num //= 2 ** 48
-
-    p3y = twos_comp_16_bit(num % (2 ** 16))
-    num //= 2 ** 16
-    p3x = twos_comp_16_bit(num % (2 ** 16))
-    num //= 2 ** 16
-    p2y = twos_comp_16_bit(num % (2 ** 16))
-    num //= 2 ** 16
-    p2x = twos_comp_16_bit(num % (2 ** 16))
-    num //= 2 ** 16
-    p1y = twos_comp_16_bit(num % (2 ** 16))
-    num //= 2 ** 16
-    p1x = twos_comp_16_bit(num % (2 ** 16))
-    num //= 2 ** 16
-
-    color = rgb(num % (2 ** 16))
-
-    return ((p1x, p1y), (p2x, p2y), (p3x, p3y), color, depth)
-
-
-scale = 1
-def setup():
-    py5.size(1280 * scale, 720 * scale)
-    py5.background(255)
-
-    triangles_dupe = [to_triangle(triangle) for triangle in triangles]
-    triangles_dupe = sorted(triangles_dupe, key=lambda x : -x[4])
-
-    for triangle in triangles_dupe:
-        (p1, p2, p3, color, _) = triangle
-        py5.fill(*color)
-        py5.no_stroke()
-
-        print(p1, p2, p3, color)
-        py5.triangle(p1[0] * scale, p1[1] * scale, p2[0] * scale, p2[1] * scale, p3[0] * scale, p3[1] * scale)
-
-def draw():
-    pass
-
-py5.run_sketch()
-
+"""Pictures of projector captures, no display needed.
+
+    python sim/test_projected_triangles.py                        # frame 0 -> projected.png
+    python sim/test_projected_triangles.py sim_build/test_projector.cap -f 3 --wireframe --depth
+    python sim/test_projected_triangles.py capture.cap --all -o "frames/{index}.png" --compare
+
+--all draws every frame in the capture, --compare puts what the hardware
+accurate renderer makes of the same triangles next to each picture.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+import numpy as np
+from capture import open_capture
+from image import FrameWriter, rgb565_to_rgb888
+from renderer import render_frame
+from viewer import view
+
+
+def picture(triangles, args):
+    rgb = view(triangles, wireframe=args.wireframe, depth=args.depth)
+    if args.compare:
+        rgb = np.concatenate([rgb, rgb565_to_rgb888(render_frame(triangles))], axis=1)
+    return rgb
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture", nargs="?", default="sim_build/test_projector.cap")
+    parser.add_argument("-o", "--output", default=None,
+                        help="png, apng or y4m (default projected.png, or projected_{index}.png with --all)")
+    parser.add_argument("-f", "--frame", type=int, default=0)
+    parser.add_argument("--all", action="store_true", help="every frame in the capture")
+    parser.add_argument("--wireframe", action="store_true")
+    parser.add_argument("--depth", action="store_true", help="blend in depth_calculator depths")
+    parser.add_argument("--compare", action="store_true", help="renderer.render_frame output on the right")
+    args = parser.parse_args()
+
+    capture = open_capture(args.capture)
+    frames = capture.frame_indices() if args.all else [args.frame]
+    output = args.output or ("projected_{index}.png" if args.all else "projected.png")
+
+    start = time.perf_counter()
+    with FrameWriter(output) as writer:
+        for index in frames:
+            writer.write(picture(capture.frame(index), args))
+    print(f"{writer.frames} frames to {output} in {time.perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
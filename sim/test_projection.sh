@@ -1,2 +0,0 @@
-lab-bc simulate . sim/test_full_projector.py
-python sim/test_projected_triangles.py
\ No newline at end of file
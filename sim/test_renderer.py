@@ -8,19 +8,60 @@ from pathlib import Path
 from cocotb.clock import Clock
 from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
 from cocotb.utils import get_sim_time as gst
-# from cocotb.runner import get_runner
-from vicoco.vivado_runner import get_runner
 test_file = os.path.basename(__file__).replace(".py","")
 
+sys.path.append(str(Path(__file__).resolve().parent))
+from runner import run
+from profiler import PROFILED, FsmProfiler
+from tracer import WaveTracer, select
+from triangle_driver import load_triangles
+
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+import numpy as np
+from bus_monitor import BusMonitor
+from capture import CaptureWriter
+from codec import convert_to_triangle
+from frame_time import frame_time
+from projector_cache import PROJECTOR_FRAME, projected
+from renderer import N_WAY_PARALLEL, render_frame
+
 CLK_PERIOD = 10
 PCLK_PERIOD = 20
+# renderer_state
+WRITING_TO_DRAM = 3
+
+# what the flight recorder keeps
+TRACED = ["state", "tile_index", "valid", "h_count", "v_count", "data",
+          "genblk*.tile_painter_inst.tile_state", "genblk*.tile_painter_inst.triangle_index"]
 
-def convert_to_triangle(color, p1x, p1y, p2x, p2y, p3x, p3y, total_depth):
-    return 2**32 * (color * (2**112) + p1x * (2**96) + p1y * (2**80) + p2x * (2**64) + p2y * (2**48) + p3x * (2**32) + p3y * (2**16)) + total_depth
+TRIANGLES = [
+    convert_to_triangle(0xf000, 0, 0, 0, 10, 1280, 10, 0xff0b003a009c),
+    convert_to_triangle(0xf000, 1280, 0, 1280, 10, 0, 10, 0x00f5003a0064),
+]
 
 @cocotb.test()
 async def test_a(dut):
     """cocotb test"""
+    await render_and_check(dut, TRIANGLES, "test_renderer")
+
+@cocotb.test()
+async def test_projected(dut):
+    """full_projector's triangles for a frame, replayed from the projector cache"""
+    triangles, source = projected(**PROJECTOR_FRAME)
+    if source == "model":
+        dut._log.warning("frame not in the projector cache, run test_full_projector first; "
+                         "rendering the projector model's triangles instead")
+    dut._log.info(f"{len(triangles)} triangles from the {source}")
+    await render_and_check(dut, triangles, "test_renderer_projected")
+
+async def render_and_check(dut, triangles, name):
+    """Loads triangles, renders for 10000 cycles and checks row 0's timing
+    and whatever pixels came out against the models."""
+    global frame_buffer, written, frame_number
+    frame_buffer = np.zeros((720, 1280), dtype=np.uint16)
+    written = np.zeros((720, 1280), dtype=bool)
+    frame_number = 0
+
     dut._log.info("Starting...")
     cocotb.start_soon(Clock(dut.clk, CLK_PERIOD, units="ns").start())
 
@@ -35,88 +76,101 @@ async def test_a(dut):
 
     dut.rst.value = 0
 
-    await ClockCycles(dut.clk, 1)
-
-    dut.triangle_valid.value = 1
-    dut.triangle.value = convert_to_triangle(0xf000, 0, 0, 0, 10, 1280, 10, 0xff0b003a009c)
-
-    await ClockCycles(dut.clk, 1)
-
-    dut.triangle_valid.value = 1
-    dut.triangle.value = convert_to_triangle(0xf000, 1280, 0, 1280, 10, 0, 10, 0x00f5003a0064)
-
-    await ClockCycles(dut.clk, 3)
+    await load_triangles(dut, triangles)
+    await ClockCycles(dut.clk, 2)
 
     dut.active.value = 1
-
-    for _ in range(10000):
-        await read_clock_cycle(dut)
-
-    with open("test_renderer_list.txt", "w") as file:
-        file.write(str(frame_buffer))
-
-def p_int(str):
-    if str == 'X':
-        return 0
-    else:
-        try:
-            return int(str)
-        except:
-            return 0
-
-frame_buffer = [ [0] * 1280 for _ in range(180) ]
-
-async def read_clock_cycle(dut):
-
-    await FallingEdge(dut.clk)
-
-    if p_int(dut.valid.value) == 1:
-        h = p_int(dut.h_count.value)
-        v = p_int(dut.v_count.value)
-        data = p_int(dut.data.value)
-
-        try:
-            frame_buffer[v][h] = data
-
-        except:
-            print(h,v)
-            raise Exception("lolz")
-
-    await RisingEdge(dut.clk)
+    painting = cocotb.start_soon(cycles_until_state(dut, WRITING_TO_DRAM))
+    # last 2000 cycles of the FSMs, written out only if a check below fails
+    traced = select(dut, TRACED)
+    # one tile_state per painter, or the patterns missed the generate loop
+    assert sum(signal.endswith(".tile_state") for signal in traced) == N_WAY_PARALLEL, sorted(traced)
+    recorder = WaveTracer(dut.clk, traced, ring=2000, path=f"{name}_fail.vcd").start()
+    profiler = FsmProfiler(dut.clk, select(dut, PROFILED)).start()
+
+    global capture
+    # full frames get written as soon as `last` comes out, the partial one at the end
+    with CaptureWriter(f"{name}.cap", np.uint16, (720, 1280)) as capture:
+        monitor = BusMonitor(dut.clk, dut, ["h_count", "v_count", "data", "last"], when="valid", sink=store_pixels).start()
+        await ClockCycles(dut.clk, 10000)
+        monitor.stop()
+        profiler.stop()
+
+        capture.write(frame_buffer, index=frame_number)
+
+    dut._log.info(f"{monitor.samples} pixels over {monitor.cycles} cycles")
+    dut._log.info(profiler.summary())
+    profiler.write_trace(f"{name}_profile.json")
+    timing = frame_time(triangles)
+    with recorder.on_failure():
+        # IDLE cycle + the first row's PAINTING_TILES, as the cycle model has it
+        expected_cycles = 1 + int(timing.states["PAINTING_TILES"][0])
+        cycles = await painting
+        assert cycles == expected_cycles, f"row 0 painted in {cycles} cycles, model says {expected_cycles}"
+        # only row 0 gets painted in here, every painter's busy cycles are its work on it
+        work = timing.work[0]
+        for painter, time in profiler.painter_time().items():
+            busy = time["reading"] + time["iterating"] + time["pipeline_drain"]
+            assert busy == work[painter], f"painter {painter} busy for {busy} cycles, model says {work[painter]}"
+        # whatever made it out so far has to match the reference renderer
+        expected = render_frame(triangles, processes=1)
+        wrong = np.argwhere(written & (frame_buffer != expected))
+        if len(wrong):
+            v, h = wrong[0]
+            assert False, f"pixel ({h}, {v}): {frame_buffer[v, h]:04x} != {expected[v, h]:04x}"
+    recorder.stop()
+
+async def cycles_until_state(dut, state):
+    """Rising edges until the renderer FSM is in `state`."""
+    cycles = 0
+    while True:
+        await RisingEdge(dut.clk)
+        await ReadOnly()
+        cycles += 1
+        if dut.state.value.is_resolvable and int(dut.state.value) == state:
+            return cycles
+
+frame_buffer = np.zeros((720, 1280), dtype=np.uint16)
+written = np.zeros((720, 1280), dtype=bool)
+frame_number = 0
+capture = None
+
+def store_pixels(pixels):
+    """BusMonitor sink, scatters a chunk of pixels into the frame buffer and
+    writes out every frame that `last` closes."""
+    global frame_number
+
+    start = 0
+    for end in np.flatnonzero(pixels["last"]) + 1:
+        part = pixels[start:end]
+        frame_buffer[part["v_count"], part["h_count"]] = part["data"]
+        written[part["v_count"], part["h_count"]] = True
+        capture.write(frame_buffer, index=frame_number)
+        frame_number += 1
+        start = end
+
+    part = pixels[start:]
+    frame_buffer[part["v_count"], part["h_count"]] = part["data"]
+    written[part["v_count"], part["h_count"]] = True
 
 
 
 def renderer_runner():
     """Renderer Tester."""
-    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
-    # sim = os.getenv("SIM", "icarus")
-    sim = os.getenv("SIM","vivado")
-    proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
-    sources = [proj_path / "hdl" / "renderer.sv", proj_path / "hdl" / "pixel_calculator.sv", proj_path / "hdl" / "tile_painter.sv", proj_path / "hdl" / "pipeline.sv", proj_path / "hdl" / "renderer.sv",  proj_path / "hdl" / "depth_calculator.sv", proj_path / "hdl" / "pipeline.sv", proj_path / "hdl" / "divider3.sv", proj_path / "hdl" / "small_multiplier.sv", proj_path / "hdl" / "xilinx_true_dual_port_read_first_2_clock_ram.v"]
-    build_test_args = ["-Wall"]
-    #values for parameters defined earlier in the code.
-    # parameters = { 'KERNEL_DIMENSION': 3, 'K_SELECT': 2} # sharpen for now
- 
-    sys.path.append(str(proj_path / "sim"))
-    hdl_toplevel = "renderer"
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel=hdl_toplevel,
-        always=True,
-        build_args=build_test_args,
-        # parameters = parameters,
-        timescale = ('1ns','1ps'),
-        waves=True
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel=hdl_toplevel,
-        test_module=test_file,
-        test_args=run_test_args,
-        waves=True
-    )
+    sources = [
+        "renderer.sv",
+        "pixel_calculator.sv",
+        "tile_painter.sv",
+        "pipeline.sv",
+        "depth_calculator.sv",
+        "divider3.sv",
+        "small_multiplier.sv",
+        "xilinx_true_dual_port_read_first_2_clock_ram.v",
+    ]
+    return run(__file__, "renderer", sources)
+
+# what regress.py runs
+RUNNER = renderer_runner
 
 if __name__ == '__main__':
     renderer_runner()
\ No newline at end of file
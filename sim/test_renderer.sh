@@ -1,2 +0,0 @@
-lab-bc simulate . sim/test_renderer.py
-python sim/test_image.py
\ No newline at end of file
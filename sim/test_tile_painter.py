@@ -8,52 +8,99 @@ from pathlib import Path
 from cocotb.clock import Clock
 from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
 from cocotb.utils import get_sim_time as gst
-# from cocotb.runner import get_runner
-from vicoco.vivado_runner import get_runner
 test_file = os.path.basename(__file__).replace(".py","")
 
+sys.path.append(str(Path(__file__).resolve().parent))
+from runner import run
+
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+from bram import DualPortRAM
+from bram_driver import BRAMDriver
+from capture import CaptureWriter
+from codec import convert_to_triangle, unpack_triangles
+from renderer import MAX_TRIANGLES, TILE_BRAM_MEM, TILE_HEIGHT, TILE_WIDTH, load_tile_init, paint_tile_row, triangle_bram
+
 CLK_PERIOD = 10
 PCLK_PERIOD = 20
+WIPED = 0xFFFFFFFF
 
-@cocotb.test()
-async def test_a(dut):
-    """cocotb test"""
-    dut._log.info("Starting...")
+async def start_painter(dut, tile_instances=1):
+    """Resets the painter with BRAM's triangles and a tile BRAM of
+    `tile_instances` instances, all taking the painter's writes, instance 0
+    also serving its reads. Returns the tile BRAM."""
     cocotb.start_soon(Clock(dut.clk, CLK_PERIOD, units="ns").start())
-    # cocotb.start_soon(Clock(dut.camera_pclk, PCLK_PERIOD, units="ns").start())
 
     dut._log.info("Holding reset...")
     dut.rst.value = 1
     dut.active.value = 0
     dut.wipe.value = 0
 
-    for i in range(2):
-        await cycle(dut)
+    dut.num_triangles.value = NUM_TRIANGLES
+    dut.x_offset.value = X_OFFSET
+    dut.y_offset.value = Y_OFFSET
+
+    # the triangle BRAM and this painter's tile BRAM, wired like in renderer.sv
+    triangle_bram = DualPortRAM(160, MAX_TRIANGLES)
+    triangle_bram.load(BRAM)
+    tile_bram = DualPortRAM(32, 800, init_file=TILE_BRAM_MEM, instances=tile_instances)
+
+    brams = BRAMDriver(dut.clk, rst=dut.rst)
+    brams.attach(triangle_bram, "b", addr=dut.bram_triangle_read_addr, dout=dut.bram_triangle_read_data)
+    for instance in range(tile_instances):
+        brams.attach(tile_bram, "a", instance, addr=dut.tile_bram_write_addr, din=dut.tile_bram_write_data,
+                     we=dut.tile_bram_write_valid)
+    brams.attach(tile_bram, "b", addr=dut.tile_bram_read_addr, dout=dut.tile_bram_read_data)
+    brams.start()
+
+    await ClockCycles(dut.clk, 2)
 
     dut._log.info("Running....")
 
     dut.active.value = 1
     dut.rst.value = 0
 
-    for _ in range(10000):
-        await cycle(dut)
-    
-    with open("test_image_list.txt", "w") as file:
-        file.write(str(TILE))
-    print(TILE)
-    
-    dut._log.info("Wiping.....")
+    await ClockCycles(dut.clk, 10000)
+    return tile_bram
+
+def expected_tile():
+    """The painted tile from the renderer model, tile row 0 so it starts from tile_bram.mem."""
+    fields = unpack_triangles(triangle_bram(BRAM))
+    return paint_tile_row(fields, Y_OFFSET // TILE_HEIGHT, load_tile_init(), tile_width=TILE_WIDTH, n_way=1,
+                          x_offset=X_OFFSET)
+
+@cocotb.test()
+async def test_a(dut):
+    """cocotb test"""
+    dut._log.info("Starting...")
+    tile_bram = await start_painter(dut)
+
+    # frame 0 is the painted tile, frame 1 the wiped one
+    with CaptureWriter("test_image.cap", "<u4", (TILE_HEIGHT, TILE_WIDTH)) as capture:
+        painted = tile_bram.mem[0].reshape(TILE_HEIGHT, TILE_WIDTH)
+        capture.write(painted, index=0)
+        expected = expected_tile()
+        wrong = painted != expected
+        assert not wrong.any(), f"{wrong.sum()} pixels differ from the model"
+
+        dut._log.info("Wiping.....")
 
-    dut.wipe.value = 1
-    
-    for _ in range(10000):
-        await cycle(dut)
+        dut.wipe.value = 1
 
-    print(TILE)
+        await ClockCycles(dut.clk, 10000)
 
+        wiped = tile_bram.mem[0].reshape(TILE_HEIGHT, TILE_WIDTH)
+        capture.write(wiped, index=1)
+        assert (wiped == WIPED).all(), f"{(wiped != WIPED).sum()} pixels not wiped"
 
-def convert_to_triangle(color, p1x, p1y, p2x, p2y, p3x, p3y, total_depth):
-    return 2**32 * (color * (2**112) + p1x * (2**96) + p1y * (2**80) + p2x * (2**64) + p2y * (2**48) + p3x * (2**32) + p3y * (2**16)) + total_depth
+@cocotb.test()
+async def test_instances(dut):
+    """one BRAMDriver clocking two tile BRAM instances, the second a copy taking the same writes"""
+    tile_bram = await start_painter(dut, tile_instances=2)
+
+    expected = expected_tile()
+    for instance in range(2):
+        painted = tile_bram.mem[instance].reshape(TILE_HEIGHT, TILE_WIDTH)
+        assert (painted == expected).all(), f"instance {instance}: {(painted != expected).sum()} pixels differ from the model"
 
 BRAM = [
     convert_to_triangle(0xf000, 0, 0, 0, 10, 1280, 10, 0xff0b003a009c), # 58 0 -100, -62720
@@ -64,84 +111,24 @@ BRAM = [
 
 NUM_TRIANGLES = len(BRAM)
 
-# offsets here shouldn't do anything,
-# since BRAM doesn't carer about offset as the choice of BRAM already
-# encodes the offset
+# where the tile sits on screen, the model paints the same 80 columns
 X_OFFSET = 600
 Y_OFFSET = 0
 
-TILE = [0xFFFF] * (80*10)
-
-bram_read_on_deck = 0
-tile_read_on_deck = 0
-
-def possible_int(str):
-    if str == 'X':
-        return 0
-    else:
-        try:
-            return int(str)
-        except:
-            return 0
-
-async def cycle(dut):
-    global tile_read_on_deck, bram_read_on_deck, BRAM, TILE, NUM_TRIANGLES, X_OFFSET, Y_OFFSET
-
-    await FallingEdge(dut.clk)
-
-    triangle_bram_index = possible_int(dut.bram_triangle_read_addr.value)
-    tile_bram_index = possible_int(dut.tile_bram_read_addr.value)
-
-    write_addy = possible_int(dut.tile_bram_write_addr.value)
-    write_valid = possible_int(dut.tile_bram_write_valid.value)
-    write_data = possible_int(dut.tile_bram_write_data.value)
-
-    if (write_valid == 1):
-        TILE[write_addy] = write_data
-    
-    await RisingEdge(dut.clk)
-
-    dut.tile_bram_read_data.value = tile_read_on_deck
-    tile_read_on_deck = TILE[tile_bram_index]
-
-    dut.bram_triangle_read_data.value = bram_read_on_deck
-    bram_read_on_deck = BRAM[triangle_bram_index]
-
-    dut.num_triangles.value = NUM_TRIANGLES
-    dut.x_offset.value = X_OFFSET
-    dut.y_offset.value = Y_OFFSET
-
 def tile_painter_runner():
     """Tile Painter Tester."""
-    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
-    # sim = os.getenv("SIM", "icarus")
-    sim = os.getenv("SIM","vivado")
-    proj_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(proj_path / "sim" / "model"))
-    sources = [proj_path / "hdl" / "pixel_calculator.sv", proj_path / "hdl" / "tile_painter.sv", proj_path / "hdl" / "pipeline.sv", proj_path / "hdl" / "depth_calculator.sv", proj_path / "hdl" / "divider3.sv", proj_path / "hdl" / "small_multiplier.sv"]
-    build_test_args = ["-Wall"]
-    #values for parameters defined earlier in the code.
-    # parameters = { 'KERNEL_DIMENSION': 3, 'K_SELECT': 2} # sharpen for now
- 
-    sys.path.append(str(proj_path / "sim"))
-    hdl_toplevel = "tile_painter"
-    runner = get_runner(sim)
-    runner.build(
-        sources=sources,
-        hdl_toplevel=hdl_toplevel,
-        always=True,
-        build_args=build_test_args,
-        # parameters = parameters,
-        timescale = ('1ns','1ps'),
-        waves=True
-    )
-    run_test_args = []
-    runner.test(
-        hdl_toplevel=hdl_toplevel,
-        test_module=test_file,
-        test_args=run_test_args,
-        waves=True
-    )
+    sources = [
+        "pixel_calculator.sv",
+        "tile_painter.sv",
+        "pipeline.sv",
+        "depth_calculator.sv",
+        "divider3.sv",
+        "small_multiplier.sv",
+    ]
+    return run(__file__, "tile_painter", sources)
+
+# what regress.py runs
+RUNNER = tile_painter_runner
 
 if __name__ == '__main__':
     tile_painter_runner()
\ No newline at end of file
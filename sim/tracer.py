@@ -0,0 +1,177 @@
+"""Selective, windowed waveform tracing for cocotb testbenches.
+
+The simulator's own waves (runner.run(waves=True)) are every signal of every
+instance for the whole run, which for a renderer frame is 16 tile painters
+and 32 BRAMs for millions of cycles. A WaveTracer records only the signals
+it is given, once per rising edge, and writes them as a VCD:
+
+    tracer = WaveTracer(dut.clk, select(dut, ["state", "tile_index",
+                                              "genblk*.tile_painter_inst.tile_state"]),
+                        window=(1000, 3000), path="renderer.vcd").start()
+
+only keeps cycles 1000 to 2999 (counting from start()) and writes them when
+stopped. As a flight recorder it keeps just the last `ring` cycles and writes
+nothing unless something fails:
+
+    recorder = WaveTracer(dut.clk, select(dut, [...]), ring=2000, path="fail.vcd").start()
+    with recorder.on_failure():
+        assert frame_buffer[v, h] == expected[v, h]
+
+on_failure() dumps the ring buffer when an AssertionError leaves the block
+and lets the error through. Run long simulations with WAVES=0 (see runner)
+so the simulator doesn't dump everything on top of this.
+
+Signal names in select() are dotted paths with fnmatch patterns per level.
+X/Z bits show up as x in the VCD.
+"""
+import fnmatch
+from collections import deque
+from contextlib import contextmanager
+
+import cocotb
+from cocotb.handle import HierarchyArrayObject
+from cocotb.triggers import ReadOnly, RisingEdge
+from cocotb.utils import get_sim_time
+
+
+def _children(handle):
+    try:
+        children = {child._name: child for child in handle}
+    except TypeError:
+        return {}
+    # a generate loop is one array scope genblk3 holding genblk3[0], genblk3[1], ...:
+    # list the iterations themselves so paths read genblk3[4].tile_painter_inst
+    for name, child in list(children.items()):
+        if isinstance(child, HierarchyArrayObject):
+            del children[name]
+            children.update(_children(child))
+    return children
+
+
+def select(dut, patterns):
+    """{dotted name: handle} for every signal under dut matching one of
+    `patterns`, like "state" or "genblk*.tile_painter_inst.tile_state".
+    A part that is exactly a name matches it as is, so "genblk3[4]" needs no
+    escaping of its brackets."""
+    found = {}
+    for pattern in patterns:
+        level = {"": dut}
+        for part in pattern.split("."):
+            matched = {}
+            for prefix, handle in level.items():
+                for name, child in _children(handle).items():
+                    if name == part or fnmatch.fnmatchcase(name, part):
+                        matched[f"{prefix}.{name}" if prefix else name] = child
+            level = matched
+        if not level:
+            raise LookupError(f"nothing in {dut._name} matches {pattern!r}")
+        found.update(level)
+    return found
+
+
+def _vcd_id(i):
+    # printable ascii identifiers, shortest first
+    chars = []
+    i += 1
+    while i:
+        i, r = divmod(i - 1, 94)
+        chars.append(chr(33 + r))
+    return "".join(chars)
+
+
+class WaveTracer:
+
+    def __init__(self, clk, signals, window=None, ring=None, path="trace.vcd", timescale="1ns"):
+        """signals: {name: handle}, from select(). window: (first, last + 1)
+        cycle to keep. ring: keep only the last `ring` cycles and write them
+        from dump() / on_failure() instead of on stop()."""
+        if window is not None and ring is not None:
+            raise ValueError("a tracer is either windowed or a flight recorder, not both")
+        self.clk = clk
+        self.names = list(signals)
+        self.handles = [signals[name] for name in self.names]
+        self.widths = [len(h) for h in self.handles]
+        self.window = window
+        self.ring = ring
+        self.path = path
+        self.timescale = timescale
+        # (time, values) per recorded cycle
+        self.samples = deque(maxlen=ring)
+        self.cycles = 0
+        self.dumps = 0
+        self._task = None
+
+    def start(self):
+        self._task = cocotb.start_soon(self._run())
+        return self
+
+    def stop(self):
+        if self._task is not None:
+            self._task.kill()
+            self._task = None
+        if self.ring is None:
+            self.write(self.path)
+
+    async def _run(self):
+        rising = RisingEdge(self.clk)
+        read_only = ReadOnly()
+        first, last = self.window if self.window is not None else (0, None)
+        handles = self.handles
+        while True:
+            await rising
+            cycle = self.cycles
+            self.cycles += 1
+            if cycle < first:
+                continue
+            if last is not None and cycle >= last:
+                return
+            await read_only
+            values = tuple(h.value.binstr for h in handles)
+            self.samples.append((get_sim_time(self.timescale.lstrip("0123456789")), values))
+
+    def dump(self, path=None):
+        """Writes what the ring buffer holds right now, returns the path."""
+        path = path or self.path
+        if self.dumps:
+            stem, dot, suffix = path.rpartition(".")
+            path = f"{stem}_{self.dumps}{dot}{suffix}" if dot else f"{path}_{self.dumps}"
+        self.dumps += 1
+        self.write(path)
+        return path
+
+    @contextmanager
+    def on_failure(self, path=None):
+        try:
+            yield self
+        except AssertionError:
+            path = self.dump(path)
+            cocotb.log.error(f"flight recorder: last {len(self.samples)} cycles in {path}")
+            raise
+
+    def write(self, path):
+        ids = [_vcd_id(i) for i in range(len(self.names))]
+        with open(path, "w") as f:
+            f.write(f"$timescale {self.timescale} $end\n$scope module trace $end\n")
+            scopes = {}
+            for name, width, code in zip(self.names, self.widths, ids):
+                scope, _, leaf = name.rpartition(".")
+                scopes.setdefault(scope, []).append((leaf, width, code))
+            for scope, variables in scopes.items():
+                parts = scope.split(".") if scope else []
+                for part in parts:
+                    f.write(f"$scope module {part} $end\n")
+                for leaf, width, code in variables:
+                    f.write(f"$var wire {width} {code} {leaf} $end\n")
+                f.write("$upscope $end\n" * len(parts))
+            f.write("$upscope $end\n$enddefinitions $end\n")
+
+            previous = [None] * len(ids)
+            for time, values in self.samples:
+                changes = []
+                for i, value in enumerate(values):
+                    if value != previous[i]:
+                        previous[i] = value
+                        value = value.lower().replace("u", "x").replace("w", "x")
+                        changes.append(f"{value}{ids[i]}" if self.widths[i] == 1 else f"b{value} {ids[i]}")
+                if changes:
+                    f.write(f"#{int(time)}\n" + "\n".join(changes) + "\n")
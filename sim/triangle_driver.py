@@ -0,0 +1,27 @@
+"""Feeds a triangle stream into renderer.triangle / triangle_valid.
+
+The renderer appends a triangle to its BRAM every cycle triangle_valid is
+high while it's IDLE, which is all full_projector does to it. Replaying a
+stream, from a capture or sim/model/projector_cache.py, stands in for
+simulating the projector in front of it:
+
+    triangles, source = projected(OBSTACLES, player_height=-128, player_lane=0)
+    await load_triangles(dut, triangles)
+    dut.active.value = 1
+"""
+from cocotb.triggers import ClockCycles
+
+from codec import as_triangles, triangles_to_ints
+
+
+async def load_triangles(dut, triangles, clk=None):
+    """One triangle a cycle, then triangle_valid low again. The renderer
+    has to be IDLE and out of reset."""
+    clk = clk or dut.clk
+    for triangle in triangles_to_ints(as_triangles(triangles)):
+        await ClockCycles(clk, 1)
+        dut.triangle_valid.value = 1
+        dut.triangle.value = triangle
+    await ClockCycles(clk, 1)
+    # otherwise IDLE keeps appending the last triangle
+    dut.triangle_valid.value = 0
@@ -0,0 +1,511 @@
+"""Reads Vivado timing and utilization reports into plain dicts and tracks
+them across builds.
+
+    python sim/vivado_reports.py builds/final            # one build
+    python sim/vivado_reports.py --trend                 # _history, builds/ and obj/
+    python sim/vivado_reports.py --trend --module renderer --module depth_calculator
+    python sim/vivado_reports.py builds/final --json final.json
+
+A build is a directory or zip with any of the reports build.tcl writes into
+obj/ (post_{synth,place,route}_timing_summary.rpt, *_timing.rpt, *_util.rpt).
+_history keeps every run as <time>_sub.zip (the sources that went in) and
+<time>_res.zip (what came back); both are read as one snapshot, reports from
+either, design parameters from the HDL in _sub. Those are what the trend
+lines up against slack and resources:
+
+    N_WAY       renderer N_WAY_PARALLEL, tile painters running at once
+    MAX_TRI     renderer MAX_TRIANGLES
+    LOG_D       depth_calculator LOG_D
+    DEPTH_LAT   longest pipeline in tile_painter, the cycles it waits on
+                depth_calculator
+    changed     HDL files that differ from the snapshot before
+
+Snapshots without reports (most of _history is simulation runs) still show
+up, with their parameters, so a change to the design is visible where it
+happened even if the next synthesis is a few snapshots later.
+"""
+import argparse
+import hashlib
+import json
+import re
+import sys
+import zipfile
+from pathlib import Path
+
+PROJ_PATH = Path(__file__).resolve().parent.parent
+STAGES = ("post_synth", "post_place", "post_route")
+
+
+def _number(text):
+    text = text.strip().rstrip("%")
+    if text in ("", "NA", "n/a"):
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        try:
+            return float(text)
+        except ValueError:
+            return text
+
+
+def _key(header):
+    # "TNS Failing Endpoints" -> "tns_failing_endpoints", "WNS(ns)" -> "wns"
+    return re.sub(r"\W+", "_", re.sub(r"\(ns\)", "", header)).strip("_").lower()
+
+
+######## timing ########
+
+def _is_label(header):
+    return "(ns)" not in header and "Endpoints" not in header
+
+
+def _table_after(text, title):
+    """(header, [rows]) of the whitespace aligned table after a section
+    title, each row {column: value}. Names (left aligned, can run past their
+    dashes) go to the column they start in, numbers (right aligned, can run
+    out the front of theirs) to the column they end in."""
+    start = text.find(title)
+    if start < 0:
+        return None, []
+    lines = text[start:].splitlines()
+    # title, underline, rule, blank, header, dashes, rows..., blank
+    i = next((k for k in range(1, len(lines) - 1) if re.match(r"^\s*-+(\s+-+)+\s*$", lines[k + 1])), None)
+    if i is None:
+        return None, []
+    header, dashes = lines[i], lines[i + 1]
+    spans = [(m.start(), m.end()) for m in re.finditer(r"-+", dashes)]
+    names = []
+    for k, (a, b) in enumerate(spans):
+        # header words can stick out past the dashes, take everything up to the next column
+        end = spans[k + 1][0] if k + 1 < len(spans) else len(header)
+        names.append(header[a:end].strip())
+    labels = [k for k, name in enumerate(names) if _is_label(name)]
+    rows = []
+    for line in lines[i + 2:]:
+        if not line.strip():
+            break
+        row = dict.fromkeys(names, "")
+        for token in re.finditer(r"\S+", line):
+            column = next((k for k, (a, b) in enumerate(spans)
+                           if k not in labels and a < token.end() <= b), None)
+            if column is None:
+                column = max([k for k in labels if spans[k][0] <= token.start()], default=0)
+            row[names[column]] = (row[names[column]] + " " + token.group()).strip()
+        rows.append(row)
+    return names, rows
+
+
+def _slacks(row, names):
+    return {_key(name): _number(row[name]) for name in names if not _is_label(name)}
+
+
+def parse_timing_summary(text):
+    """{"design": {wns, tns, whs, ths, ...}, "clocks": {clock: {...}},
+    "inter_clock": {(from, to): {...}}, "paths": [...]} of a
+    report_timing_summary. Slacks in ns, None where Vivado has nothing."""
+    names, rows = _table_after(text, "| Design Timing Summary")
+    design = _slacks(rows[0], names) if rows else {}
+    clocks = {}
+    names, rows = _table_after(text, "| Intra Clock Table")
+    for row in rows:
+        clocks[row["Clock"]] = _slacks(row, names)
+    inter = {}
+    names, rows = _table_after(text, "| Inter Clock Table")
+    for row in rows:
+        inter[(row["From Clock"], row["To Clock"])] = _slacks(row, names)
+    return {"design": design, "clocks": clocks, "inter_clock": inter, "paths": parse_paths(text)}
+
+
+_PATH_FIELDS = {
+    "source": r"Source:\s+(\S+)",
+    "destination": r"Destination:\s+(\S+)",
+    "path_group": r"Path Group:\s+(\S+)",
+    "path_type": r"Path Type:\s+(\w+)",
+    "requirement": r"Requirement:\s+(-?[\d.]+)ns",
+    "data_path_delay": r"Data Path Delay:\s+(-?[\d.]+)ns",
+    "logic_delay": r"Data Path Delay:.*?\(logic\s+(-?[\d.]+)ns",
+    "route_delay": r"Data Path Delay:.*?route\s+(-?[\d.]+)ns",
+    "logic_levels": r"Logic Levels:\s+(\d+)",
+    "clock_skew": r"Clock Path Skew:\s+(-?[\d.]+)ns",
+}
+
+
+def parse_paths(text):
+    """Every path report in a timing report, in order, as {slack, met,
+    source, destination, path_group, path_type ("Setup"/"Hold"),
+    requirement, data_path_delay, logic_delay, route_delay, logic_levels,
+    cells ({"CARRY4": 6, ...}), from_clock, to_clock}."""
+    paths = []
+    starts = [m for m in re.finditer(r"^Slack(?: \((\w+)\))?\s*:\s*(-?[\d.]+|inf)ns", text, re.M)]
+    clock_pairs = [(m.start(), m.group(1), m.group(2))
+                   for m in re.finditer(r"^From Clock:\s+(\S+)\s*\n\s+To Clock:\s+(\S+)", text, re.M)]
+    for k, m in enumerate(starts):
+        end = starts[k + 1].start() if k + 1 < len(starts) else len(text)
+        block = text[m.start():end]
+        path = {"slack": float(m.group(2)), "met": m.group(1) != "VIOLATED"}
+        for name, pattern in _PATH_FIELDS.items():
+            found = re.search(pattern, block)
+            path[name] = _number(found.group(1)) if found else None
+        levels = re.search(r"Logic Levels:\s+\d+\s+\(([^)]*)\)", block)
+        path["cells"] = {cell: int(n) for cell, n in re.findall(r"(\w+)=(\d+)", levels.group(1))} if levels else {}
+        pair = [(f, t) for start, f, t in clock_pairs if start < m.start()]
+        path["from_clock"], path["to_clock"] = pair[-1] if pair else (None, None)
+        if path["from_clock"] is None:
+            # report_timing has no From Clock sections, the clocks are in the cell lines
+            clocked = re.findall(r"clocked by (\S+)", block)
+            if len(clocked) >= 2:
+                path["from_clock"], path["to_clock"] = clocked[0], clocked[1]
+        paths.append(path)
+    return paths
+
+
+def critical_paths(paths, n=5, path_type="Setup"):
+    """The n worst paths of a type, worst first, one per (source, destination)."""
+    seen = set()
+    worst = []
+    for path in sorted((p for p in paths if p["path_type"] == path_type), key=lambda p: p["slack"]):
+        pair = (path["source"], path["destination"])
+        if pair not in seen:
+            seen.add(pair)
+            worst.append(path)
+    return worst[:n]
+
+
+######## utilization ########
+
+def _cells(line):
+    return [cell for cell in line.strip().strip("|").split("|")]
+
+
+def parse_utilization(text):
+    """{"hierarchy": [...], "resources": {...}} of a report_utilization.
+
+    hierarchy (from -hierarchical) is one dict per row, in order: instance
+    (dotted path from the top), module, depth, self (the "(name)" rows that
+    count only what's not in a child) and a number per column. resources is
+    {"Total LUTs": ..., "RAMB36": ..., "BRAM tiles": ...} for the whole
+    design: the top row of the hierarchy, or the Used column of the Site
+    Type tables of a flat report."""
+    hierarchy = []
+    resources = {}
+    header = None
+    stack = []
+    for line in text.splitlines():
+        if not line.startswith("|"):
+            continue
+        cells = _cells(line)
+        if cells[0].strip() == "Instance":
+            header = [c.strip() for c in cells]
+            continue
+        if cells[0].strip() in ("Site Type", "Ref Name"):
+            header = None
+            continue
+        if header is not None and len(cells) == len(header):
+            name = cells[0].rstrip()
+            depth = (len(name) - len(name.lstrip())) // 2
+            name = name.strip()
+            own = name.startswith("(")
+            if not own:
+                del stack[depth:]
+                stack.append(name)
+            row = {"instance": ".".join(stack[:depth + 1]), "module": cells[1].strip(), "depth": depth, "self": own}
+            row.update({column: _number(value) for column, value in zip(header[2:], cells[2:])})
+            hierarchy.append(row)
+        elif header is None and len(cells) >= 2:
+            # flat report: | Site Type | Used | Fixed | Prohibited | Available | Util% |
+            site, used = cells[0].strip(), _number(cells[1])
+            if isinstance(used, (int, float)) and site not in resources:
+                resources[site.replace("*", "").strip()] = used
+    if hierarchy:
+        top = hierarchy[0]
+        resources = {column: value for column, value in top.items()
+                     if column not in ("instance", "module", "depth", "self")}
+    if "RAMB36" in resources or "RAMB18" in resources:
+        resources["BRAM tiles"] = (resources.get("RAMB36") or 0) + (resources.get("RAMB18") or 0) / 2
+    elif "Block RAM Tile" in resources:
+        resources["BRAM tiles"] = resources["Block RAM Tile"]
+    return {"hierarchy": hierarchy, "resources": resources}
+
+
+def module_name(module):
+    """Vivado's name for one elaboration of a module back to the module:
+    tile_painter_37, pipeline__parameterized2, divider3_262 -> tile_painter,
+    pipeline, divider3."""
+    return re.sub(r"(__parameterized\d+)?(_\d+)?(__\d+)?$", "", module)
+
+
+def by_module(hierarchy):
+    """{module: {"instances": n, column: sum}} over every instance of every
+    module, each instance counted once with everything below it."""
+    totals = {}
+    for row in hierarchy:
+        if row["self"]:
+            continue
+        entry = totals.setdefault(module_name(row["module"]), {"instances": 0})
+        entry["instances"] += 1
+        for column, value in row.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and column != "depth":
+                entry[column] = entry.get(column, 0) + value
+    for entry in totals.values():
+        entry["BRAM tiles"] = entry.get("RAMB36", 0) + entry.get("RAMB18", 0) / 2
+    return totals
+
+
+######## design parameters ########
+
+def _parameter(text, name):
+    found = re.search(rf"\b(?:localparam|parameter)\s+(?:\w+\s+)?(?:\[[^\]]*\]\s*)?{name}\s*=\s*(\d+)", text)
+    return int(found.group(1)) if found else None
+
+
+def design_parameters(hdl):
+    """The knobs the trend lines slack and resources up against, from
+    {file name: source} of a snapshot's hdl/. None where the snapshot
+    doesn't have the file."""
+    renderer = hdl.get("renderer.sv", "")
+    depth = hdl.get("depth_calculator.sv", "")
+    painter = hdl.get("tile_painter.sv", "")
+    stages = [int(n) for n in re.findall(r"STAGES_NEEDED\s*\(\s*(\d+)\s*\)", painter)]
+    return {
+        "N_WAY": _parameter(renderer, "N_WAY_PARALLEL"),
+        "MAX_TRI": _parameter(renderer, "MAX_TRIANGLES"),
+        "LOG_D": _parameter(depth, "LOG_D"),
+        "DEPTH_LAT": max(stages) if stages else None,
+    }
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode()).hexdigest()[:10]
+
+
+######## builds ########
+
+def _kind(name):
+    """(stage, kind) of a report file name, kind one of timing_summary,
+    timing, util; None for anything else."""
+    stem = Path(name).stem
+    stage = next((s for s in STAGES if stem.startswith(s)), None)
+    for kind in ("timing_summary", "timing", "util"):
+        if stem.endswith(kind):
+            return (stage or "unknown", kind)
+    return None
+
+
+def _files(source):
+    """{name: text} of the reports and hdl/ sources in a directory, a zip,
+    or a list of either."""
+    sources = source if isinstance(source, (list, tuple)) else [source]
+    files = {}
+    for source in sources:
+        source = Path(source)
+        if source.suffix == ".zip":
+            with zipfile.ZipFile(source) as z:
+                for name in z.namelist():
+                    if name.endswith(".rpt") or re.search(r"(^|/)hdl/[^/]+\.s?v$", name):
+                        files[name] = z.read(name).decode(errors="replace")
+        else:
+            for path in sorted(source.rglob("*")):
+                if path.suffix == ".rpt" or (path.parent.name == "hdl" and path.suffix in (".sv", ".v")):
+                    files[str(path.relative_to(source))] = path.read_text(errors="replace")
+    return files
+
+
+def load_build(source, name=None):
+    """Everything in one build: {"name", "date", "reports": {stage: {"timing",
+    "paths", "utilization"}}, "parameters", "hdl" ({file: digest})}."""
+    files = _files(source)
+    first = source[0] if isinstance(source, (list, tuple)) else source
+    build = {"name": name or Path(first).stem, "date": None, "reports": {}, "parameters": {}, "hdl": {}}
+    hdl = {}
+    for path, text in files.items():
+        if path.endswith(".rpt"):
+            kind = _kind(path)
+            if kind is None:
+                continue
+            stage, kind = kind
+            report = build["reports"].setdefault(stage, {})
+            if kind == "timing_summary":
+                report["timing"] = parse_timing_summary(text)
+            elif kind == "timing":
+                report["paths"] = parse_paths(text)
+            else:
+                report["utilization"] = parse_utilization(text)
+            date = re.search(r"^\| Date\s+:\s+(.+?)\s*$", text, re.M)
+            if date and build["date"] is None:
+                build["date"] = date.group(1)
+        else:
+            hdl[Path(path).name] = text
+    build["parameters"] = design_parameters(hdl)
+    build["hdl"] = {file: _digest(text) for file, text in sorted(hdl.items())}
+    return build
+
+
+def summary(build):
+    """One flat row for the latest stage a build has reports for."""
+    row = {"name": build["name"], "stage": None}
+    report = {}
+    for stage in STAGES[::-1] + ("unknown",):
+        if stage in build["reports"]:
+            row["stage"], report = stage, build["reports"][stage]
+            break
+    design = report.get("timing", {}).get("design", {})
+    for key in ("wns", "tns", "whs", "ths"):
+        row[key] = design.get(key)
+    row["failing"] = design.get("tns_failing_endpoints")
+    if row["wns"] is None and report.get("paths"):
+        # only a report_timing: its worst setup path is the wns
+        setup = [p["slack"] for p in report["paths"] if p["path_type"] == "Setup"]
+        row["wns"] = min(setup) if setup else None
+    resources = report.get("utilization", {}).get("resources", {})
+    row["luts"] = resources.get("Total LUTs", resources.get("Slice LUTs"))
+    row["ffs"] = resources.get("FFs", resources.get("Slice Registers"))
+    row["bram"] = resources.get("BRAM tiles")
+    row["dsp"] = resources.get("DSP Blocks", resources.get("DSPs"))
+    row.update(build["parameters"])
+    return row
+
+
+def snapshots(history=PROJ_PATH / "_history", builds=PROJ_PATH / "builds"):
+    """Every build there is, oldest first: _history's <time>_sub/_res pairs
+    by time, every directory in builds/, then obj/ (the last build.tcl run)
+    with the hdl/ it was built from."""
+    pairs = {}
+    for path in sorted(Path(history).glob("*.zip")):
+        stem = re.sub(r"_(sub|res)$", "", path.stem)
+        pairs.setdefault(stem, []).append(path)
+    found = [load_build(paths, name) for name, paths in sorted(pairs.items())]
+    found += [load_build(path) for path in sorted(Path(builds).iterdir()) if path.is_dir()]
+    if (PROJ_PATH / "obj").is_dir():
+        found.append(load_build([PROJ_PATH / "obj", PROJ_PATH / "hdl"], "obj"))
+    return found
+
+
+def trend(builds, modules=()):
+    """A summary() row per build, plus what changed in the HDL since the
+    build before and per module totals for `modules`."""
+    rows = []
+    previous = None
+    for build in builds:
+        row = summary(build)
+        if previous is not None and build["hdl"]:
+            changed = [f for f, d in build["hdl"].items() if previous.get(f) != d]
+            changed += [f"-{f}" for f in previous if f not in build["hdl"]]
+            row["changed"] = changed
+        else:
+            row["changed"] = []
+        if build["hdl"]:
+            previous = build["hdl"]
+        report = build["reports"].get(row["stage"], {})
+        totals = by_module(report.get("utilization", {}).get("hierarchy", []))
+        for module in modules:
+            entry = totals.get(module, {})
+            row[f"{module} luts"] = entry.get("Total LUTs")
+            row[f"{module} bram"] = entry.get("BRAM tiles")
+            row[f"{module} dsp"] = entry.get("DSP Blocks")
+        rows.append(row)
+    return rows
+
+
+######## printing ########
+
+def _cell(value, width):
+    if value is None:
+        return "-".rjust(width)
+    if isinstance(value, float):
+        return f"{value:{width}.3f}" if abs(value) < 1000 else f"{value:{width}.1f}"
+    return str(value).rjust(width)
+
+
+def print_build(build, paths=5):
+    print(f"{build['name']}" + (f"  ({build['date']})" if build["date"] else ""))
+    if build["parameters"] and any(v is not None for v in build["parameters"].values()):
+        print("  " + "  ".join(f"{k}={v}" for k, v in build["parameters"].items()))
+    for stage in STAGES + ("unknown",):
+        report = build["reports"].get(stage)
+        if not report:
+            continue
+        print(f"\n{stage}")
+        design = report.get("timing", {}).get("design")
+        if design:
+            print(f"  WNS {_cell(design.get('wns'), 8)} ns  TNS {_cell(design.get('tns'), 9)} ns "
+                  f"({design.get('tns_failing_endpoints')} failing of {design.get('tns_total_endpoints')})")
+            print(f"  WHS {_cell(design.get('whs'), 8)} ns  THS {_cell(design.get('ths'), 9)} ns "
+                  f"({design.get('ths_failing_endpoints')} failing of {design.get('ths_total_endpoints')})")
+            for clock, slack in report["timing"]["clocks"].items():
+                if slack.get("wns") is not None or slack.get("whs") is not None:
+                    print(f"    {clock:28s} WNS {_cell(slack.get('wns'), 8)}  WHS {_cell(slack.get('whs'), 8)}")
+        all_paths = report.get("timing", {}).get("paths", []) + report.get("paths", [])
+        for path_type in ("Setup", "Hold"):
+            worst = critical_paths(all_paths, paths, path_type)
+            if worst:
+                print(f"  worst {path_type.lower()} paths")
+            for path in worst:
+                cells = " ".join(f"{c}={n}" for c, n in path["cells"].items())
+                print(f"    {path['slack']:7.3f} ns  {path['logic_levels']} levels ({cells})  "
+                      f"logic {path['logic_delay']} route {path['route_delay']} ns")
+                print(f"      from {path['source']}\n      to   {path['destination']}")
+        utilization = report.get("utilization")
+        if utilization:
+            print("  " + "  ".join(f"{k} {v:g}" for k, v in utilization["resources"].items()
+                                   if isinstance(v, (int, float))))
+            totals = by_module(utilization["hierarchy"])
+            biggest = sorted(totals.items(), key=lambda kv: -kv[1].get("Total LUTs", 0))[1:11]
+            if biggest:
+                print(f"    {'module':32s} {'n':>3s} {'LUTs':>7s} {'FFs':>7s} {'BRAM':>6s} {'DSP':>4s}")
+            for module, entry in biggest:
+                print(f"    {module:32s} {entry['instances']:3d} {_cell(entry.get('Total LUTs'), 7)} "
+                      f"{_cell(entry.get('FFs'), 7)} {_cell(entry['BRAM tiles'], 6)} {_cell(entry.get('DSP Blocks'), 4)}")
+
+
+def print_trend(rows):
+    columns = [k for k in rows[0] if k not in ("name", "changed")] if rows else []
+    widths = [max(len(c), 7) for c in columns]
+    name_width = max([len(r["name"]) for r in rows] + [8])
+    print(f"{'snapshot':{name_width}s} " + " ".join(c.rjust(w) for c, w in zip(columns, widths)) + "  changed")
+    for row in rows:
+        cells = " ".join(_cell(row[c], w) for c, w in zip(columns, widths))
+        print(f"{row['name']:{name_width}s} {cells}  {' '.join(row['changed'])}")
+
+
+def _jsonable(value):
+    if isinstance(value, dict):
+        return {" -> ".join(k) if isinstance(k, tuple) else k: _jsonable(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_jsonable(v) for v in value]
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("builds", nargs="*", help="build directories or zips (default with --trend: _history, builds/ and obj/)")
+    parser.add_argument("--trend", action="store_true", help="one row per build instead of the full report")
+    parser.add_argument("--module", action="append", default=[], help="per module LUT/BRAM/DSP columns in the trend")
+    parser.add_argument("--paths", type=int, default=5, help="critical paths to show per build")
+    parser.add_argument("--json", default=None, help="write everything parsed to this file")
+    args = parser.parse_args()
+
+    if args.builds:
+        builds = [load_build(Path(b)) for b in args.builds]
+    elif args.trend:
+        builds = snapshots()
+    else:
+        builds = [load_build(PROJ_PATH / "builds" / "final")]
+    if not builds:
+        sys.exit("no builds found")
+
+    if args.trend:
+        rows = trend(builds, args.module)
+        print_trend(rows)
+    else:
+        for build in builds:
+            print_build(build, args.paths)
+    if args.json:
+        data = {"builds": builds}
+        if args.trend:
+            data["trend"] = rows
+        Path(args.json).write_text(json.dumps(_jsonable(data), indent=2))
+
+
+if __name__ == "__main__":
+    main()